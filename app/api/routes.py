@@ -1,33 +1,43 @@
+import codecs
+import csv
+from typing import List, Optional
+from urllib.parse import quote, urlencode
 from fastapi import APIRouter, HTTPException, Response, Request
 from app.services.call_service import CallService
+from app.services.campaign_service import CampaignService
 from app.services.plivo_xml_service import PlivoXMLService
-from app.models.call_models import CallState, CallRecord
+from app.services.recording_service import recording_service
+from app.models.call_models import CallState, CallRecord, CampaignProgress, CampaignRequest
 from app.api.websocket import voice_manager
+from app.services.admission import admission_controller, admission_metrics
+from app.services.call_analysis import analysis_service
+from app.startup import load_agents, load_module, warmup_state
 from app.config import settings
 import plivo
-import os
 from loguru import logger
 
 router = APIRouter()
 call_service = CallService()
 xml_service = PlivoXMLService()
-plivo_client = plivo.RestClient(
-    os.getenv("PLIVO_AUTH_ID"), os.getenv("PLIVO_AUTH_TOKEN")
-)
+campaign_service = CampaignService(call_service)
 
 RINGBACK_TONE_URL = (
     "https://ontune.s3.ap-south-1.amazonaws.com/ringbacktone-original.mp3"
 )
 
 
-def get_stream_xml(call_id):
+def get_stream_xml(call_id, agent: Optional[str] = None):
     """
-    Returns the XML for the websocket stream with recording enabled.
+    Returns the XML for the websocket stream with recording enabled. The
+    agent profile chosen for the call travels with the stream URL, so any
+    worker can pick up the stream.
     """
 
     base_url = settings.BASE_URL.replace("https://", "")
     recordCallback = f"https://{base_url}/api/v1/calls/recording/{call_id}"
     ws_url = f"wss://{base_url}/ws/voice/{call_id}"
+    if agent:
+        ws_url += f"?agent={quote(agent)}"
 
     response = plivo.plivoxml.ResponseElement()
     response.add(
@@ -52,22 +62,57 @@ def get_stream_xml(call_id):
     return response.to_string()
 
 
+async def get_fallback_xml(call_id, reason: str, agent: Optional[str] = None, attempt: int = 0):
+    """
+    Returns the XML for a call we can't serve right now: queue music and
+    another try at the answer webhook, or an apology and a hangup once the
+    tries are used up (or with the hangup fallback).
+    """
+
+    if settings.ADMISSION_FALLBACK == "queue" and attempt < settings.ADMISSION_QUEUE_MAX_ATTEMPTS:
+        admission_metrics.queued += 1
+        params = {"attempt": attempt + 1}
+        if agent:
+            params["agent"] = agent
+        retry_url = f"{settings.BASE_URL}/api/v1/calls/answer/{call_id}?{urlencode(params)}"
+        return xml_service.generate_queue_xml(settings.ADMISSION_QUEUE_MUSIC_URL, retry_url)
+
+    await call_service.registry.transition(
+        call_id, CallState.FAILED, error_message=f"Shed by admission control: {reason}"
+    )
+    return xml_service.generate_hangup_xml(settings.ADMISSION_HANGUP_MESSAGE)
+
+
+async def _check_agent(agent: Optional[str]):
+    if agent and not (await load_agents()).get(agent):
+        raise HTTPException(status_code=404, detail=f"Unknown agent {agent}")
+
+
 @router.post("/calls/outbound/{to_number}", response_model=CallRecord)
-async def make_outbound_call(to_number: str):
+async def make_outbound_call(to_number: str, agent: Optional[str] = None):
+    await _check_agent(agent)
     try:
-        return await call_service.make_outbound_call(to_number)
+        return await call_service.make_outbound_call(to_number, agent=agent)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/calls/answer/{call_id}")
-async def handle_answer_webhook(call_id: str, request: Request):
-    """Handle Plivo's answer callback and return XML with WebSocket instructions."""
+async def handle_answer_webhook(
+    call_id: str, request: Request, agent: Optional[str] = None, attempt: int = 0
+):
+    """Handle Plivo's answer callback and return XML with WebSocket instructions.
+    `agent` picks the agent profile, the default one is used otherwise. When
+    this worker is saturated the call gets the admission fallback instead."""
     try:
         data = await request.form()
         logger.info(f"Call status for {call_id}: {data.get('CallStatus')}")
-        # TODO: update call webhook
-        xml_content = get_stream_xml(call_id)
+        await call_service.handle_callback(call_id, data)
+        reason = admission_controller.admit(call_id)
+        if reason:
+            xml_content = await get_fallback_xml(call_id, reason, agent, attempt)
+        else:
+            xml_content = get_stream_xml(call_id, agent)
         return Response(content=xml_content, media_type="text/xml", status_code=200)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -79,6 +124,7 @@ async def handle_call_status(call_id: str, request: Request):
     try:
         data = await request.form()
         logger.info(f"Call status update for {call_id}: {data.get('CallStatus')}")
+        await call_service.handle_callback(call_id, data)
         return Response(content="", media_type="text/xml", status_code=200)
     except Exception as e:
         logger.error(f"Error handling call status for {call_id}: {str(e)}")
@@ -90,8 +136,7 @@ async def handle_hangup_webhook(call_id: str, request: Request):
     try:
         data = await request.form()
         logger.info(f"Call status for {call_id}: {data.get('CallStatus')}")
-        # TODO: FAILED, COMPLETED, REJECTED, USERBUSY status
-
+        await call_service.handle_callback(call_id, data)
         return Response(content="", media_type="application/xml")
     except Exception as e:
         logger.error(f"Error handling call hangup for {call_id}: {str(e)}")
@@ -103,11 +148,157 @@ async def store_call_recording(call_uuid: str, request: Request):
     try:
         data = await request.form()
         recording_url = data.get("RecordUrl")
-        voice_manager.update_recording_url(call_uuid, recording_url)
+        await voice_manager.update_recording_url(call_uuid, recording_url)
         logger.info(f"Recording...... {data}")
         if recording_url:
-            logger.info("recording_url::::", recording_url)
-            await call_service.store_recording(call_uuid, recording_url)
+            # Copied to S3 in the background, Plivo doesn't need to wait.
+            # With the queue full, a 503 has Plivo send the callback again.
+            if not recording_service.submit(
+                call_uuid, recording_url, on_stored=voice_manager.update_s3_recording_path
+            ):
+                raise HTTPException(status_code=503, detail="Recording queue full")
         return Response(content="")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/calls/live")
+async def get_live_calls():
+    """Calls by state, from Plivo's callbacks."""
+    return await call_service.registry.metrics()
+
+
+@router.get("/calls/{call_id}", response_model=CallRecord)
+async def get_call(call_id: str):
+    """A call by our id or by Plivo's CallUUID."""
+    record = await call_service.registry.resolve(call_id)
+    if not record:
+        raise HTTPException(status_code=404, detail=f"Unknown call {call_id}")
+    return record
+
+
+@router.get("/calls/{call_uuid}/status")
+async def get_call_status(call_uuid: str):
+    status = await voice_manager.get_call_status(call_uuid)
+    if not status:
+        raise HTTPException(status_code=404, detail=f"Unknown call {call_uuid}")
+    return status
+
+
+@router.get("/calls/{call_uuid}/analysis")
+async def get_call_analysis(call_uuid: str):
+    """Post-call analysis of a call: `pending`, `running`, `done` (with the
+    result) or `failed`."""
+    analysis = await analysis_service.get(call_uuid)
+    if not analysis:
+        raise HTTPException(status_code=404, detail=f"No analysis for call {call_uuid}")
+    return analysis
+
+
+@router.get("/analysis/metrics")
+async def get_analysis_metrics():
+    """Live analysis workers and jobs by status."""
+    return await analysis_service.metrics()
+
+
+@router.get("/admission/metrics")
+async def get_admission_metrics():
+    """Sessions, load and shed calls of this worker."""
+    return admission_controller.metrics()
+
+
+@router.get("/bot/metrics")
+async def get_bot_metrics():
+    """Shared resource state, per-call pipeline setup times and how the
+    startup warmup went."""
+    resources = (await load_module("app.services.bot_resources")).bot_resources
+    return {**resources.metrics(), "warmup": warmup_state()}
+
+
+@router.get("/agents")
+async def list_agents():
+    return [template.profile for template in (await load_agents()).templates()]
+
+
+@router.get("/tts/cache/metrics")
+async def get_tts_cache_metrics():
+    """Phrase cache hit ratio and the synthesized audio it saved."""
+    return (await load_module("app.services.tts_cache")).phrase_cache.metrics()
+
+
+async def _read_csv_numbers(request: Request) -> List[str]:
+    """The phone numbers (first column) of the CSV body, skipping a header
+    row if there is one. Rows are parsed as the body arrives rather than
+    after reading all of it, but the campaign needs the whole list up front
+    for its progress."""
+    numbers = []
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        numbers.extend(_csv_numbers(lines))
+    pending += decoder.decode(b"", final=True)
+    numbers.extend(_csv_numbers([pending]))
+    return numbers
+
+
+def _csv_numbers(lines: List[str]) -> List[str]:
+    return [row[0] for row in csv.reader(lines) if row and any(c.isdigit() for c in row[0])]
+
+
+@router.post("/campaigns", response_model=CampaignProgress)
+async def create_campaign(request: Request, agent: Optional[str] = None):
+    """Starts dialing a list of numbers, sent either as JSON
+    (`{"numbers": [...], "agent": "..."}`) or as a CSV body
+    (`Content-Type: text/csv`, with the agent as a query parameter)."""
+    if request.headers.get("content-type", "").startswith("text/csv"):
+        numbers = await _read_csv_numbers(request)
+    else:
+        campaign_request = CampaignRequest(**await request.json())
+        numbers = campaign_request.numbers
+        agent = campaign_request.agent or agent
+    if not numbers:
+        raise HTTPException(status_code=400, detail="No numbers to dial")
+    await _check_agent(agent)
+    return campaign_service.create(numbers, agent).progress()
+
+
+@router.get("/campaigns")
+async def list_campaigns():
+    return [campaign.progress() for campaign in campaign_service.list()]
+
+
+def _campaign_or_404(campaign):
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Unknown campaign")
+    return campaign.progress()
+
+
+@router.get("/campaigns/{campaign_id}", response_model=CampaignProgress)
+async def get_campaign(campaign_id: str):
+    return _campaign_or_404(campaign_service.get(campaign_id))
+
+
+@router.get("/campaigns/{campaign_id}/calls", response_model=list[CallRecord])
+async def get_campaign_calls(campaign_id: str):
+    campaign = campaign_service.get(campaign_id)
+    _campaign_or_404(campaign)
+    return campaign.records
+
+
+@router.post("/campaigns/{campaign_id}/pause", response_model=CampaignProgress)
+async def pause_campaign(campaign_id: str):
+    return _campaign_or_404(campaign_service.pause(campaign_id))
+
+
+@router.post("/campaigns/{campaign_id}/resume", response_model=CampaignProgress)
+async def resume_campaign(campaign_id: str):
+    return _campaign_or_404(campaign_service.resume(campaign_id))
+
+
+@router.post("/campaigns/{campaign_id}/cancel", response_model=CampaignProgress)
+async def cancel_campaign(campaign_id: str):
+    return _campaign_or_404(campaign_service.cancel(campaign_id))
@@ -1,99 +1,99 @@
+import json
+
 from fastapi import WebSocket
 from loguru import logger
-from typing import Dict, List, Optional, TypedDict
-from typing_extensions import Literal
-from openai.types.chat import ChatCompletionMessageParam
-from app.bot import run_bot
+from typing import Dict, Optional
+from app.services.call_analysis import analysis_service
+from app.services.call_registry import call_registry
+from app.models.call_models import CallState, CallStatus
+from app.services.call_state_store import CallStateStore, create_call_state_store
+from app.startup import load_agents, load_bot
 
 
-class CallStatus(TypedDict):
-    status: Literal["in_progress", "completed", "error"]
-    transcript: Optional[List[ChatCompletionMessageParam]]
-    stereo_recording_url: Optional[str]
-    error: Optional[str]
+class VoiceWebSocketManager:
+    """Tracks live call WebSockets and routes call status through a
+    `CallStateStore`. The WebSocket objects are necessarily local to this
+    process, the status is wherever the store keeps it.
 
+    """
 
-class VoiceWebSocketManager:
-    def __init__(self):
+    def __init__(self, store: CallStateStore):
+        self.store = store
         self.active_connections: Dict[str, WebSocket] = {}
-        self.call_status: Dict[str, CallStatus] = {}
-        self.voice_bots: Dict[str, bool] = {}
 
     async def connect(self, websocket: WebSocket, call_uuid: str):
         await websocket.accept()
         self.active_connections[call_uuid] = websocket
-        self.call_status[call_uuid] = {
-            "status": "INPROGRESS",
-            "transcript": None,
-            "stereo_recording_url": None,
-            "error": None,
-        }
-        self.voice_bots[call_uuid] = False
+        await self.store.set(
+            call_uuid,
+            {
+                "status": "in_progress",
+                "transcript": None,
+                "stereo_recording_url": None,
+                "s3_recording_path": None,
+                "error": None,
+            },
+        )
         logger.info(f"WebSocket connection established for call {call_uuid}")
 
     def disconnect(self, call_uuid: str):
         if call_uuid in self.active_connections:
             del self.active_connections[call_uuid]
-            if call_uuid in self.call_status:
-                del self.call_status[call_uuid]
-            if call_uuid in self.voice_bots:
-                del self.voice_bots[call_uuid]
             logger.info(f"WebSocket connection closed for call {call_uuid}")
 
-    async def receive_audio(self, call_uuid: str, audio_data: bytes):
-        """Handle incoming audio data from Plivo"""
-        if call_uuid in self.active_connections:
-            try:
-                if not self.voice_bots.get(call_uuid):
-                    # Initialize the voice bot for this call
-                    self.voice_bots[call_uuid] = True
-                    system_prompt = "You are an AI assistant helping with a phone call. Be concise and helpful."
-                    voice_id = (
-                        "79a125e8-cd45-4c13-8a67-188112f4dd22"  # Default voice ID
-                    )
-
-                    # Start the voice bot in the background
-                    transcript = await run_bot(
-                        system_prompt,
-                        voice_id,
-                        self.active_connections[call_uuid],
-                        "stream_sid",  # This is a placeholder, you might want to store the actual stream_sid
-                        call_uuid,
-                    )
-                    logger.info(f"transcript........{transcript}")
-                    if transcript:
-                        self.call_status[call_uuid]["transcript"] = transcript
-                        self.call_status[call_uuid]["status"] = "completed"
-
-            except Exception as e:
-                logger.error(f"Error processing audio for call {call_uuid}: {str(e)}")
-                self.call_status[call_uuid] = {
-                    "status": "error",
-                    "transcript": None,
-                    "stereo_recording_url": None,
-                    "error": str(e),
-                }
-
-    def update_recording_url(self, call_uuid: str, recording_url: str):
+    async def complete(self, call_uuid: str, transcript=None):
+        await self.store.update(call_uuid, status="completed", transcript=transcript)
+
+    async def fail(self, call_uuid: str, error: str):
+        await self.store.update(call_uuid, status="error", error=error)
+
+    async def update_recording_url(self, call_uuid: str, recording_url: str):
         """Update the recording URL for a call"""
-        if call_uuid in self.call_status:
-            self.call_status[call_uuid]["stereo_recording_url"] = recording_url
+        if not await self.store.update(call_uuid, stereo_recording_url=recording_url):
+            logger.warning(f"Recording URL for unknown call {call_uuid}")
+
+    async def update_s3_recording_path(self, call_uuid: str, s3_path: str):
+        await self.store.update(call_uuid, s3_recording_path=s3_path)
 
-    def get_call_status(self, call_uuid: str) -> Optional[CallStatus]:
+    async def get_call_status(self, call_uuid: str) -> Optional[CallStatus]:
         """Get the status of a call"""
-        return self.call_status.get(call_uuid)
+        return await self.store.get(call_uuid)
 
 
-voice_manager = VoiceWebSocketManager()
+voice_manager = VoiceWebSocketManager(create_call_state_store())
 
 
-async def handle_voice_websocket(websocket: WebSocket, call_uuid: str):
+async def handle_voice_websocket(websocket: WebSocket, call_uuid: str, agent: Optional[str] = None):
     await voice_manager.connect(websocket, call_uuid)
     try:
-        while True:
-            data = await websocket.receive_bytes()
-            await voice_manager.receive_audio(call_uuid, data)
+        # Plivo sends a connected event followed by the start event with the
+        # stream details.
+        start_data = websocket.iter_text()
+        await start_data.__anext__()
+        call_data = json.loads(await start_data.__anext__())
+        logger.debug(f"Stream started for call {call_uuid}: {call_data}")
+        stream_sid = call_data["streamId"]
+        # The stream only starts once the call is answered, in case the
+        # answer callback went missing.
+        await call_registry.transition(call_uuid, CallState.INPROGRESS)
+        # Instant once the warmup is done, see app.startup.
+        template = (await load_agents()).resolve(agent)
+        bot = await load_bot(template)
+        transcript = await bot.run_bot(websocket, stream_sid, call_uuid, template)
+        await call_registry.transition(call_uuid, CallState.COMPLETED)
+        await voice_manager.complete(call_uuid, transcript)
+        # Runs in the analysis workers, see AnalysisService.
+        record = await call_registry.get(call_uuid)
+        await analysis_service.submit(
+            call_uuid,
+            transcript,
+            template.analysis,
+            template.name,
+            record=record.model_dump(mode="json") if record else None,
+        )
     except Exception as e:
         logger.error(f"WebSocket error for call {call_uuid}: {str(e)}")
+        await call_registry.transition(call_uuid, CallState.FAILED, error_message=str(e))
+        await voice_manager.fail(call_uuid, str(e))
     finally:
         voice_manager.disconnect(call_uuid)
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+from loguru import logger
+
+from pipecat.audio.mixers.base_audio_mixer import BaseAudioMixer
+from pipecat.audio.utils import resample_audio
+from pipecat.frames.frames import MixerControlFrame, MixerEnableFrame, MixerUpdateSettingsFrame
+
+
+class AmbienceLibrary:
+    """Process-wide store of decoded ambience tracks.
+
+    Every track is decoded, mixed down to mono and resampled once per sample
+    rate, then written as raw PCM to `cache_dir` and memory-mapped read-only,
+    so the samples live in the page cache shared by every call and every
+    worker process on the host. If the cache can't be written the track is
+    kept in memory instead. Tracks are kept at full volume, mixers apply
+    their own.
+
+    """
+
+    def __init__(self, cache_dir: str):
+        self._dir = Path(cache_dir)
+        self._lock = threading.Lock()
+        self._tracks: Dict[Tuple[str, int], Optional[np.ndarray]] = {}
+
+    def _cache_path(self, file_name: str, sample_rate: int) -> Path:
+        stat = os.stat(file_name)
+        data = f"{os.path.abspath(file_name)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{sample_rate}"
+        return self._dir / f"{hashlib.sha256(data.encode('utf-8')).hexdigest()}.pcm"
+
+    def _decode(self, file_name: str, sample_rate: int) -> np.ndarray:
+        data, file_rate = sf.read(file_name, dtype="int16", always_2d=True)
+        samples = data[:, 0] if data.shape[1] == 1 else data.mean(axis=1).astype(np.int16)
+        if file_rate != sample_rate:
+            audio = resample_audio(np.ascontiguousarray(samples).tobytes(), file_rate, sample_rate)
+            samples = np.frombuffer(audio, dtype=np.int16)
+        return np.ascontiguousarray(samples)
+
+    def _load(self, file_name: str, sample_rate: int) -> np.ndarray:
+        path = self._cache_path(file_name, sample_rate)
+        if not path.exists():
+            samples = self._decode(file_name, sample_rate)
+            try:
+                self._dir.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_bytes(samples.tobytes())
+                os.replace(tmp, path)
+            except OSError as e:
+                logger.warning(f"Unable to cache ambience {file_name}, keeping it in memory: {e}")
+                samples.setflags(write=False)
+                return samples
+        # A plain ndarray view, slicing a np.memmap is several times slower.
+        return np.memmap(path, dtype=np.int16, mode="r").view(np.ndarray)
+
+    def track(self, file_name: str, sample_rate: int) -> Optional[np.ndarray]:
+        """Returns the read-only samples of `file_name` at `sample_rate`, or
+        None if the file can't be used.
+
+        """
+        key = (file_name, sample_rate)
+        with self._lock:
+            if key in self._tracks:
+                return self._tracks[key]
+
+            track = None
+            try:
+                track = self._load(file_name, sample_rate)
+                if not len(track):
+                    logger.warning(f"Ambience file {file_name} is empty")
+                    track = None
+            except Exception as e:
+                logger.error(f"Unable to open file {file_name}: {e}")
+
+            self._tracks[key] = track
+            return track
+
+    def metrics(self) -> dict:
+        tracks = [t for t in self._tracks.values() if t is not None]
+        return {"tracks": len(tracks), "bytes": sum(t.nbytes for t in tracks)}
+
+
+class AmbienceMixer(BaseAudioMixer):
+    """Mixes a looping ambience track into the output audio of one call.
+
+    The samples come from an `AmbienceLibrary` and are shared, so a mixer
+    only keeps its read position and one-frame scratch buffers, and applies
+    its volume frame by frame. Like pipecat's `SoundfileMixer` it accepts
+    `MixerUpdateSettingsFrame` with `sound` (the track name), `volume` and
+    `loop`, and `MixerEnableFrame`.
+
+    """
+
+    def __init__(
+        self,
+        library: AmbienceLibrary,
+        tracks: Mapping[str, str],
+        default_track: str,
+        volume: float = 0.4,
+        loop: bool = True,
+    ):
+        self._library = library
+        self._track_files = tracks
+        self._current = default_track
+        self._volume = max(0.0, volume)
+        self._loop = loop
+        self._enabled = True
+        self._sample_rate = 0
+        self._track: Optional[np.ndarray] = None
+        self._pos = 0
+        self._scratch = np.empty(0, dtype=np.int32)
+        self._gain_scratch = np.empty(0, dtype=np.float32)
+
+    async def start(self, sample_rate: int):
+        self._sample_rate = sample_rate
+        await self._load_track()
+
+    async def stop(self):
+        pass
+
+    async def _load_track(self):
+        file_name = self._track_files.get(self._current)
+        if file_name is None or not self._sample_rate:
+            self._track = None
+            return
+        self._track = await asyncio.to_thread(self._library.track, file_name, self._sample_rate)
+
+    async def set_track(self, name: str):
+        if name in self._track_files:
+            self._current = name
+            self._pos = 0
+            await self._load_track()
+        else:
+            logger.error(f"Sound {name} is not available")
+
+    async def set_volume(self, volume: float):
+        self._volume = max(0.0, volume)
+
+    async def process_frame(self, frame: MixerControlFrame):
+        if isinstance(frame, MixerUpdateSettingsFrame):
+            for setting, value in frame.settings.items():
+                match setting:
+                    case "sound":
+                        await self.set_track(value)
+                    case "volume":
+                        await self.set_volume(value)
+                    case "loop":
+                        self._loop = value
+        elif isinstance(frame, MixerEnableFrame):
+            self._enabled = frame.enable
+
+    def _segment(self, track: np.ndarray, n: int) -> Optional[np.ndarray]:
+        """The next `n` track samples, wrapping around if looping and padded
+        with silence otherwise. None once a track that doesn't loop is over."""
+        end = self._pos + n
+        if end <= len(track):
+            segment = track[self._pos : end]
+            self._pos = end
+            return segment
+        if self._pos >= len(track) and not self._loop:
+            return None
+
+        segment = np.zeros(n, dtype=np.int16)
+        copied = 0
+        while copied < n:
+            if self._pos >= len(track):
+                if not self._loop:
+                    break
+                self._pos = 0
+            count = min(n - copied, len(track) - self._pos)
+            segment[copied : copied + count] = track[self._pos : self._pos + count]
+            self._pos += count
+            copied += count
+        return segment
+
+    async def mix(self, audio: bytes) -> bytes:
+        track = self._track
+        if not self._enabled or track is None or self._volume == 0:
+            return audio
+
+        n = len(audio) // 2
+        segment = self._segment(track, n)
+        if segment is None:
+            return audio
+
+        # The transport mixes silence whenever the bot isn't speaking.
+        silent = audio.count(0) == len(audio)
+        if self._volume != 1.0:
+            return self._mix_scaled(segment, audio, silent)
+        if silent:
+            return segment.tobytes()
+
+        if len(self._scratch) < n:
+            self._scratch = np.empty(n, dtype=np.int32)
+        out = self._scratch[:n]
+        np.add(segment, np.frombuffer(audio, dtype=np.int16), out=out, dtype=np.int32)
+        # Cheaper than np.clip on frame-sized arrays.
+        np.minimum(out, 32767, out=out)
+        np.maximum(out, -32768, out=out)
+        return out.astype(np.int16).tobytes()
+
+    def _mix_scaled(self, segment: np.ndarray, audio: bytes, silent: bool) -> bytes:
+        n = len(segment)
+        if len(self._gain_scratch) < n:
+            self._gain_scratch = np.empty(n, dtype=np.float32)
+        out = self._gain_scratch[:n]
+        np.multiply(segment, np.float32(self._volume), out=out)
+        if not silent:
+            np.add(out, np.frombuffer(audio, dtype=np.int16), out=out)
+        np.minimum(out, 32767, out=out)
+        np.maximum(out, -32768, out=out)
+        return out.astype(np.int16).tobytes()
@@ -0,0 +1,258 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+import onnxruntime
+from loguru import logger
+
+from pipecat.audio.vad.silero import SileroOnnxModel, SileroVADAnalyzer
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+
+from app.config import settings
+
+
+class VADBatchMetrics:
+    """Process-wide batched VAD counters."""
+
+    def __init__(self):
+        self.batches = 0
+        self.chunks = 0
+        self.inline_chunks = 0
+        self.wait_seconds = 0.0
+        self.inference_seconds = 0.0
+
+    def render_prometheus(self) -> str:
+        lines = []
+        counters = (
+            ("voice_vad_batches_total", self.batches, "Batched VAD inferences."),
+            ("voice_vad_batched_chunks_total", self.chunks, "Audio chunks run in a batch."),
+            (
+                "voice_vad_inline_chunks_total",
+                self.inline_chunks,
+                "Audio chunks run on their own because the batch didn't start in time.",
+            ),
+            (
+                "voice_vad_batch_wait_seconds_total",
+                round(self.wait_seconds, 6),
+                "Time chunks spent queued before their batch started.",
+            ),
+            (
+                "voice_vad_batch_inference_seconds_total",
+                round(self.inference_seconds, 6),
+                "Time spent in batched inference.",
+            ),
+        )
+        for name, value, help_text in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class _VADRequest:
+    __slots__ = ("x", "state", "sample_rate", "queued_at", "taken", "done", "result", "error")
+
+    def __init__(self, x: np.ndarray, state: np.ndarray, sample_rate: int):
+        self.x = x
+        self.state = state
+        self.sample_rate = sample_rate
+        self.queued_at = time.monotonic()
+        # Set once the worker has taken it out of the queue, it can't be
+        # withdrawn then.
+        self.taken = False
+        # Held until the result is ready, a plain lock is a lot cheaper to
+        # wait on than a Future or an Event.
+        self.done = threading.Lock()
+        self.done.acquire()
+        self.result: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.error: Optional[Exception] = None
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.release()
+
+
+class BatchedVADInference:
+    """Runs the Silero chunks of every call in one batched inference.
+
+    Callers (the VAD analyzers, which already run in their transport's
+    executor thread) queue a chunk together with their own RNN state and
+    block until it's done. A worker thread takes whatever is queued once
+    `max_batch` chunks are waiting or the oldest one has waited
+    `max_wait_ms`, stacks them into one batch per sample rate and hands every
+    caller back its confidence and new state. The model keeps no state
+    between batches, so calls don't affect each other.
+
+    A chunk whose batch hasn't started after `timeout_ms` (the worker is
+    stuck behind a slow batch) is taken back and run on its own in the
+    caller's thread instead.
+
+    """
+
+    def __init__(
+        self,
+        session: onnxruntime.InferenceSession,
+        max_batch: int = settings.VAD_BATCH_MAX_SIZE,
+        max_wait_ms: float = settings.VAD_BATCH_MAX_WAIT_MS,
+        timeout_ms: float = settings.VAD_BATCH_TIMEOUT_MS,
+        metrics: Optional[VADBatchMetrics] = None,
+    ):
+        self._session = session
+        self._max_batch = max(1, max_batch)
+        self._max_wait = max_wait_ms / 1000
+        self._timeout = timeout_ms / 1000
+        self._metrics = metrics or vad_batch_metrics
+        self._cond = threading.Condition()
+        self._pending: Deque[_VADRequest] = deque()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="vad-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _infer(self, x: np.ndarray, state: np.ndarray, sample_rate: int):
+        return self._session.run(
+            None, {"input": x, "state": state, "sr": np.array(sample_rate, dtype="int64")}
+        )
+
+    def infer(
+        self, x: np.ndarray, state: np.ndarray, sample_rate: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Runs one chunk (with its context, shape (1, samples)) from the RNN
+        `state` (shape (2, 1, 128)). Returns the output and the new state."""
+        request = _VADRequest(x, state, sample_rate)
+        with self._cond:
+            queued = self._running
+            if queued:
+                self._pending.append(request)
+                if len(self._pending) == 1 or len(self._pending) >= self._max_batch:
+                    self._cond.notify()
+
+        if queued and not request.done.acquire(timeout=self._timeout):
+            with self._cond:
+                queued = request.taken
+                if not queued:
+                    self._pending.remove(request)
+            if queued:
+                # The batch has started, the result is moments away.
+                request.done.acquire()
+
+        if queued:
+            if request.error:
+                raise request.error
+            return request.result
+
+        self._metrics.inline_chunks += 1
+        out, new_state = self._infer(x, state, sample_rate)
+        return out, new_state
+
+    def _next_batch(self) -> Optional[List[_VADRequest]]:
+        with self._cond:
+            while self._running and not self._pending:
+                self._cond.wait()
+            if not self._pending:
+                return None
+            deadline = self._pending[0].queued_at + self._max_wait
+            while self._running and len(self._pending) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self._max_batch, len(self._pending))
+            batch = [self._pending.popleft() for _ in range(count)]
+            for r in batch:
+                r.taken = True
+            return batch
+
+    def _run_batch(self, batch: List[_VADRequest]):
+        started = time.monotonic()
+        for sample_rate in {r.sample_rate for r in batch}:
+            group = [r for r in batch if r.sample_rate == sample_rate]
+            try:
+                x = np.concatenate([r.x for r in group])
+                state = np.concatenate([r.state for r in group], axis=1)
+                out, new_state = self._infer(x, state, sample_rate)
+            except Exception as e:
+                logger.exception(f"Batched VAD inference failed: {e}")
+                for r in group:
+                    r.finish(error=e)
+                continue
+
+            for i, r in enumerate(group):
+                r.finish((out[i : i + 1], new_state[:, i : i + 1]))
+            self._metrics.batches += 1
+            self._metrics.chunks += len(group)
+            self._metrics.wait_seconds += sum(started - r.queued_at for r in group)
+        self._metrics.inference_seconds += time.monotonic() - started
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+
+class _BatchedSileroOnnxModel(SileroOnnxModel):
+    """Silero model state (RNN state and context) of one call, with the
+    inference itself done by a `BatchedVADInference`."""
+
+    def __init__(self, batcher: BatchedVADInference):
+        self._batcher = batcher
+        self.reset_states()
+        self.sample_rates = [8000, 16000]
+
+    def __call__(self, x, sr: int):
+        x, sr = self._validate_input(x, sr)
+        num_samples = 512 if sr == 16000 else 256
+        if np.shape(x) != (1, num_samples):
+            raise ValueError(
+                f"Provided audio has shape {np.shape(x)}, expected one chunk of {num_samples} samples"
+            )
+
+        context_size = 64 if sr == 16000 else 32
+        if self._last_sr != sr or np.shape(self._context)[1] != context_size:
+            self.reset_states()
+            self._context = np.zeros((1, context_size), dtype="float32")
+
+        x = np.concatenate((self._context, x), axis=1)
+        out, self._state = self._batcher.infer(x, self._state, sr)
+        self._context = x[..., -context_size:]
+        self._last_sr = sr
+        return out
+
+
+class BatchedSileroVADAnalyzer(SileroVADAnalyzer):
+    def __init__(
+        self,
+        batcher: BatchedVADInference,
+        *,
+        sample_rate: int = 16000,
+        params: VADParams = VADParams(),
+    ):
+        VADAnalyzer.__init__(self, sample_rate=sample_rate, num_channels=1, params=params)
+
+        if sample_rate != 16000 and sample_rate != 8000:
+            raise ValueError("Silero VAD sample rate needs to be 16000 or 8000")
+
+        self._model = _BatchedSileroOnnxModel(batcher)
+        self._last_reset_time = 0
+
+
+vad_batch_metrics = VADBatchMetrics()
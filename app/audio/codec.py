@@ -0,0 +1,145 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from pipecat.audio.utils import resample_audio
+
+# G.711 μ-law constants (same values CPython's audioop uses).
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 8159
+_ULAW_SEG_END = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+
+
+def _build_decode_table() -> np.ndarray:
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    t = (((u & 0x0F) << 3) + _ULAW_BIAS) << ((u & 0x70) >> 4)
+    return np.where(u & 0x80, _ULAW_BIAS - t, t - _ULAW_BIAS).astype(np.int16)
+
+
+def _build_encode_table() -> np.ndarray:
+    # Indexed by the 14-bit linear value (pcm >> 2) offset by 8192, exactly like
+    # audioop.lin2ulaw, so the table is bit-exact with the current path.
+    value = np.arange(-8192, 8192, dtype=np.int32)
+    mask = np.where(value < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(value), _ULAW_CLIP) + (_ULAW_BIAS >> 2)
+    segment = np.searchsorted(_ULAW_SEG_END, magnitude, side="left")
+    code = np.where(
+        segment >= 8,
+        0x7F,
+        (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F),
+    )
+    return (code ^ mask).astype(np.uint8)
+
+
+ULAW_DECODE_TABLE = _build_decode_table()
+ULAW_ENCODE_TABLE = _build_encode_table()
+
+
+def ulaw_decode(ulaw_bytes: bytes) -> np.ndarray:
+    """Decode μ-law bytes to int16 PCM samples with a 256-entry table."""
+    return ULAW_DECODE_TABLE[np.frombuffer(ulaw_bytes, dtype=np.uint8)]
+
+
+def ulaw_encode(samples: np.ndarray) -> bytes:
+    """Encode int16 PCM samples to μ-law bytes with a 16k-entry table."""
+    return ULAW_ENCODE_TABLE[(samples >> 2).astype(np.int32) + 8192].tobytes()
+
+
+_FILTER_CACHE: dict = {}
+
+
+def _design_lowpass(factor: int, taps_per_phase: int) -> np.ndarray:
+    """Kaiser-windowed sinc low-pass for an integer rate change of `factor`.
+
+    Filters are shared by every resampler with the same factor, only the
+    history buffers live per call.
+
+    """
+    key = (factor, taps_per_phase)
+    taps = _FILTER_CACHE.get(key)
+    if taps is None:
+        num_taps = factor * taps_per_phase
+        cutoff = 0.45 / factor
+        n = np.arange(num_taps) - (num_taps - 1) / 2
+        taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(num_taps, 8.0)
+        taps = (taps / taps.sum()).astype(np.float32)
+        taps.setflags(write=False)
+        _FILTER_CACHE[key] = taps
+    return taps
+
+
+class StreamingResampler:
+    """Polyphase FIR resampler for integer rate ratios (e.g. 8k<->16k/24k).
+
+    The filter history is carried across calls to `resample()`, so feeding a
+    stream frame by frame gives the same result as resampling it in one go and
+    there are no discontinuities at frame edges. Non-integer ratios fall back
+    to pipecat's `resample_audio`.
+
+    """
+
+    def __init__(self, in_rate: int, out_rate: int, taps_per_phase: int = 16):
+        self._in_rate = in_rate
+        self._out_rate = out_rate
+        self._up = 1
+        self._down = 1
+        self._phase = 0
+
+        if in_rate == out_rate:
+            return
+        elif out_rate % in_rate == 0:
+            self._up = out_rate // in_rate
+            taps = _design_lowpass(self._up, taps_per_phase) * self._up
+            # One row per output phase, reversed so a window dot product is a
+            # convolution.
+            self._poly = np.ascontiguousarray(taps.reshape(-1, self._up).T[:, ::-1])
+            history = taps_per_phase - 1
+        elif in_rate % out_rate == 0:
+            self._down = in_rate // out_rate
+            self._taps = np.ascontiguousarray(_design_lowpass(self._down, taps_per_phase)[::-1])
+            history = len(self._taps) - 1
+        else:
+            self._history = None
+            return
+
+        self._history = np.zeros(history, dtype=np.float32)
+
+    @property
+    def in_rate(self) -> int:
+        return self._in_rate
+
+    @property
+    def out_rate(self) -> int:
+        return self._out_rate
+
+    def reset(self):
+        if self._in_rate != self._out_rate and self._history is not None:
+            self._history[:] = 0
+            self._phase = 0
+
+    def resample(self, samples: np.ndarray) -> np.ndarray:
+        if self._in_rate == self._out_rate or not len(samples):
+            return samples
+        if self._history is None:
+            audio = resample_audio(samples.tobytes(), self._in_rate, self._out_rate)
+            return np.frombuffer(audio, dtype=np.int16)
+
+        extended = np.concatenate((self._history, samples.astype(np.float32)))
+        self._history = extended[len(extended) - len(self._history) :]
+
+        if self._up > 1:
+            windows = sliding_window_view(extended, self._poly.shape[1])
+            out = (windows @ self._poly.T).ravel()
+        else:
+            windows = sliding_window_view(extended, len(self._taps))[self._phase :: self._down]
+            out = windows @ self._taps
+            self._phase = (self._phase - len(samples)) % self._down
+
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+
+def ulaw_to_pcm(ulaw_bytes: bytes, resampler: StreamingResampler) -> bytes:
+    return resampler.resample(ulaw_decode(ulaw_bytes)).tobytes()
+
+
+def pcm_to_ulaw(pcm_bytes: bytes, resampler: StreamingResampler) -> bytes:
+    return ulaw_encode(resampler.resample(np.frombuffer(pcm_bytes, dtype=np.int16)))
@@ -0,0 +1,204 @@
+import time
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from pipecat.audio.filters.base_audio_filter import BaseAudioFilter
+from pipecat.frames.frames import FilterControlFrame, FilterEnableFrame, FilterUpdateSettingsFrame
+
+from app.config import settings
+
+# Analysis window per sample rate, 16ms either way. Frames overlap by half, so
+# the filter delays the audio by one window.
+_WINDOW_SIZES = {8000: 128, 16000: 256}
+# About 3dB per second with 20ms frames.
+_NOISE_RISE = 10 ** (3 / 10 / 50)
+
+
+class NoiseFilterMetrics:
+    """Process-wide noise filter counters."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bypassed_frames = 0
+        self.over_budget = 0
+        self.cpu_seconds = 0.0
+
+    def render_prometheus(self) -> str:
+        lines = []
+        counters = (
+            ("voice_noise_filter_frames_total", self.frames, "Input frames denoised."),
+            (
+                "voice_noise_filter_bypassed_frames_total",
+                self.bypassed_frames,
+                "Input frames passed through because the filter was over its CPU budget.",
+            ),
+            (
+                "voice_noise_filter_over_budget_total",
+                self.over_budget,
+                "Times a call's filter went over its CPU budget and was bypassed.",
+            ),
+            (
+                "voice_noise_filter_cpu_seconds_total",
+                round(self.cpu_seconds, 6),
+                "CPU time spent denoising.",
+            ),
+        )
+        for name, value, help_text in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class SpectralGateFilter(BaseAudioFilter):
+    """Streaming spectral gate for the input transport, so VAD and STT both
+    get the cleaned audio.
+
+    The noise floor of every frequency bin is tracked from the quiet parts of
+    the signal (it follows drops quickly and rises slowly), and bins that
+    aren't clearly above it are attenuated by up to `reduction_db`. Gains are
+    smoothed over time and frequency to avoid musical noise. Works on 8 and
+    16kHz audio with 16ms windows at 50% overlap, which delays the audio by
+    16ms.
+
+    If denoising a frame takes longer than `budget_ms` on average, the filter
+    bypasses itself for the rest of the call rather than fall behind. It can
+    also be switched off and on with `FilterUpdateSettingsFrame` and an
+    `enable` setting: pipecat's input transport only hands that frame to its
+    filter, `FilterEnableFrame` never gets here. At other sample rates it
+    always passes the audio through.
+
+    """
+
+    def __init__(
+        self,
+        reduction_db: float = settings.NOISE_FILTER_REDUCTION_DB,
+        budget_ms: float = settings.NOISE_FILTER_BUDGET_MS,
+        metrics: Optional[NoiseFilterMetrics] = None,
+    ):
+        self._floor = 10 ** (-reduction_db / 20)
+        self._budget = budget_ms / 1000
+        self._metrics = metrics or noise_filter_metrics
+        self._enabled = True
+        self._supported = False
+        self._over_budget = False
+        self._cost = 0.0
+        self._sample_rate = 0
+
+    async def start(self, sample_rate: int):
+        self._sample_rate = sample_rate
+        size = _WINDOW_SIZES.get(sample_rate)
+        if not size:
+            logger.warning(f"Noise filter doesn't support {sample_rate}Hz, bypassing it")
+            self._supported = False
+            return
+
+        self._supported = True
+        self._size = size
+        self._hop = size // 2
+        # sqrt-Hann for analysis and synthesis adds up to one at 50% overlap.
+        self._window = np.sqrt(np.hanning(size + 1)[:size]).astype(np.float32)
+        bins = size // 2 + 1
+        self._noise: Optional[np.ndarray] = None
+        self._power = np.zeros(bins, dtype=np.float32)
+        # Samples not analysed yet, starting with the second half of the last
+        # window, and the overlap-add tail of the last window.
+        self._pending = np.zeros(self._hop, dtype=np.float32)
+        self._tail = np.zeros(self._hop, dtype=np.float32)
+        # Output ready to go out, primed with one hop of silence so there's
+        # always enough for a whole frame.
+        self._output = np.zeros(self._hop, dtype=np.float32)
+
+    async def stop(self):
+        pass
+
+    async def process_frame(self, frame: FilterControlFrame):
+        if isinstance(frame, FilterEnableFrame):
+            self._enabled = frame.enable
+        elif isinstance(frame, FilterUpdateSettingsFrame):
+            for setting, value in frame.settings.items():
+                match setting:
+                    case "enable":
+                        self._enabled = bool(value)
+                    case "reduction_db":
+                        self._floor = 10 ** (-value / 20)
+                    case "budget_ms":
+                        self._budget = value / 1000
+
+    def _update_noise(self, power: np.ndarray):
+        level = power.mean(axis=0)
+        if self._noise is None:
+            self._noise = level
+            return
+        # Follow the noise down quickly, but up by at most _NOISE_RISE per
+        # frame so speech isn't mistaken for noise.
+        self._noise = np.where(
+            level < self._noise,
+            0.7 * self._noise + 0.3 * level,
+            np.minimum(level, self._noise * _NOISE_RISE),
+        )
+
+    def _denoise(self, samples: np.ndarray) -> np.ndarray:
+        hop = self._hop
+        pending = np.concatenate((self._pending, samples))
+        count = (len(pending) - self._size) // hop + 1 if len(pending) >= self._size else 0
+
+        if count:
+            # All the windows that are complete, analysed at once.
+            starts = np.arange(count)[:, None] * hop
+            windows = pending[starts + np.arange(self._size)] * self._window
+            spectrum = np.fft.rfft(windows, axis=1)
+            power = spectrum.real**2 + spectrum.imag**2
+            if self._noise is None:
+                self._update_noise(power)
+
+            # Power smoothed over time, so random peaks of the noise don't
+            # open the gate (which sounds like musical noise).
+            for i in range(count):
+                self._power = 0.5 * self._power + 0.5 * power[i]
+                power[i] = self._power
+            snr = power / (self._noise + 1e-6)
+            gain = np.clip(1.0 - 2.0 / np.maximum(snr, 1e-6), self._floor, 1.0)
+            self._update_noise(power)
+
+            frames = np.fft.irfft(spectrum * gain, n=self._size, axis=1) * self._window
+            out = np.empty(count * hop, dtype=np.float32)
+            tail = self._tail
+            for i in range(count):
+                out[i * hop : (i + 1) * hop] = tail + frames[i, :hop]
+                tail = frames[i, hop:]
+            self._tail = tail
+            self._output = np.concatenate((self._output, out))
+            pending = pending[count * hop :]
+
+        self._pending = pending
+        result, self._output = self._output[: len(samples)], self._output[len(samples) :]
+        return result
+
+    async def filter(self, audio: bytes) -> bytes:
+        if not self._supported or not self._enabled or self._over_budget or not audio:
+            if self._over_budget:
+                self._metrics.bypassed_frames += 1
+            return audio
+
+        start = time.perf_counter()
+        samples = np.frombuffer(audio, dtype=np.int16).astype(np.float32)
+        out = self._denoise(samples)
+        result = np.clip(out, -32768, 32767).astype(np.int16).tobytes()
+        cost = time.perf_counter() - start
+
+        self._metrics.frames += 1
+        self._metrics.cpu_seconds += cost
+        self._cost = cost if not self._cost else 0.9 * self._cost + 0.1 * cost
+        if self._cost > self._budget:
+            self._over_budget = True
+            self._metrics.over_budget += 1
+            logger.warning(
+                f"Noise filter over budget ({self._cost * 1000:.2f}ms per frame), bypassing it"
+            )
+        return result
+
+
+noise_filter_metrics = NoiseFilterMetrics()
@@ -6,26 +6,38 @@
 
 import os
 import sys
+import time
+from typing import List, Optional
 
 from dotenv import load_dotenv
 from loguru import logger
 
-from pipecat.audio.vad.silero import SileroVADAnalyzer
 from pipecat.pipeline.pipeline import Pipeline
 from pipecat.pipeline.runner import PipelineRunner
 from pipecat.pipeline.task import PipelineParams, PipelineTask
 from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.processors.frame_processor import FrameProcessor
 from app.plivo import PlivoFrameSerializer
-from pipecat.services.cartesia import CartesiaTTSService
-from pipecat.services.elevenlabs import ElevenLabsTTSService
-from pipecat.services.deepgram import DeepgramSTTService
-from pipecat.services.openai import OpenAILLMService
-from pipecat.audio.mixers.soundfile_mixer import SoundfileMixer
 from pipecat.processors.transcript_processor import TranscriptProcessor
-from pipecat.transports.network.fastapi_websocket import (
-    FastAPIWebsocketParams,
-    FastAPIWebsocketTransport,
+from pipecat.frames.frames import TTSAudioRawFrame
+from pipecat.utils.time import time_now_iso8601
+from app.config import settings
+from app.audio.noise_filter import SpectralGateFilter
+from app.services.agent_profiles import (
+    AMBIENCE_FILES,
+    AUDIO_OUT_SAMPLE_RATE,
+    AgentTemplate,
+    agent_registry,
 )
+from app.services.bot_resources import SharedOpenAILLMService, bot_resources
+from app.services.context_window import ContextWindowManager
+from app.services.greeting_cache import greeting_cache
+from app.services.latency_metrics import LatencyProbe, TurnLatencyTracker, latency_registry
+from app.services.transcript_store import CallTranscript, transcript_sink
+from app.services.speculative_llm import SpeculativeOpenAILLMService
+from app.services.text_chunker import TextChunker
+from app.services.tools import ToolRunner
+from app.transport import CoalescingWebsocketParams, CoalescingWebsocketTransport
 
 load_dotenv(override=True)
 
@@ -40,71 +52,174 @@ logger.add(sys.stderr, format="{time} {level} {message}", level="INFO")
 logger.add(sys.stderr, level="DEBUG")
 
 
-class TranscriptHandler:
-    def __init__(self):
-        self.messages = []
+async def warmup():
+    """Load the shared VAD session and ambience sounds before the first call."""
+    await bot_resources.warmup(AMBIENCE_FILES, AUDIO_OUT_SAMPLE_RATE)
+    for template in agent_registry.templates():
+        if (
+            template.greeting_spec
+            and settings.GREETING_CACHE_ENABLED
+            and settings.GREETING_CACHE_WARMUP
+        ):
+            greeting_cache.fill(template.greeting_spec)
 
-    async def on_transcript_update(self, processor, frame):
-        self.messages.extend(frame.messages)
 
-        # Log new messages with timestamps
-        for msg in frame.messages:
-            timestamp = f"[{msg.timestamp}] " if msg.timestamp else ""
-            print(f"TTTT: {timestamp}{msg.role}: {msg.content}")
+def _uses_phrase_cache(template: AgentTemplate) -> bool:
+    return template.profile.tts_provider == "elevenlabs" and settings.TTS_CACHE_ENABLED
 
 
-async def run_bot(websocket_client, stream_sid):
-    mixer = SoundfileMixer(
-        sound_files={
-            "office": os.path.join(os.path.dirname(__file__), "office_ambience.wav")
-        },
-        default_sound="office",
-        volume=1.0,
+def provider_modules(template: Optional[AgentTemplate] = None) -> List[str]:
+    """The provider service modules calls of `template` use. They're only
+    imported once a profile needs them, see `app.startup.load_bot`."""
+    template = template or agent_registry.default()
+    modules = ["pipecat.services.deepgram"]
+    if template.profile.tts_provider == "cartesia":
+        modules.append("pipecat.services.cartesia")
+    elif _uses_phrase_cache(template):
+        modules.append("app.services.tts_cache")
+    else:
+        modules.append("pipecat.services.elevenlabs")
+    return modules
+
+
+def create_stt(template: AgentTemplate):
+    from pipecat.services.deepgram import DeepgramSTTService
+
+    return DeepgramSTTService(api_key=os.getenv("DEEPGRAM_API_KEY"))
+
+
+def create_llm(template: AgentTemplate):
+    model = template.profile.llm_model
+    if settings.LLM_SPECULATION_ENABLED:
+        return SpeculativeOpenAILLMService(
+            bot_resources, api_key=os.getenv("OPENAI_API_KEY"), model=model
+        )
+    return SharedOpenAILLMService(bot_resources, api_key=os.getenv("OPENAI_API_KEY"), model=model)
+
+
+def create_tts(template: AgentTemplate):
+    profile = template.profile
+    if profile.tts_provider == "cartesia":
+        from pipecat.services.cartesia import CartesiaTTSService
+
+        return CartesiaTTSService(
+            api_key=os.getenv("CARTESIA_API_KEY"),
+            voice_id=profile.voice_id,
+            model=template.tts_model,
+        )
+    if _uses_phrase_cache(template):
+        from app.services.tts_cache import CachedElevenLabsTTSService, phrase_cache
+
+        return CachedElevenLabsTTSService(
+            cache=phrase_cache,
+            api_key=os.getenv("ELEVEN_API_KEY"),
+            voice_id=profile.voice_id,
+            model=template.tts_model,
+            aiohttp_session=bot_resources.http_session(),
+            # Sentences are replaced by the TextChunker in front of it.
+            aggregate_sentences=not settings.TTS_CHUNKING_ENABLED,
+        )
+    from pipecat.services.elevenlabs import ElevenLabsTTSService
+
+    return ElevenLabsTTSService(
+        api_key=os.getenv("ELEVEN_API_KEY"),
+        voice_id=profile.voice_id,
+        model=template.tts_model,
     )
 
-    transport = FastAPIWebsocketTransport(
+
+async def run_bot(
+    websocket_client,
+    stream_sid,
+    call_uuid,
+    template: Optional[AgentTemplate] = None,
+):
+    setup_start = time.perf_counter()
+
+    template = template or agent_registry.default()
+    profile = template.profile
+
+    mixer = None
+    if profile.ambience:
+        mixer = bot_resources.mixer(
+            sound_files=template.ambience_files,
+            default_sound=profile.ambience,
+            volume=profile.ambience_volume,
+        )
+
+    noise_filter = None
+    if settings.NOISE_FILTER_ENABLED and profile.noise_filter:
+        noise_filter = SpectralGateFilter()
+
+    transport = CoalescingWebsocketTransport(
         websocket=websocket_client,
-        params=FastAPIWebsocketParams(
+        params=CoalescingWebsocketParams(
             audio_out_enabled=True,
+            audio_out_sample_rate=AUDIO_OUT_SAMPLE_RATE,
+            audio_in_filter=noise_filter,  # Runs before VAD and STT
             add_wav_header=False,
             vad_enabled=True,
-            vad_analyzer=SileroVADAnalyzer(),
+            vad_analyzer=bot_resources.vad_analyzer(params=template.vad_params),
             vad_audio_passthrough=True,
             serializer=PlivoFrameSerializer(stream_sid),
             audio_out_mixer=mixer,
+            audio_out_coalesce_ms=settings.AUDIO_OUT_COALESCE_MS,
+            audio_out_max_jitter_ms=settings.AUDIO_OUT_MAX_JITTER_MS,
         ),
     )
 
-    llm = OpenAILLMService(api_key=os.getenv("OPENAI_API_KEY"), model="gpt-4o-mini")
+    llm = create_llm(template)
+    stt = create_stt(template)
+    tts = create_tts(template)
 
-    stt = DeepgramSTTService(api_key=os.getenv("DEEPGRAM_API_KEY"))
+    messages = template.initial_messages()
 
-    tts = ElevenLabsTTSService(
-        api_key=os.getenv("ELEVEN_API_KEY"),
-        voice_id="vghiSqG5ezdhd8F3tKAD",
-    )
-
-    messages = [
-        {
-            "role": "system",
-            "content": "You are a helpful LLM in an audio call. Your goal is to demonstrate your capabilities in a succinct way. Your output will be converted to audio so don't include special characters in your answers. Respond to what the user said in a creative and helpful way.",
-        },
-    ]
-
-    context = OpenAILLMContext(messages)
+    # Tool calls run in parallel, see ToolRunner.
+    tools = None
+    if template.tools:
+        tools = ToolRunner(
+            template.tools,
+            call_uuid,
+            bot_resources.http_session,
+            filler=profile.tool_filler,
+        )
+        tools.register(llm)
+        context = OpenAILLMContext(messages, tools=template.tool_schemas)
+    else:
+        context = OpenAILLMContext(messages)
     context_aggregator = llm.create_context_aggregator(context)
+    context_manager = ContextWindowManager(template.context_window)
 
     transcript = TranscriptProcessor()
 
+    latency = TurnLatencyTracker(stream_sid, latency_registry)
+
+    # Starts LLM requests on interim transcripts, see SpeculativeOpenAILLMService.
+    speculation = []
+    if isinstance(llm, SpeculativeOpenAILLMService):
+        speculation.append(llm.speculation_trigger(context))
+
+    # The websocket ElevenLabs service always aggregates sentences itself.
+    chunker = []
+    if settings.TTS_CHUNKING_ENABLED and _uses_phrase_cache(template):
+        chunker.append(TextChunker())
+
     pipeline = Pipeline(
         [
             transport.input(),  # Websocket input from client
             stt,  # Speech-To-Text
+            LatencyProbe(latency),
+            *speculation,
             transcript.user(),
             context_aggregator.user(),
+            context_manager,  # Keeps the context within its token budget
             llm,  # LLM
+            LatencyProbe(latency),
+            *chunker,
             tts,  # Text-To-Speech
+            LatencyProbe(latency),
             transport.output(),  # Websocket output to client
+            LatencyProbe(latency),
             context_aggregator.assistant(),
             transcript.assistant(),
         ]
@@ -112,19 +227,34 @@ async def run_bot(websocket_client, stream_sid):
 
     task = PipelineTask(pipeline, params=PipelineParams(allow_interruptions=True))
 
-    handler = TranscriptHandler()
+    call_transcript = CallTranscript(call_uuid, transcript_sink)
 
     @transcript.event_handler("on_transcript_update")
     async def on_update(processor, frame):
-        await handler.on_transcript_update(processor, frame)
+        await call_transcript.on_transcript_update(processor, frame)
 
     @transport.event_handler("on_client_connected")
     async def on_client_connected(transport, client):
         # Kick off the conversation.
-        messages.append(
-            {"role": "system", "content": "Please introduce yourself to the user."}
-        )
-        await task.queue_frames([context_aggregator.user().get_context_frame()])
+        messages.append(template.intro_message())
+
+        greeting = None
+        if settings.GREETING_CACHE_ENABLED and template.greeting_spec:
+            greeting = await greeting_cache.get(template.greeting_spec)
+            if not greeting:
+                greeting_cache.fill(template.greeting_spec)
+
+        if greeting:
+            # Play the cached opening line straight away and record it in the
+            # context and the transcript as if the LLM had just said it. It
+            # doesn't pass the transcript processor on its way out.
+            messages.append({"role": "assistant", "content": greeting.text})
+            call_transcript.add("assistant", greeting.text, time_now_iso8601())
+            await transport.output().queue_frame(
+                TTSAudioRawFrame(greeting.audio, greeting.sample_rate, 1)
+            )
+        else:
+            await task.queue_frames([context_aggregator.user().get_context_frame()])
 
     @transport.event_handler("on_client_disconnected")
     async def on_client_disconnected(transport, client):
@@ -132,4 +262,23 @@ async def run_bot(websocket_client, stream_sid):
 
     runner = PipelineRunner(handle_sigint=False)
 
-    await runner.run(task)
+    setup_time = time.perf_counter() - setup_start
+    bot_resources.record_setup(setup_time)
+    logger.info(f"Call pipeline set up in {setup_time:.3f}s")
+
+    try:
+        await runner.run(task)
+    finally:
+        # Pipeline.cleanup cleans up the processors in it but leaves the
+        # pipeline's own frame tasks running.
+        await FrameProcessor.cleanup(pipeline)
+    if tools:
+        await tools.cancel()
+
+    logger.info(f"Agent for stream {stream_sid}: {template.name}")
+    logger.info(f"Turn latencies for stream {stream_sid}: {latency.summary()}")
+    logger.info(f"Prompt size for stream {stream_sid}: {context_manager.summary()}")
+    if isinstance(llm, SpeculativeOpenAILLMService):
+        logger.info(f"Speculation for stream {stream_sid}: {llm.speculation_summary()}")
+
+    return await call_transcript.messages()
@@ -7,12 +7,24 @@ class Settings(BaseSettings):
     PLIVO_AUTH_ID: str
     PLIVO_AUTH_TOKEN: str
     PLIVO_FROM_NUMBER: str
+    PLIVO_API_URL: str = "https://api.plivo.com/v1"
+    PLIVO_MAX_CONCURRENCY: int = 20
+    PLIVO_TIMEOUT_SECONDS: float = 10.0
+    PLIVO_MAX_RETRIES: int = 3
 
     # AWS S3 credentials
     AWS_ACCESS_KEY_ID: str = "your_aws_access_key"
     AWS_SECRET_ACCESS_KEY: str = "your_aws_secret_key"
     AWS_REGION: str = "us-east-1"
     S3_BUCKET_NAME: str = "your-bucket-name"
+    # Set to use an S3-compatible endpoint (e.g. a local stub).
+    S3_ENDPOINT_URL: Optional[str] = None
+
+    # Recording ingestion
+    RECORDING_UPLOAD_CONCURRENCY: int = 4
+    RECORDING_QUEUE_SIZE: int = 1000
+    RECORDING_MAX_RETRIES: int = 3
+    RECORDING_PART_SIZE: int = 8 * 1024 * 1024
 
     # Application settings
     APP_NAME: str = "PipeCat AI Voice Agent"
@@ -30,6 +42,133 @@ class Settings(BaseSettings):
     TWILIO_ACCOUNT_SID: str = "your_twilio_account_sid"
     TWILIO_AUTH_TOKEN: str = "your_twilio_auth_token"
 
+    # Outbound audio: size of each playAudio message and the maximum time audio
+    # is held back to fill one.
+    AUDIO_OUT_COALESCE_MS: int = 40
+    AUDIO_OUT_MAX_JITTER_MS: int = 60
+
+    # Import the bot and the providers of every agent profile and load the
+    # shared resources in the background once the server is listening.
+    # Otherwise the first call that needs them does.
+    STARTUP_WARMUP: bool = True
+
+    # Cache of the synthesized opening line, keyed by prompt, voice and TTS
+    # settings. With warmup enabled it's synthesized at startup.
+    GREETING_CACHE_ENABLED: bool = True
+    GREETING_CACHE_DIR: str = ".cache/greetings"
+    GREETING_CACHE_MAX_BYTES: int = 50 * 1024 * 1024
+    GREETING_CACHE_WARMUP: bool = False
+
+    # Phrase-level TTS cache. Phrases longer than TTS_CACHE_MAX_PHRASE_CHARS
+    # are always synthesized.
+    TTS_CACHE_ENABLED: bool = True
+    TTS_CACHE_DIR: str = ".cache/tts"
+    TTS_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024
+    TTS_CACHE_DISK_BYTES: int = 512 * 1024 * 1024
+    TTS_CACHE_MAX_PHRASE_CHARS: int = 120
+
+    # Agent profiles: a JSON file with a list of profiles, registered next to
+    # the built-in "default" one. DEFAULT_AGENT is used when a call doesn't
+    # choose one.
+    AGENT_PROFILES_FILE: Optional[str] = None
+    DEFAULT_AGENT: str = "default"
+
+    # Spectral gate on the caller's audio, before VAD and STT. A call's filter
+    # is bypassed if it takes longer than NOISE_FILTER_BUDGET_MS per frame.
+    NOISE_FILTER_ENABLED: bool = False
+    NOISE_FILTER_REDUCTION_DB: float = 12.0
+    NOISE_FILTER_BUDGET_MS: float = 2.0
+
+    # Run the Silero VAD of all calls in shared batches. A batch starts once
+    # VAD_BATCH_MAX_SIZE chunks are queued or the oldest has waited
+    # VAD_BATCH_MAX_WAIT_MS. A chunk still queued after VAD_BATCH_TIMEOUT_MS
+    # is run on its own.
+    VAD_BATCHING_ENABLED: bool = True
+    VAD_BATCH_MAX_SIZE: int = 64
+    VAD_BATCH_MAX_WAIT_MS: float = 4.0
+    VAD_BATCH_TIMEOUT_MS: float = 20.0
+
+    # Function calling: the agent's filler phrase is spoken if tools are still
+    # running after TOOL_FILLER_AFTER_MS. Results of tools with a cache TTL
+    # are shared by all calls.
+    TOOL_FILLER_AFTER_MS: int = 1200
+    TOOL_CACHE_MAX_ENTRIES: int = 10000
+
+    # Decoded, resampled ambience tracks, memory-mapped by every worker.
+    AMBIENCE_CACHE_DIR: str = ".cache/ambience"
+
+    # Split LLM text into clause-sized chunks for the HTTP TTS, with a short
+    # first chunk, instead of waiting for whole sentences.
+    TTS_CHUNKING_ENABLED: bool = True
+
+    # Call status store: "memory" (single worker) or "sqlite" (shared by all
+    # workers on the host).
+    CALL_STATE_BACKEND: str = "memory"
+    CALL_STATE_SQLITE_PATH: str = ".cache/call_state.db"
+    CALL_STATE_TTL_SECONDS: int = 24 * 60 * 60
+
+    # LLM context window: older turns beyond the budget are folded into a
+    # rolling summary.
+    LLM_CONTEXT_WINDOW_ENABLED: bool = True
+    LLM_CONTEXT_MAX_TOKENS: int = 3000
+    LLM_CONTEXT_SUMMARY_MODEL: str = "gpt-4o-mini"
+
+    # Speculative LLM requests on interim transcripts.
+    LLM_SPECULATION_ENABLED: bool = False
+    LLM_SPECULATION_MAX_PER_TURN: int = 2
+    LLM_SPECULATION_STABLE_SECS: float = 0.3
+
+    # Transcripts: "jsonl" (a file per call) or "sqlite".
+    TRANSCRIPT_BACKEND: str = "jsonl"
+    TRANSCRIPT_DIR: str = ".cache/transcripts"
+    TRANSCRIPT_SQLITE_PATH: str = ".cache/transcripts.db"
+    TRANSCRIPT_QUEUE_SIZE: int = 10000
+    TRANSCRIPT_BATCH_SIZE: int = 200
+    TRANSCRIPT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    TRANSCRIPT_TAIL_MESSAGES: int = 50
+
+    # Post-call analysis (summary, sentiment, disposition, extracted fields),
+    # one LLM request per call. Jobs are kept in ANALYSIS_DB_PATH and run by
+    # ANALYSIS_WORKERS processes per web worker, each running up to
+    # ANALYSIS_CONCURRENCY requests at a lower CPU priority. With 0 workers,
+    # run `python -m app.services.call_analysis` separately.
+    ANALYSIS_ENABLED: bool = False
+    ANALYSIS_DB_PATH: str = ".cache/analysis.db"
+    ANALYSIS_WORKERS: int = 1
+    ANALYSIS_CONCURRENCY: int = 8
+    ANALYSIS_MODEL: str = "gpt-4o-mini"
+    ANALYSIS_LEASE_SECONDS: float = 120.0
+    ANALYSIS_POLL_SECONDS: float = 1.0
+    ANALYSIS_MAX_ATTEMPTS: int = 3
+    ANALYSIS_NICENESS: int = 10
+
+    # Admission control: the answer webhook turns a call away while this
+    # process has ADMISSION_MAX_SESSIONS bots, event loop lag over
+    # ADMISSION_MAX_LOOP_LAG_MS, or no room left under
+    # ADMISSION_MAX_CPU_PERCENT (of one core) for one more call.
+    # ADMISSION_CPU_PERCENT_PER_CALL is the cost of a call until it's
+    # measured. Shed calls hear ADMISSION_HANGUP_MESSAGE and are hung up, or
+    # with ADMISSION_FALLBACK "queue" hear ADMISSION_QUEUE_MUSIC_URL and try
+    # again, up to ADMISSION_QUEUE_MAX_ATTEMPTS times.
+    ADMISSION_MAX_SESSIONS: int = 50
+    ADMISSION_MAX_LOOP_LAG_MS: float = 100.0
+    ADMISSION_MAX_CPU_PERCENT: float = 85.0
+    ADMISSION_CPU_PERCENT_PER_CALL: float = 2.0
+    ADMISSION_RESERVATION_SECONDS: float = 30.0
+    ADMISSION_FALLBACK: str = "hangup"
+    ADMISSION_HANGUP_MESSAGE: str = (
+        "Sorry, all our agents are busy right now. Please try again in a few minutes."
+    )
+    ADMISSION_QUEUE_MUSIC_URL: str = (
+        "https://ontune.s3.ap-south-1.amazonaws.com/ringbacktone-original.mp3"
+    )
+    ADMISSION_QUEUE_MAX_ATTEMPTS: int = 3
+
+    # Campaign dialer
+    CAMPAIGN_CPS: float = 2.0
+    CAMPAIGN_MAX_CONCURRENT_CALLS: int = 50
+    CAMPAIGN_RING_TIMEOUT_SECONDS: int = 60
+
     # Other Settings
     NGROK_AUTH_TOKEN: str = "your_ngrok_auth_token"
     FIXA_KEY: str = "your_fixa_key"
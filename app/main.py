@@ -1,8 +1,10 @@
+from typing import Optional
+
 from fastapi import FastAPI, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse
 from loguru import logger
 from dotenv import load_dotenv
 import os
-import json  # Add this import
 
 # Load environment variables at startup
 load_dotenv()
@@ -10,7 +12,23 @@ load_dotenv()
 from app.config import settings
 from app.api.routes import router as api_router
 from app.api.websocket import handle_voice_websocket
-from app.bot import run_bot
+from app.services.admission import admission_controller, admission_metrics
+from app.services.call_analysis import analysis_service
+from app.services.plivo_client import plivo_client
+from app.services.recording_service import recording_service
+from app.services.transcript_store import transcript_sink
+from app.startup import imported, start_warmup, stop_warmup, warmup_state
+
+# Metrics of the modules calls load, see app.startup. Until one is imported
+# nothing has been counted, so it's left out.
+CALL_METRICS = (
+    ("app.services.latency_metrics", "latency_registry"),
+    ("app.services.context_window", "context_metrics"),
+    ("app.services.speculative_llm", "speculation_metrics"),
+    ("app.audio.noise_filter", "noise_filter_metrics"),
+    ("app.audio.batched_vad", "vad_batch_metrics"),
+    ("app.services.tools", "tool_metrics"),
+)
 
 app = FastAPI(
     title="Ontune AI Voice Agent",
@@ -22,28 +40,43 @@ app = FastAPI(
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting up PipeCat AI Voice Agent")
+    await recording_service.start()
+    await transcript_sink.start()
+    await analysis_service.start()
+    await admission_controller.start()
+    # Runs once the server is listening.
+    start_warmup()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down PipeCat AI Voice Agent")
+    await stop_warmup()
+    await recording_service.stop()
+    await transcript_sink.stop()
+    await analysis_service.stop()
+    await admission_controller.stop()
+    await plivo_client.close()
+    resources = imported("app.services.bot_resources")
+    if resources:
+        await resources.bot_resources.close()
 
 
 @app.websocket("/ws/voice/{call_uuid}")
-async def voice_websocket_endpoint(websocket: WebSocket, call_uuid: str):
+async def voice_websocket_endpoint(
+    websocket: WebSocket, call_uuid: str, agent: Optional[str] = None
+):
+    logger.info(f"New WebSocket connection for call UUID:............. {call_uuid}")
+    # Streams normally come from calls admitted by the answer webhook, any
+    # other is refused once the session limit is reached.
+    if not admission_controller.open_session(call_uuid):
+        logger.warning(f"Refusing stream for call {call_uuid}: session limit reached")
+        await websocket.close(code=1013)
+        return
     try:
-        logger.info(f"New WebSocket connection for call UUID:............. {call_uuid}")
-        await websocket.accept()
-        start_data = websocket.iter_text()
-        await start_data.__anext__()
-        call_data = json.loads(await start_data.__anext__())
-        print(call_data, flush=True)
-        stream_sid = call_data["streamId"]
-        print("WebSocket connection accepted")
-        await run_bot(websocket, stream_sid)
-    except Exception as e:
-        logger.error(f"WebSocket error: {e}")
+        await handle_voice_websocket(websocket, call_uuid, agent)
     finally:
+        admission_controller.close_session(call_uuid)
         # Ensure proper cleanup
         try:
             await websocket.close()
@@ -51,6 +84,27 @@ async def voice_websocket_endpoint(websocket: WebSocket, call_uuid: str):
             pass
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Turn latency and prompt size metrics in Prometheus text format."""
+    parts = []
+    for module_name, name in CALL_METRICS:
+        module = imported(module_name)
+        if module:
+            parts.append(getattr(module, name).render_prometheus())
+    parts.append(admission_metrics.render_prometheus())
+    return PlainTextResponse("".join(parts), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def ready():
+    """503 until the startup warmup is done, so new workers only get calls
+    once they can set them up quickly."""
+    state = warmup_state()
+    status_code = 503 if state["status"] in ("pending", "running") else 200
+    return JSONResponse(state, status_code=status_code)
+
+
 app.include_router(api_router, prefix="/api/v1")
 
 if __name__ == "__main__":
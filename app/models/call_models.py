@@ -1,7 +1,8 @@
 from enum import Enum
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, TypedDict
+from typing_extensions import Literal
 
 
 class CallState(str, Enum):
@@ -10,6 +11,7 @@ class CallState(str, Enum):
     COMPLETED = "COMPLETED"
     FAILED = "FAILED"
     USERBUSY = "USERBUSY"
+    REJECTED = "REJECTED"
 
 
 class CallRecord(BaseModel):
@@ -18,7 +20,9 @@ class CallRecord(BaseModel):
     to_number: str
     direction: str  # inbound or outbound
     state: CallState
+    plivo_call_uuid: Optional[str] = None
     start_time: Optional[datetime] = None
+    answer_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     duration: Optional[int] = None
     recording_url: Optional[str] = None
@@ -27,3 +31,37 @@ class CallRecord(BaseModel):
 
     class Config:
         use_enum_values = True
+
+
+class CallStatus(TypedDict):
+    status: Literal["in_progress", "completed", "error"]
+    # OpenAI chat messages.
+    transcript: Optional[List[dict]]
+    stereo_recording_url: Optional[str]
+    s3_recording_path: Optional[str]
+    error: Optional[str]
+
+
+class CampaignStatus(str, Enum):
+    RUNNING = "RUNNING"
+    PAUSED = "PAUSED"
+    COMPLETED = "COMPLETED"
+    CANCELLED = "CANCELLED"
+
+
+class CampaignRequest(BaseModel):
+    numbers: List[str]
+    agent: Optional[str] = None
+
+
+class CampaignProgress(BaseModel):
+    campaign_id: str
+    status: CampaignStatus
+    total: int
+    dialed: int
+    remaining: int
+    states: Dict[str, int]
+    created_at: datetime
+
+    class Config:
+        use_enum_values = True
@@ -6,10 +6,10 @@
 
 import base64
 import json
+import re
 
 from pydantic import BaseModel
 
-from pipecat.audio.utils import pcm_to_ulaw, ulaw_to_pcm
 from pipecat.frames.frames import (
     AudioRawFrame,
     Frame,
@@ -20,6 +20,39 @@ from pipecat.frames.frames import (
 )
 from pipecat.serializers.base_serializer import FrameSerializer, FrameSerializerType
 
+from app.audio.codec import StreamingResampler, pcm_to_ulaw, ulaw_to_pcm
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ModuleNotFoundError:
+    _json_loads = json.loads
+
+# Plivo sends ~50 media events/sec per call and we only need two fields out of
+# them, so we sniff those instead of building the whole object graph.
+_EVENT_RE = re.compile(r'"event"\s*:\s*"([^"]*)"')
+_PAYLOAD_RE = re.compile(r'"payload"\s*:\s*"([^"]*)"')
+_PAYLOAD_PLACEHOLDER = "<payload>"
+
+
+def _sniff_media_payload(data: str) -> str | None:
+    """Returns the base64 payload of a `media` event, or None if the message
+    is something else (or something we can't sniff safely) and needs a full
+    parse.
+
+    """
+    event = _EVENT_RE.search(data)
+    if not event or event.group(1) != "media":
+        return None
+    payload = _PAYLOAD_RE.search(data, event.end())
+    if not payload:
+        payload = _PAYLOAD_RE.search(data)
+    # Escaped characters (e.g. "\/") mean the string isn't raw base64.
+    if not payload or "\\" in payload.group(1):
+        return None
+    return payload.group(1)
+
 
 class PlivoFrameSerializer(FrameSerializer):
     class InputParams(BaseModel):
@@ -30,6 +63,29 @@ class PlivoFrameSerializer(FrameSerializer):
         self._stream_sid = stream_sid
         self._params = params
 
+        # Resamplers keep their filter history for the lifetime of the call so
+        # frame edges are continuous.
+        self._in_resampler = StreamingResampler(params.twilio_sample_rate, params.sample_rate)
+        self._out_resampler: StreamingResampler | None = None
+
+        # Everything in the outbound envelopes but the payload is fixed for the
+        # stream, so build the JSON once and only splice the payload in.
+        play_audio = json.dumps(
+            {
+                "event": "playAudio",
+                "streamSid": stream_sid,
+                "media": {
+                    "payload": _PAYLOAD_PLACEHOLDER,
+                    "contentType": "audio/x-mulaw",
+                    "sampleRate": params.twilio_sample_rate,
+                },
+            }
+        )
+        self._play_audio_prefix, self._play_audio_suffix = play_audio.split(
+            _PAYLOAD_PLACEHOLDER, 1
+        )
+        self._clear = json.dumps({"event": "clear", "streamSid": stream_sid})
+
     @property
     def type(self) -> FrameSerializerType:
         return FrameSerializerType.TEXT
@@ -38,34 +94,33 @@ class PlivoFrameSerializer(FrameSerializer):
         if isinstance(frame, AudioRawFrame):
             data = frame.audio
 
-            serialized_data = pcm_to_ulaw(data, frame.sample_rate, self._params.twilio_sample_rate)
-            payload = base64.b64encode(serialized_data).decode("utf-8")
-            answer = {
-                "event": "playAudio",
-                "streamSid": self._stream_sid,
-                "media": {"payload": payload, "contentType": "audio/x-mulaw", "sampleRate": 8000},
-            }
+            if not self._out_resampler or self._out_resampler.in_rate != frame.sample_rate:
+                self._out_resampler = StreamingResampler(
+                    frame.sample_rate, self._params.twilio_sample_rate
+                )
+
+            serialized_data = pcm_to_ulaw(data, self._out_resampler)
+            payload = base64.b64encode(serialized_data).decode("ascii")
 
-            return json.dumps(answer)
+            return self._play_audio_prefix + payload + self._play_audio_suffix
 
         if isinstance(frame, StartInterruptionFrame):
-            answer = {"event": "clear", "streamSid": self._stream_sid}
-            return json.dumps(answer)
+            if self._out_resampler:
+                self._out_resampler.reset()
+            return self._clear
 
     def deserialize(self, data: str | bytes) -> Frame | None:
-        message = json.loads(data)
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+
+        payload_base64 = _sniff_media_payload(data)
+        if payload_base64 is not None:
+            return self._deserialize_media(payload_base64)
+
+        message = _json_loads(data)
 
         if message["event"] == "media":
-            payload_base64 = message["media"]["payload"]
-            payload = base64.b64decode(payload_base64)
-
-            deserialized_data = ulaw_to_pcm(
-                payload, self._params.twilio_sample_rate, self._params.sample_rate
-            )
-            audio_frame = InputAudioRawFrame(
-                audio=deserialized_data, num_channels=1, sample_rate=self._params.sample_rate
-            )
-            return audio_frame
+            return self._deserialize_media(message["media"]["payload"])
         elif message["event"] == "dtmf":
             digit = message.get("dtmf", {}).get("digit")
 
@@ -75,4 +130,13 @@ class PlivoFrameSerializer(FrameSerializer):
                 # Handle case where string doesn't match any enum value
                 return None
         else:
-            return None
\ No newline at end of file
+            return None
+
+    def _deserialize_media(self, payload_base64: str) -> Frame:
+        payload = base64.b64decode(payload_base64)
+
+        deserialized_data = ulaw_to_pcm(payload, self._in_resampler)
+        audio_frame = InputAudioRawFrame(
+            audio=deserialized_data, num_channels=1, sample_rate=self._params.sample_rate
+        )
+        return audio_frame
@@ -0,0 +1,243 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from loguru import logger
+
+from app.config import settings
+
+SHED_REASONS = ("sessions", "loop_lag", "cpu")
+
+
+class AdmissionMetrics:
+    """Process-wide admission counters, and the load last sampled."""
+
+    def __init__(self):
+        self.admitted = 0
+        self.shed: Dict[str, int] = {reason: 0 for reason in SHED_REASONS}
+        self.queued = 0
+        self.rejected_streams = 0
+        self.sessions = 0
+        self.loop_lag = 0.0
+        self.cpu_percent = 0.0
+        self.cpu_percent_per_call = 0.0
+
+    def render_prometheus(self) -> str:
+        lines = []
+        counters = (
+            ("voice_admission_admitted_total", self.admitted, "Calls admitted to a bot."),
+            (
+                "voice_admission_queued_total",
+                self.queued,
+                "Shed calls sent to queue music instead of hung up.",
+            ),
+            (
+                "voice_admission_rejected_streams_total",
+                self.rejected_streams,
+                "Media streams refused because the session limit was reached.",
+            ),
+        )
+        for name, value, help_text in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+
+        lines.append("# HELP voice_admission_shed_total Calls turned away, by the limit reached.")
+        lines.append("# TYPE voice_admission_shed_total counter")
+        for reason, count in self.shed.items():
+            lines.append(f'voice_admission_shed_total{{reason="{reason}"}} {count}')
+
+        gauges = (
+            ("voice_admission_sessions", self.sessions, "Bot sessions running or reserved."),
+            (
+                "voice_admission_loop_lag_seconds",
+                round(self.loop_lag, 6),
+                "Smoothed event loop lag.",
+            ),
+            (
+                "voice_admission_cpu_percent",
+                round(self.cpu_percent, 2),
+                "Smoothed CPU use of this process, in percent of one core.",
+            ),
+            (
+                "voice_admission_cpu_percent_per_call",
+                round(self.cpu_percent_per_call, 2),
+                "Estimated CPU cost of one more call, in percent of one core.",
+            ),
+        )
+        for name, value, help_text in gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class AdmissionController:
+    """Decides whether this process can take one more call.
+
+    The answer webhook asks `admit` before handing out a media stream. A call
+    is turned away when any of these is over its limit:
+
+    - Sessions: bots running plus calls admitted whose stream hasn't
+      connected yet. Admitting reserves a slot for `reservation_secs`, so a
+      burst of answer callbacks can't all see the same free capacity.
+    - Event loop lag, sampled every `sample_interval` by a ticker. Spikes
+      count at once and decay over a couple of seconds.
+    - CPU: the process's CPU use plus the cost of the reserved and the new
+      call must stay under `max_cpu_percent` (of one core, like `top`). A
+      call's cost is the smoothed CPU use over the equally smoothed number
+      of sessions, at least `cpu_percent_per_call`. Since CPU use is only
+      seen a moment after calls start, all sessions times that cost must
+      fit too, so a fast burst can't outrun the measurement.
+
+    Without `start`, loop lag and CPU aren't sampled and only the session
+    limit applies. Everything is process-local: each worker sheds on its
+    own load.
+
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = settings.ADMISSION_MAX_SESSIONS,
+        max_loop_lag_ms: float = settings.ADMISSION_MAX_LOOP_LAG_MS,
+        max_cpu_percent: float = settings.ADMISSION_MAX_CPU_PERCENT,
+        cpu_percent_per_call: float = settings.ADMISSION_CPU_PERCENT_PER_CALL,
+        reservation_secs: float = settings.ADMISSION_RESERVATION_SECONDS,
+        sample_interval: float = 0.1,
+        metrics: Optional[AdmissionMetrics] = None,
+    ):
+        self._max_sessions = max_sessions
+        self._max_loop_lag = max_loop_lag_ms / 1000
+        self._max_cpu = max_cpu_percent
+        self._default_cpu_per_call = cpu_percent_per_call
+        self._reservation_secs = reservation_secs
+        self._sample_interval = sample_interval
+        self._metrics = metrics or admission_metrics
+        self._sessions: Set[str] = set()
+        # Admitted calls whose stream hasn't connected, by deadline.
+        self._reserved: OrderedDict[str, float] = OrderedDict()
+        self._loop_lag = 0.0
+        self._cpu = 0.0
+        self._sessions_avg = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._sample())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        # A lag spike halves in about half a second.
+        decay = 0.5 ** (self._sample_interval / 0.5)
+        wall, cpu = time.monotonic(), time.process_time()
+        while True:
+            expected = loop.time() + self._sample_interval
+            await asyncio.sleep(self._sample_interval)
+            lag = max(loop.time() - expected, 0.0)
+            self._loop_lag = max(lag, self._loop_lag * decay)
+
+            now_wall, now_cpu = time.monotonic(), time.process_time()
+            percent = 100 * (now_cpu - cpu) / max(now_wall - wall, 1e-6)
+            wall, cpu = now_wall, now_cpu
+            self._cpu += 0.2 * (percent - self._cpu)
+            self._sessions_avg += 0.2 * (len(self._sessions) - self._sessions_avg)
+            self._update_metrics()
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._reserved:
+            call_id, deadline = next(iter(self._reserved.items()))
+            if deadline > now:
+                break
+            del self._reserved[call_id]
+            logger.warning(f"Call {call_id} was admitted but its stream never connected")
+
+    def _cpu_cost(self) -> float:
+        if self._sessions_avg < 0.5:
+            return self._default_cpu_per_call
+        return max(self._cpu / self._sessions_avg, self._default_cpu_per_call)
+
+    def _update_metrics(self):
+        self._metrics.sessions = len(self._sessions) + len(self._reserved)
+        self._metrics.loop_lag = self._loop_lag
+        self._metrics.cpu_percent = self._cpu
+        self._metrics.cpu_percent_per_call = self._cpu_cost()
+
+    def _limit_reached(self, new_calls: int) -> Optional[str]:
+        self._expire()
+        if len(self._sessions) + len(self._reserved) + new_calls > self._max_sessions:
+            return "sessions"
+        if self._loop_lag > self._max_loop_lag:
+            return "loop_lag"
+        cost = self._cpu_cost()
+        pending = len(self._reserved) + new_calls
+        projected = max(self._cpu + cost * pending, cost * (len(self._sessions) + pending))
+        if projected > self._max_cpu:
+            return "cpu"
+        return None
+
+    def saturated(self) -> Optional[str]:
+        """The limit one more call would exceed, if any, without admitting."""
+        return self._limit_reached(1)
+
+    def admit(self, call_id: str) -> Optional[str]:
+        """Reserves a session for the call. Returns None if it's admitted,
+        the limit it would exceed otherwise. Retried callbacks of a call
+        already admitted are admitted again."""
+        if call_id in self._sessions or call_id in self._reserved:
+            return None
+        reason = self._limit_reached(1)
+        if reason:
+            self._metrics.shed[reason] += 1
+            logger.warning(
+                f"Shedding call {call_id}: {reason} limit reached "
+                f"(sessions {len(self._sessions)}+{len(self._reserved)}, "
+                f"loop lag {self._loop_lag * 1000:.0f}ms, cpu {self._cpu:.0f}%)"
+            )
+        else:
+            self._reserved[call_id] = time.monotonic() + self._reservation_secs
+            self._metrics.admitted += 1
+        self._update_metrics()
+        return reason
+
+    def open_session(self, call_id: str) -> bool:
+        """Called when a call's stream connects. Streams of admitted calls
+        are always accepted, others only while under the session limit."""
+        if self._reserved.pop(call_id, None) is None and call_id not in self._sessions:
+            self._expire()
+            if len(self._sessions) + len(self._reserved) >= self._max_sessions:
+                self._metrics.rejected_streams += 1
+                self._update_metrics()
+                return False
+        self._sessions.add(call_id)
+        self._update_metrics()
+        return True
+
+    def close_session(self, call_id: str):
+        self._sessions.discard(call_id)
+        self._update_metrics()
+
+    def metrics(self) -> dict:
+        self._expire()
+        return {
+            "sessions": len(self._sessions),
+            "reserved": len(self._reserved),
+            "max_sessions": self._max_sessions,
+            "loop_lag_ms": round(self._loop_lag * 1000, 1),
+            "cpu_percent": round(self._cpu, 1),
+            "cpu_percent_per_call": round(self._cpu_cost(), 2),
+            "saturated": self.saturated(),
+            "admitted": self._metrics.admitted,
+            "shed": dict(self._metrics.shed),
+        }
+
+
+admission_metrics = AdmissionMetrics()
+admission_controller = AdmissionController()
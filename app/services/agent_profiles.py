@@ -0,0 +1,185 @@
+import json
+import os
+from typing import Dict, List, Literal, Mapping, Optional
+
+from loguru import logger
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from pipecat.audio.vad.vad_analyzer import VADParams
+
+from app.config import settings
+from app.services.call_analysis import AnalysisParams
+from app.services.context_window import ContextWindowParams
+from app.services.greeting_cache import GreetingSpec
+from app.services.tools import BUILTIN_TOOLS, Tool, WebhookTool, WebhookToolConfig
+
+AUDIO_OUT_SAMPLE_RATE = 24000
+AMBIENCE_FILES = {
+    "office": os.path.join(os.path.dirname(os.path.dirname(__file__)), "office_ambience.wav")
+}
+
+DEFAULT_TTS_MODELS = {"elevenlabs": "eleven_flash_v2_5", "cartesia": "sonic-english"}
+
+
+class AgentProfile(BaseModel):
+    """Everything that makes one agent sound and behave differently from
+    another. Profiles are chosen per call by name."""
+
+    name: str = Field(pattern=r"^[A-Za-z0-9_-]{1,64}$")
+    system_prompt: str = Field(min_length=1)
+    intro_prompt: str = "Please introduce yourself to the user."
+    llm_model: str = "gpt-4o-mini"
+    tts_provider: Literal["elevenlabs", "cartesia"] = "elevenlabs"
+    voice_id: str = Field(min_length=1)
+    # Defaults to the provider's low latency model.
+    tts_model: Optional[str] = None
+    vad: VADParams = VADParams()
+    # Spectral gate on the caller's audio, see SpectralGateFilter.
+    noise_filter: bool = True
+    # Name of one of the ambience tracks, or None for no background sound.
+    ambience: Optional[str] = "office"
+    ambience_volume: float = Field(default=1.0, ge=0.0, le=2.0)
+    context_window: ContextWindowParams = ContextWindowParams()
+    # Predefined tools by name (see BUILTIN_TOOLS) and webhook tools.
+    builtin_tools: List[str] = []
+    tools: List[WebhookToolConfig] = []
+    # Spoken when tools take a while, None for silence.
+    tool_filler: Optional[str] = "One moment while I check that."
+    # What the post-call analysis works out.
+    analysis: AnalysisParams = AnalysisParams()
+
+    @field_validator("builtin_tools")
+    @classmethod
+    def _check_builtin_tools(cls, names: List[str]) -> List[str]:
+        unknown = [name for name in names if name not in BUILTIN_TOOLS]
+        if unknown:
+            raise ValueError(
+                f"unknown builtin tools {', '.join(unknown)}, "
+                f"available: {', '.join(BUILTIN_TOOLS)}"
+            )
+        return names
+
+    @model_validator(mode="after")
+    def _check_tool_names(self) -> "AgentProfile":
+        names = self.builtin_tools + [tool.name for tool in self.tools]
+        if len(names) != len(set(names)):
+            raise ValueError("tool names must be unique")
+        return self
+
+    @field_validator("vad")
+    @classmethod
+    def _check_vad(cls, vad: VADParams) -> VADParams:
+        if not 0.0 < vad.confidence <= 1.0:
+            raise ValueError("vad.confidence must be in (0, 1]")
+        if vad.start_secs <= 0 or vad.stop_secs <= 0:
+            raise ValueError("vad.start_secs and vad.stop_secs must be positive")
+        if not 0.0 <= vad.min_volume <= 1.0:
+            raise ValueError("vad.min_volume must be in [0, 1]")
+        return vad
+
+
+DEFAULT_PROFILE = AgentProfile(
+    name="default",
+    system_prompt="You are a helpful LLM in an audio call. Your goal is to demonstrate your capabilities in a succinct way. Your output will be converted to audio so don't include special characters in your answers. Respond to what the user said in a creative and helpful way.",
+    voice_id="vghiSqG5ezdhd8F3tKAD",
+)
+
+
+class AgentTemplate:
+    """A validated profile with everything that doesn't change from call to
+    call worked out once. A call only copies the initial messages and creates
+    its own services from it.
+
+    """
+
+    def __init__(self, profile: AgentProfile, ambience_files: Mapping[str, str]):
+        self.profile = profile
+        self.tts_model = profile.tts_model or DEFAULT_TTS_MODELS[profile.tts_provider]
+        self.ambience_files = dict(ambience_files)
+        self.vad_params = profile.vad.model_copy()
+        self.context_window = profile.context_window.model_copy()
+        self.analysis = profile.analysis.model_copy()
+        self._system_prompt = profile.system_prompt
+        self._intro_prompt = profile.intro_prompt
+        self.tools: Dict[str, Tool] = {name: BUILTIN_TOOLS[name] for name in profile.builtin_tools}
+        self.tools.update({config.name: WebhookTool(config) for config in profile.tools})
+        self.tool_schemas = [tool.schema() for tool in self.tools.values()]
+
+        # The greeting cache synthesizes with ElevenLabs.
+        self.greeting_spec: Optional[GreetingSpec] = None
+        if profile.tts_provider == "elevenlabs":
+            self.greeting_spec = GreetingSpec(
+                system_prompt=profile.system_prompt,
+                intro_prompt=profile.intro_prompt,
+                llm_model=profile.llm_model,
+                voice_id=profile.voice_id,
+                tts_model=self.tts_model,
+                sample_rate=AUDIO_OUT_SAMPLE_RATE,
+            )
+
+    @property
+    def name(self) -> str:
+        return self.profile.name
+
+    def initial_messages(self) -> List[dict]:
+        return [{"role": "system", "content": self._system_prompt}]
+
+    def intro_message(self) -> dict:
+        return {"role": "system", "content": self._intro_prompt}
+
+
+class AgentRegistry:
+    """Named agent profiles, each built into an `AgentTemplate` when it's
+    registered."""
+
+    def __init__(
+        self,
+        ambience_files: Mapping[str, str] = AMBIENCE_FILES,
+        default_agent: str = settings.DEFAULT_AGENT,
+    ):
+        self._ambience_files = ambience_files
+        self._default_agent = default_agent
+        self._templates: Dict[str, AgentTemplate] = {}
+
+    def register(self, profile: AgentProfile) -> AgentTemplate:
+        if profile.ambience is not None and profile.ambience not in self._ambience_files:
+            raise ValueError(
+                f"Agent {profile.name}: unknown ambience {profile.ambience}, "
+                f"available: {', '.join(self._ambience_files)}"
+            )
+        template = AgentTemplate(profile, self._ambience_files)
+        self._templates[profile.name] = template
+        return template
+
+    def load_file(self, path: str):
+        """Registers every profile in a JSON file holding a list of profiles."""
+        with open(path, encoding="utf-8") as f:
+            profiles = [AgentProfile(**data) for data in json.load(f)]
+        for profile in profiles:
+            self.register(profile)
+        logger.info(f"Loaded {len(profiles)} agent profiles from {path}")
+
+    def get(self, name: str) -> Optional[AgentTemplate]:
+        return self._templates.get(name)
+
+    def default(self) -> AgentTemplate:
+        return self._templates[self._default_agent]
+
+    def resolve(self, name: Optional[str]) -> AgentTemplate:
+        """The template for `name`, or the default one if no agent was chosen
+        or it doesn't exist (anymore)."""
+        if name:
+            template = self._templates.get(name)
+            if template:
+                return template
+            logger.warning(f"Unknown agent {name}, using {self._default_agent}")
+        return self.default()
+
+    def templates(self) -> List[AgentTemplate]:
+        return list(self._templates.values())
+
+
+agent_registry = AgentRegistry()
+agent_registry.register(DEFAULT_PROFILE)
+if settings.AGENT_PROFILES_FILE:
+    agent_registry.load_file(settings.AGENT_PROFILES_FILE)
@@ -0,0 +1,173 @@
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from importlib import resources
+from typing import Deque, Dict, Optional, Tuple
+
+import aiohttp
+import httpx
+import onnxruntime
+from loguru import logger
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from pipecat.audio.vad.silero import SileroOnnxModel, SileroVADAnalyzer
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+from pipecat.services.openai import OpenAILLMService
+
+from app.audio.ambience import AmbienceLibrary, AmbienceMixer
+from app.audio.batched_vad import BatchedSileroVADAnalyzer, BatchedVADInference
+from app.config import settings
+
+SILERO_MODEL_PACKAGE = "pipecat.audio.vad.data"
+SILERO_MODEL_NAME = "silero_vad.onnx"
+
+
+class BotResources:
+    """Process-wide registry of the expensive, read-only parts of a call's
+    pipeline: the Silero ONNX session, decoded ambience sounds and pooled HTTP
+    clients. They are loaded once and every call gets a cheap view on top of
+    them that only holds its own state.
+
+    """
+
+    def __init__(self, max_samples: int = 1000, ambience_dir: str = settings.AMBIENCE_CACHE_DIR):
+        self._lock = threading.Lock()
+        self._vad_session: Optional[onnxruntime.InferenceSession] = None
+        self._vad_batcher: Optional[BatchedVADInference] = None
+        self.ambience = AmbienceLibrary(ambience_dir)
+        self._openai_clients: Dict[Tuple[Optional[str], Optional[str]], AsyncOpenAI] = {}
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self._setup_times: Deque[float] = deque(maxlen=max_samples)
+        self._calls = 0
+
+    def vad_session(self) -> onnxruntime.InferenceSession:
+        with self._lock:
+            if not self._vad_session:
+                start = time.perf_counter()
+                path = str(resources.files(SILERO_MODEL_PACKAGE).joinpath(SILERO_MODEL_NAME))
+                opts = onnxruntime.SessionOptions()
+                opts.inter_op_num_threads = 1
+                opts.intra_op_num_threads = 1
+                self._vad_session = onnxruntime.InferenceSession(
+                    path, providers=["CPUExecutionProvider"], sess_options=opts
+                )
+                logger.info(f"Loaded Silero VAD session in {time.perf_counter() - start:.3f}s")
+            return self._vad_session
+
+    def vad_batcher(self) -> BatchedVADInference:
+        session = self.vad_session()
+        with self._lock:
+            if not self._vad_batcher:
+                self._vad_batcher = BatchedVADInference(session)
+                self._vad_batcher.start()
+            return self._vad_batcher
+
+    def vad_analyzer(self, sample_rate: int = 16000, params: VADParams = VADParams()):
+        if settings.VAD_BATCHING_ENABLED:
+            return BatchedSileroVADAnalyzer(
+                self.vad_batcher(), sample_rate=sample_rate, params=params
+            )
+        return SharedSileroVADAnalyzer(self, sample_rate=sample_rate, params=params)
+
+    def mixer(self, sound_files: Dict[str, str], default_sound: str, volume: float = 0.4):
+        return AmbienceMixer(
+            self.ambience, tracks=sound_files, default_track=default_sound, volume=volume
+        )
+
+    def openai_client(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        key = (api_key, base_url)
+        client = self._openai_clients.get(key)
+        if not client:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_keepalive_connections=100, max_connections=1000, keepalive_expiry=None
+                    )
+                ),
+            )
+            self._openai_clients[key] = client
+        return client
+
+    def http_session(self) -> aiohttp.ClientSession:
+        if not self._http_session or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession()
+        return self._http_session
+
+    def record_setup(self, seconds: float):
+        self._calls += 1
+        self._setup_times.append(seconds)
+
+    def metrics(self) -> dict:
+        times = sorted(self._setup_times)
+        metrics = {
+            "calls": self._calls,
+            "vad_session_loaded": self._vad_session is not None,
+            "vad_batching": self._vad_batcher is not None,
+            "sounds_loaded": self.ambience.metrics()["tracks"],
+            "openai_clients": len(self._openai_clients),
+            "setup_seconds": None,
+        }
+        if times:
+            metrics["setup_seconds"] = {
+                "last": self._setup_times[-1],
+                "mean": statistics.fmean(times),
+                "p50": times[len(times) // 2],
+                "p95": times[min(len(times) - 1, int(len(times) * 0.95))],
+                "max": times[-1],
+            }
+        return metrics
+
+    async def warmup(self, sound_files: Dict[str, str], sample_rate: int):
+        await asyncio.to_thread(self.vad_session)
+        if settings.VAD_BATCHING_ENABLED:
+            self.vad_batcher()
+        for file_name in sound_files.values():
+            await asyncio.to_thread(self.ambience.track, file_name, sample_rate)
+
+    async def close(self):
+        if self._vad_batcher:
+            await asyncio.to_thread(self._vad_batcher.stop)
+            self._vad_batcher = None
+        if self._http_session and not self._http_session.closed:
+            await self._http_session.close()
+        for client in self._openai_clients.values():
+            await client.close()
+        self._openai_clients.clear()
+
+
+class _SharedSileroOnnxModel(SileroOnnxModel):
+    """Silero model state (RNN state and context) on top of a shared session."""
+
+    def __init__(self, session: onnxruntime.InferenceSession):
+        self.session = session
+        self.reset_states()
+        self.sample_rates = [8000, 16000]
+
+
+class SharedSileroVADAnalyzer(SileroVADAnalyzer):
+    def __init__(
+        self, resources: BotResources, *, sample_rate: int = 16000, params: VADParams = VADParams()
+    ):
+        VADAnalyzer.__init__(self, sample_rate=sample_rate, num_channels=1, params=params)
+
+        if sample_rate != 16000 and sample_rate != 8000:
+            raise ValueError("Silero VAD sample rate needs to be 16000 or 8000")
+
+        self._model = _SharedSileroOnnxModel(resources.vad_session())
+        self._last_reset_time = 0
+
+
+class SharedOpenAILLMService(OpenAILLMService):
+    def __init__(self, resources: BotResources, **kwargs):
+        self._resources = resources
+        super().__init__(**kwargs)
+
+    def create_client(self, api_key=None, base_url=None, **kwargs):
+        return self._resources.openai_client(api_key=api_key, base_url=base_url)
+
+
+bot_resources = BotResources()
@@ -0,0 +1,469 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from loguru import logger
+from pydantic import BaseModel, Field
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+SENTIMENTS = ("positive", "neutral", "negative")
+
+ANALYSIS_INSTRUCTIONS = (
+    "You analyze transcripts of phone calls between an AI assistant and a caller. "
+    "The call's details, when known, come before the transcript. "
+    "Reply with a JSON object with exactly these keys:\n{keys}"
+)
+
+
+class AnalysisParams(BaseModel):
+    """What to work out from a call once it's over. Everything is asked for
+    in one LLM request per call."""
+
+    summary: bool = True
+    summary_words: int = Field(default=60, ge=10, le=500)
+    # The caller's overall sentiment.
+    sentiment: bool = True
+    # Possible outcomes of the call, empty to skip.
+    dispositions: List[str] = [
+        "interested",
+        "not_interested",
+        "callback_requested",
+        "wrong_number",
+        "voicemail",
+        "other",
+    ]
+    # Values to extract, by name, with a description for the LLM.
+    fields: Dict[str, str] = {}
+
+    def enabled(self) -> bool:
+        return self.summary or self.sentiment or bool(self.dispositions) or bool(self.fields)
+
+
+def _instructions(params: AnalysisParams) -> str:
+    keys = []
+    if params.summary:
+        words = params.summary_words
+        keys.append(f'"summary": what happened in the call, in at most {words} words.')
+    if params.sentiment:
+        sentiments = ", ".join(SENTIMENTS)
+        keys.append(f'"sentiment": the caller\'s overall sentiment, one of {sentiments}.')
+    if params.dispositions:
+        outcomes = ", ".join(params.dispositions)
+        keys.append(f'"disposition": the outcome of the call, one of {outcomes}.')
+    if params.fields:
+        fields = "; ".join(f'"{name}": {text}' for name, text in params.fields.items())
+        keys.append(f'"fields": an object with these keys, null when not mentioned: {fields}.')
+    return ANALYSIS_INSTRUCTIONS.format(keys="\n".join(f"- {key}" for key in keys))
+
+
+# The `CallRecord` fields the LLM gets to see, with their labels.
+RECORD_FIELDS = {
+    "direction": "Direction",
+    "from_number": "From",
+    "to_number": "To",
+    "state": "Final state",
+    "start_time": "Started",
+    "answer_time": "Answered",
+    "end_time": "Ended",
+    "duration": "Duration (seconds)",
+    "error_message": "Error",
+}
+
+
+def _conversation(transcript: List[dict], record: Optional[dict] = None) -> str:
+    """The transcript, after the details of the call from its `CallRecord`
+    (as dumped to JSON) when there is one. A call that was never answered
+    or went to voicemail is easier to tell from these than from the words."""
+    lines = [
+        f"{label}: {record[key]}"
+        for key, label in RECORD_FIELDS.items()
+        if record and record.get(key) is not None
+    ]
+    if lines:
+        lines.append("")
+    lines.extend(
+        f"{m['role']}: {m['content']}" for m in transcript if isinstance(m.get("content"), str)
+    )
+    return "\n".join(lines)
+
+
+def _parse(params: AnalysisParams, data: dict) -> dict:
+    """Only the requested keys, with values outside the allowed ones set to
+    None."""
+    result = {}
+    if params.summary:
+        summary = data.get("summary")
+        result["summary"] = summary if isinstance(summary, str) else None
+    if params.sentiment:
+        sentiment = data.get("sentiment")
+        result["sentiment"] = sentiment if sentiment in SENTIMENTS else None
+    if params.dispositions:
+        disposition = data.get("disposition")
+        result["disposition"] = disposition if disposition in params.dispositions else None
+    if params.fields:
+        fields = data.get("fields") if isinstance(data.get("fields"), dict) else {}
+        result["fields"] = {name: fields.get(name) for name in params.fields}
+    return result
+
+
+async def analyze_call(client: "AsyncOpenAI", job: dict, model: str) -> dict:
+    params = AnalysisParams(**job["params"])
+    transcript = job["transcript"] or []
+    if not any(m.get("role") == "user" and m.get("content") for m in transcript):
+        # Nothing to analyze, don't pay for a request.
+        return {"caller_spoke": False, **_parse(params, {})}
+
+    response = await client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": _instructions(params)},
+            {"role": "user", "content": _conversation(transcript, job.get("record"))},
+        ],
+        response_format={"type": "json_object"},
+        temperature=0,
+    )
+    data = json.loads(response.choices[0].message.content or "{}")
+    return {"caller_spoke": True, **_parse(params, data if isinstance(data, dict) else {})}
+
+
+class AnalysisQueue:
+    """Persistent post-call job queue and results, in a SQLite file shared by
+    the web workers (which enqueue and read results) and the analysis workers.
+
+    A worker claims a job with a lease. If it dies, the job is claimed again
+    once the lease runs out. Failed jobs are retried with exponential backoff
+    up to `max_attempts`.
+
+    """
+
+    def __init__(self, path: str, max_attempts: int = settings.ANALYSIS_MAX_ATTEMPTS):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS call_analysis ("
+            "call_id TEXT PRIMARY KEY, job TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, available_at REAL NOT NULL, "
+            "lease_until REAL, result TEXT, error TEXT, created_at REAL NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS call_analysis_pending "
+            "ON call_analysis (status, available_at)"
+        )
+
+    def enqueue(self, call_id: str, job: dict) -> bool:
+        """Adds the job of a call, unless the call already has one."""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO call_analysis "
+                "(call_id, job, status, available_at, created_at, updated_at) "
+                "VALUES (?, ?, 'pending', ?, ?, ?)",
+                (call_id, json.dumps(job), now, now, now),
+            )
+        return cursor.rowcount == 1
+
+    def claim(self, limit: int, lease: float) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs that took their worker down every time.
+                self._db.execute(
+                    "UPDATE call_analysis SET status = 'failed', error = 'worker lost', "
+                    "lease_until = NULL, updated_at = ? "
+                    "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                    (now, now, self._max_attempts),
+                )
+                rows = self._db.execute(
+                    "SELECT call_id, job FROM call_analysis "
+                    "WHERE (status = 'pending' AND available_at <= ?) "
+                    "OR (status = 'running' AND lease_until < ?) "
+                    "ORDER BY available_at LIMIT ?",
+                    (now, now, limit),
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE call_analysis SET status = 'running', attempts = attempts + 1, "
+                    "lease_until = ?, updated_at = ? WHERE call_id = ?",
+                    [(now + lease, now, call_id) for call_id, _ in rows],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [{"call_id": call_id, **json.loads(job)} for call_id, job in rows]
+
+    def complete(self, call_id: str, result: dict):
+        with self._lock:
+            self._db.execute(
+                "UPDATE call_analysis SET status = 'done', result = ?, error = NULL, "
+                "lease_until = NULL, updated_at = ? WHERE call_id = ?",
+                (json.dumps(result), time.time(), call_id),
+            )
+
+    def fail(self, call_id: str, error: str, retry_delay: float):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT attempts FROM call_analysis WHERE call_id = ?", (call_id,)
+            ).fetchone()
+            if not row:
+                return
+            attempts = row[0]
+            if attempts >= self._max_attempts:
+                status, available_at = "failed", now
+            else:
+                status, available_at = "pending", now + retry_delay * 2 ** (attempts - 1)
+            self._db.execute(
+                "UPDATE call_analysis SET status = ?, error = ?, available_at = ?, "
+                "lease_until = NULL, updated_at = ? WHERE call_id = ?",
+                (status, error, available_at, now, call_id),
+            )
+
+    def get(self, call_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, attempts, result, error, created_at, updated_at "
+                "FROM call_analysis WHERE call_id = ?",
+                (call_id,),
+            ).fetchone()
+        if not row:
+            return None
+        status, attempts, result, error, created_at, updated_at = row
+        return {
+            "call_id": call_id,
+            "status": status,
+            "attempts": attempts,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) FROM call_analysis GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+async def _work(
+    path: str,
+    concurrency: int,
+    model: str,
+    lease: float,
+    poll_interval: float,
+    retry_delay: float,
+):
+    # Only the worker processes need the SDK.
+    from openai import AsyncOpenAI
+
+    queue = AnalysisQueue(path)
+    client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    running: set = set()
+
+    async def run(job: dict):
+        call_id = job["call_id"]
+        try:
+            # Well within the lease, so no other worker takes the job meanwhile.
+            result = await asyncio.wait_for(analyze_call(client, job, model), lease / 2)
+            await asyncio.to_thread(queue.complete, call_id, result)
+            logger.debug(f"Analyzed call {call_id}")
+        except Exception as e:
+            logger.warning(f"Analysis of call {call_id} failed: {e}")
+            await asyncio.to_thread(queue.fail, call_id, str(e) or type(e).__name__, retry_delay)
+
+    while True:
+        free = concurrency - len(running)
+        jobs = await asyncio.to_thread(queue.claim, free, lease) if free else []
+        for job in jobs:
+            task = asyncio.create_task(run(job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        if not jobs:
+            await asyncio.sleep(poll_interval)
+        elif len(running) >= concurrency:
+            await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+
+def run_worker(
+    path: str = settings.ANALYSIS_DB_PATH,
+    concurrency: int = settings.ANALYSIS_CONCURRENCY,
+    model: str = settings.ANALYSIS_MODEL,
+    lease: float = settings.ANALYSIS_LEASE_SECONDS,
+    poll_interval: float = settings.ANALYSIS_POLL_SECONDS,
+    retry_delay: float = 5.0,
+    niceness: int = settings.ANALYSIS_NICENESS,
+):
+    """Entry point of an analysis worker process."""
+    if niceness:
+        # Live calls on the same host come first.
+        os.nice(niceness)
+    asyncio.run(_work(path, concurrency, model, lease, poll_interval, retry_delay))
+
+
+class AnalysisService:
+    """Post-call analysis, run by a pool of worker processes so it never
+    competes with the event loop serving live audio.
+
+    The web process only writes jobs to the `AnalysisQueue` and reads the
+    results back. With `workers=0` no processes are started here, and
+    `python -m app.services.call_analysis` runs a worker on its own.
+
+    Workers that die are started again, `restart_delay` seconds later at
+    first and twice as long after each crash up to `max_restart_delay`. A
+    worker that ran for `max_restart_delay` starts over at `restart_delay`.
+
+    """
+
+    def __init__(
+        self,
+        path: str = settings.ANALYSIS_DB_PATH,
+        workers: int = settings.ANALYSIS_WORKERS,
+        enabled: bool = settings.ANALYSIS_ENABLED,
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 60.0,
+        check_interval: float = 1.0,
+    ):
+        self._path = path
+        self._workers = workers
+        self._enabled = enabled
+        self._restart_delay = restart_delay
+        self._max_restart_delay = max_restart_delay
+        self._check_interval = check_interval
+        self._queue: Optional[AnalysisQueue] = None
+        # Spawned rather than forked, the children don't inherit the event
+        # loop or any of the call state.
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[multiprocessing.Process] = []
+        self._started: List[float] = []
+        self._delays: List[float] = []
+        self._supervisor: Optional[asyncio.Task] = None
+        self.restarts = 0
+
+    @property
+    def queue(self) -> AnalysisQueue:
+        if not self._queue:
+            self._queue = AnalysisQueue(self._path)
+        return self._queue
+
+    async def start(self):
+        if not self._enabled:
+            return
+        await asyncio.to_thread(lambda: self.queue)
+        for i in range(self._workers):
+            self._processes.append(self._spawn(i))
+            self._started.append(time.monotonic())
+            self._delays.append(self._restart_delay)
+        if self._processes:
+            self._supervisor = asyncio.create_task(self._supervise())
+            logger.info(f"Started {len(self._processes)} call analysis workers")
+
+    def _spawn(self, i: int) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=run_worker,
+            kwargs={"path": self._path},
+            name=f"call-analysis-{i}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    async def _supervise(self):
+        restart_at: Dict[int, float] = {}
+        while True:
+            await asyncio.sleep(self._check_interval)
+            now = time.monotonic()
+            for i, process in enumerate(self._processes):
+                if process.is_alive():
+                    continue
+                if i not in restart_at:
+                    if now - self._started[i] >= self._max_restart_delay:
+                        self._delays[i] = self._restart_delay
+                    restart_at[i] = now + self._delays[i]
+                    logger.error(
+                        f"Call analysis worker {process.name} exited with code "
+                        f"{process.exitcode}, restarting in {self._delays[i]:g}s"
+                    )
+                elif now >= restart_at[i]:
+                    del restart_at[i]
+                    process.close()
+                    self._processes[i] = self._spawn(i)
+                    self._started[i] = now
+                    self._delays[i] = min(self._delays[i] * 2, self._max_restart_delay)
+                    self.restarts += 1
+
+    async def stop(self):
+        if self._supervisor:
+            self._supervisor.cancel()
+            await asyncio.gather(self._supervisor, return_exceptions=True)
+            self._supervisor = None
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            await asyncio.to_thread(process.join, 5)
+        self._processes = []
+        self._started = []
+        self._delays = []
+        if self._queue:
+            self._queue.close()
+            self._queue = None
+
+    async def submit(
+        self,
+        call_id: str,
+        transcript: Optional[List[dict]],
+        params: AnalysisParams,
+        agent: Optional[str] = None,
+        record: Optional[dict] = None,
+    ):
+        """Queues the analysis of a finished call. Returns straight away."""
+        if not self._enabled or not params.enabled():
+            return
+        job = {
+            "agent": agent,
+            "transcript": transcript or [],
+            "record": record,
+            "params": params.model_dump(),
+            "ended_at": time.time(),
+        }
+        try:
+            await asyncio.to_thread(self.queue.enqueue, call_id, job)
+        except Exception as e:
+            logger.error(f"Unable to queue the analysis of call {call_id}: {e}")
+
+    async def get(self, call_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.queue.get, call_id)
+
+    async def metrics(self) -> dict:
+        return {
+            "workers": sum(1 for p in self._processes if p.is_alive()),
+            "worker_restarts": self.restarts,
+            "jobs": await asyncio.to_thread(self.queue.counts),
+        }
+
+
+analysis_service = AnalysisService()
+
+
+if __name__ == "__main__":
+    run_worker()
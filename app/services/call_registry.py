@@ -0,0 +1,453 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Dict, List, Mapping, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.models.call_models import CallRecord, CallState
+
+# The states a call can move to from each state. Callbacks only ever move a
+# call forward, so repeated or late ones (a ringing status after the hangup)
+# are ignored.
+TRANSITIONS: Dict[CallState, Tuple[CallState, ...]] = {
+    CallState.INITIATED: (
+        CallState.INPROGRESS,
+        CallState.COMPLETED,
+        CallState.FAILED,
+        CallState.USERBUSY,
+        CallState.REJECTED,
+    ),
+    CallState.INPROGRESS: (CallState.COMPLETED, CallState.FAILED),
+    CallState.COMPLETED: (),
+    CallState.FAILED: (),
+    CallState.USERBUSY: (),
+    CallState.REJECTED: (),
+}
+LIVE_STATES = (CallState.INITIATED, CallState.INPROGRESS)
+
+# Plivo's CallStatus values.
+PLIVO_CALL_STATUSES: Dict[str, CallState] = {
+    "queued": CallState.INITIATED,
+    "ringing": CallState.INITIATED,
+    "early-media": CallState.INITIATED,
+    "in-progress": CallState.INPROGRESS,
+    "completed": CallState.COMPLETED,
+    "busy": CallState.USERBUSY,
+    "no-answer": CallState.REJECTED,
+    "timeout": CallState.REJECTED,
+    "cancel": CallState.REJECTED,
+    "rejected": CallState.REJECTED,
+    "failed": CallState.FAILED,
+}
+
+
+def state_from_plivo(data: Mapping) -> Optional[CallState]:
+    """The state a Plivo callback reports, refined by the hangup cause where
+    the status alone is ambiguous."""
+    state = PLIVO_CALL_STATUSES.get(str(data.get("CallStatus", "")).lower())
+    cause = str(data.get("HangupCauseName", "")).lower()
+    if state in (CallState.FAILED, CallState.COMPLETED, None) and cause:
+        if "busy" in cause:
+            return CallState.USERBUSY
+        if "reject" in cause:
+            return CallState.REJECTED
+    return state
+
+
+def _apply_transition(
+    record: CallRecord,
+    state: CallState,
+    duration: Optional[int],
+    error_message: Optional[str],
+) -> bool:
+    """Moves `record` to `state` in place if `TRANSITIONS` allows it. The
+    duration Plivo reports is kept either way, and so is the first error."""
+    current = CallState(record.state)
+    if state not in TRANSITIONS[current]:
+        if duration is not None:
+            record.duration = duration
+        if error_message and not record.error_message:
+            record.error_message = error_message
+        return False
+
+    now = datetime.now()
+    record.state = state
+    if state == CallState.INPROGRESS:
+        record.answer_time = now
+    elif not TRANSITIONS[state]:
+        record.end_time = now
+        if duration is None and record.answer_time:
+            duration = int((now - record.answer_time).total_seconds())
+        record.duration = duration if duration is not None else 0
+        if error_message:
+            record.error_message = error_message
+    return True
+
+
+class CallRegistry(ABC):
+    """Every call placed or answered, by our call id and by Plivo's CallUUID,
+    with the number of calls in each state.
+
+    Transitions are checked against `TRANSITIONS`: a callback that repeats
+    the current state or would move a call backwards changes nothing, so
+    webhooks can be retried and arrive in any order. Calls that never get
+    past INITIATED within `ring_timeout` are failed, so a lost callback
+    doesn't hold capacity forever. Finished calls are forgotten after `ttl`.
+
+    Plivo's callbacks for a call can land on any worker, so like the call
+    state store the registry needs a shared backend with several workers.
+
+    """
+
+    def __init__(self, ring_timeout: float, ttl: float):
+        self._ring_timeout = ring_timeout
+        self._ttl = ttl
+        # Of this process.
+        self.transitions = 0
+        self.ignored = 0
+
+    @abstractmethod
+    async def add(self, record: CallRecord) -> CallRecord:
+        """Registers a call, or returns the one already registered."""
+        pass
+
+    @abstractmethod
+    async def get(self, call_id: str) -> Optional[CallRecord]:
+        pass
+
+    @abstractmethod
+    async def get_by_plivo_uuid(self, plivo_call_uuid: str) -> Optional[CallRecord]:
+        pass
+
+    @abstractmethod
+    async def link_plivo_uuid(self, call_id: str, plivo_call_uuid: str):
+        pass
+
+    @abstractmethod
+    async def _transition(
+        self,
+        call_id: str,
+        state: CallState,
+        duration: Optional[int],
+        error_message: Optional[str],
+    ) -> Optional[Tuple[CallState, bool]]:
+        """The call's state before, and whether it moved. None if unknown."""
+        pass
+
+    @abstractmethod
+    async def _counts(self) -> Dict[CallState, int]:
+        """Calls by state, after failing the ones ringing for too long."""
+        pass
+
+    async def resolve(self, call_id: str) -> Optional[CallRecord]:
+        """The call with our id or Plivo's CallUUID `call_id`."""
+        return await self.get(call_id) or await self.get_by_plivo_uuid(call_id)
+
+    async def transition(
+        self,
+        call_id: str,
+        state: CallState,
+        duration: Optional[int] = None,
+        error_message: Optional[str] = None,
+    ) -> bool:
+        """Moves a call to `state`. Returns False if the call is unknown or
+        the transition isn't allowed. The duration Plivo reports is kept
+        either way, and so is the first error."""
+        result = await self._transition(call_id, state, duration, error_message)
+        if not result:
+            return False
+        current, moved = result
+        if not moved:
+            if state != current:
+                self.ignored += 1
+                logger.debug(f"Ignoring {current.value} -> {state.value} for call {call_id}")
+            return False
+        self.transitions += 1
+        logger.info(f"Call {call_id}: {current.value} -> {state.value}")
+        return True
+
+    async def count(self, state: CallState) -> int:
+        return (await self._counts())[state]
+
+    async def live_calls(self) -> int:
+        """Calls ringing or in progress."""
+        counts = await self._counts()
+        return sum(counts[state] for state in LIVE_STATES)
+
+    async def metrics(self) -> dict:
+        counts = await self._counts()
+        return {
+            "live": sum(counts[state] for state in LIVE_STATES),
+            "states": {state.value: count for state, count in counts.items()},
+            "transitions": self.transitions,
+            "ignored_callbacks": self.ignored,
+        }
+
+
+class InMemoryCallRegistry(CallRegistry):
+    """Process-local registry. Only correct with a single worker. Per-state
+    counts are kept up to date so live-call counts are O(1)."""
+
+    def __init__(
+        self,
+        ring_timeout: float = settings.CAMPAIGN_RING_TIMEOUT_SECONDS,
+        ttl: float = settings.CALL_STATE_TTL_SECONDS,
+    ):
+        super().__init__(ring_timeout, ttl)
+        self._records: Dict[str, CallRecord] = {}
+        self._by_plivo_uuid: Dict[str, str] = {}
+        self._state_counts: Dict[CallState, int] = {state: 0 for state in CallState}
+        # Calls still ringing, oldest first, and finished calls in the order
+        # they ended.
+        self._ringing: OrderedDict[str, float] = OrderedDict()
+        self._finished: Deque[Tuple[float, str]] = deque()
+
+    async def add(self, record: CallRecord) -> CallRecord:
+        existing = self._records.get(record.call_uuid)
+        if existing:
+            return existing
+        self._purge()
+        state = CallState(record.state)
+        self._records[record.call_uuid] = record
+        self._state_counts[state] += 1
+        if record.plivo_call_uuid:
+            self._by_plivo_uuid[record.plivo_call_uuid] = record.call_uuid
+        if state == CallState.INITIATED:
+            self._ringing[record.call_uuid] = time.monotonic()
+        elif not TRANSITIONS[state]:
+            self._finished.append((time.monotonic(), record.call_uuid))
+        return record
+
+    async def get(self, call_id: str) -> Optional[CallRecord]:
+        return self._records.get(call_id)
+
+    async def get_by_plivo_uuid(self, plivo_call_uuid: str) -> Optional[CallRecord]:
+        call_id = self._by_plivo_uuid.get(plivo_call_uuid)
+        return self._records.get(call_id) if call_id else None
+
+    async def link_plivo_uuid(self, call_id: str, plivo_call_uuid: str):
+        record = self._records.get(call_id)
+        if record and plivo_call_uuid and record.plivo_call_uuid != plivo_call_uuid:
+            if record.plivo_call_uuid:
+                self._by_plivo_uuid.pop(record.plivo_call_uuid, None)
+            record.plivo_call_uuid = plivo_call_uuid
+            self._by_plivo_uuid[plivo_call_uuid] = call_id
+
+    async def _transition(self, call_id, state, duration, error_message):
+        record = self._records.get(call_id)
+        if not record:
+            return None
+        current = CallState(record.state)
+        if not _apply_transition(record, state, duration, error_message):
+            return current, False
+        self._state_counts[current] -= 1
+        self._state_counts[state] += 1
+        self._ringing.pop(call_id, None)
+        if not TRANSITIONS[state]:
+            self._finished.append((time.monotonic(), call_id))
+        return current, True
+
+    async def _expire_ringing(self):
+        deadline = time.monotonic() - self._ring_timeout
+        while self._ringing:
+            call_id, started = next(iter(self._ringing.items()))
+            if started > deadline:
+                break
+            await self.transition(call_id, CallState.FAILED, error_message="No answer callback")
+
+    def _purge(self):
+        deadline = time.monotonic() - self._ttl
+        while self._finished and self._finished[0][0] < deadline:
+            _, call_id = self._finished.popleft()
+            record = self._records.pop(call_id, None)
+            if record:
+                self._state_counts[CallState(record.state)] -= 1
+                if record.plivo_call_uuid:
+                    self._by_plivo_uuid.pop(record.plivo_call_uuid, None)
+
+    async def _counts(self) -> Dict[CallState, int]:
+        await self._expire_ringing()
+        return dict(self._state_counts)
+
+
+class SQLiteCallRegistry(CallRegistry):
+    """Registry in a SQLite file, shared by every worker process on the host,
+    so a callback can land on any worker and live-call counts cover them
+    all. Queries run in a thread so they never block the event loop.
+
+    """
+
+    def __init__(
+        self,
+        path: str = settings.CALL_STATE_SQLITE_PATH,
+        ring_timeout: float = settings.CAMPAIGN_RING_TIMEOUT_SECONDS,
+        ttl: float = settings.CALL_STATE_TTL_SECONDS,
+    ):
+        super().__init__(ring_timeout, ttl)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        # state_since: when the call entered its state, in wall clock time
+        # since workers don't share a monotonic clock.
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS calls ("
+            "call_uuid TEXT PRIMARY KEY, plivo_call_uuid TEXT, state TEXT NOT NULL, "
+            "data TEXT NOT NULL, state_since REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS calls_plivo_call_uuid ON calls (plivo_call_uuid)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS calls_state ON calls (state, state_since)")
+
+    def _record(self, row) -> Optional[CallRecord]:
+        return CallRecord.model_validate_json(row[0]) if row else None
+
+    def _add(self, record: CallRecord) -> CallRecord:
+        now = time.time()
+        finished = [s.value for s, to in TRANSITIONS.items() if not to]
+        with self._lock:
+            self._db.execute(
+                f"DELETE FROM calls WHERE state IN ({','.join('?' * len(finished))}) "
+                "AND state_since < ?",
+                (*finished, now - self._ttl),
+            )
+            self._db.execute(
+                "INSERT OR IGNORE INTO calls (call_uuid, plivo_call_uuid, state, data, state_since) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    record.call_uuid,
+                    record.plivo_call_uuid,
+                    CallState(record.state).value,
+                    record.model_dump_json(),
+                    now,
+                ),
+            )
+            row = self._db.execute(
+                "SELECT data FROM calls WHERE call_uuid = ?", (record.call_uuid,)
+            ).fetchone()
+        return self._record(row)
+
+    def _get(self, column: str, value: str) -> Optional[CallRecord]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT data FROM calls WHERE {column} = ?", (value,)
+            ).fetchone()
+        return self._record(row)
+
+    def _modify(self, call_id: str, change):
+        """Runs `change(record)` on the call inside a write transaction and
+        stores the record if it returns true. Returns (record, result)."""
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so a callback
+            # handled by another worker can't interleave with ours.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                record = self._record(
+                    self._db.execute(
+                        "SELECT data FROM calls WHERE call_uuid = ?", (call_id,)
+                    ).fetchone()
+                )
+                if not record:
+                    self._db.execute("COMMIT")
+                    return None, None
+                state = record.state
+                result = change(record)
+                if result:
+                    self._db.execute(
+                        "UPDATE calls SET plivo_call_uuid = ?, state = ?, data = ?, "
+                        "state_since = CASE WHEN state = ? THEN state_since ELSE ? END "
+                        "WHERE call_uuid = ?",
+                        (
+                            record.plivo_call_uuid,
+                            CallState(record.state).value,
+                            record.model_dump_json(),
+                            CallState(state).value,
+                            time.time(),
+                            call_id,
+                        ),
+                    )
+                self._db.execute("COMMIT")
+                return record, result
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _link(self, call_id: str, plivo_call_uuid: str):
+        def change(record: CallRecord) -> bool:
+            if record.plivo_call_uuid == plivo_call_uuid:
+                return False
+            record.plivo_call_uuid = plivo_call_uuid
+            return True
+
+        self._modify(call_id, change)
+
+    def _transition_sync(self, call_id, state, duration, error_message):
+        before = []
+
+        def change(record: CallRecord) -> bool:
+            before.append(CallState(record.state))
+            _apply_transition(record, state, duration, error_message)
+            # Stored even if it didn't move, for the duration and error.
+            return True
+
+        record, _ = self._modify(call_id, change)
+        if not record:
+            return None
+        return before[0], CallState(record.state) != before[0]
+
+    def _ringing_too_long(self) -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT call_uuid FROM calls WHERE state = ? AND state_since < ?",
+                (CallState.INITIATED.value, time.time() - self._ring_timeout),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _count_states(self) -> Dict[CallState, int]:
+        counts = {state: 0 for state in CallState}
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM calls GROUP BY state").fetchall()
+        for state, count in rows:
+            counts[CallState(state)] = count
+        return counts
+
+    async def add(self, record: CallRecord) -> CallRecord:
+        return await asyncio.to_thread(self._add, record)
+
+    async def get(self, call_id: str) -> Optional[CallRecord]:
+        return await asyncio.to_thread(self._get, "call_uuid", call_id)
+
+    async def get_by_plivo_uuid(self, plivo_call_uuid: str) -> Optional[CallRecord]:
+        return await asyncio.to_thread(self._get, "plivo_call_uuid", plivo_call_uuid)
+
+    async def link_plivo_uuid(self, call_id: str, plivo_call_uuid: str):
+        if plivo_call_uuid:
+            await asyncio.to_thread(self._link, call_id, plivo_call_uuid)
+
+    async def _transition(self, call_id, state, duration, error_message):
+        return await asyncio.to_thread(
+            self._transition_sync, call_id, state, duration, error_message
+        )
+
+    async def _counts(self) -> Dict[CallState, int]:
+        for call_id in await asyncio.to_thread(self._ringing_too_long):
+            await self.transition(call_id, CallState.FAILED, error_message="No answer callback")
+        return await asyncio.to_thread(self._count_states)
+
+
+def create_call_registry() -> CallRegistry:
+    if settings.CALL_STATE_BACKEND == "memory":
+        return InMemoryCallRegistry()
+    elif settings.CALL_STATE_BACKEND == "sqlite":
+        return SQLiteCallRegistry()
+    raise ValueError(f"Unknown call state backend: {settings.CALL_STATE_BACKEND}")
+
+
+call_registry = create_call_registry()
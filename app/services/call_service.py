@@ -1,34 +1,36 @@
-import plivo
-import boto3
 import uuid
+from typing import Mapping, Optional
+from urllib.parse import quote
 from loguru import logger
 from datetime import datetime
 from app.config import settings
 from app.models.call_models import CallRecord, CallState
-import requests
+from app.services.call_registry import CallRegistry, call_registry, state_from_plivo
+from app.services.plivo_client import AsyncPlivoClient, plivo_client
 
 
 class CallService:
-    def __init__(self):
-        self.plivo_client = plivo.RestClient(
-            settings.PLIVO_AUTH_ID, settings.PLIVO_AUTH_TOKEN
-        )
-        self.s3_client = boto3.client(
-            "s3",
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION,
-        )
+    def __init__(
+        self, client: AsyncPlivoClient = plivo_client, registry: CallRegistry = call_registry
+    ):
+        self.plivo_client = client
+        self.registry = registry
 
-    async def make_outbound_call(self, to_number: str) -> CallRecord:
+    async def make_outbound_call(
+        self, to_number: str, agent: Optional[str] = None, call_uuid: Optional[str] = None
+    ) -> CallRecord:
+        call_uuid = call_uuid or str(uuid.uuid4())
         try:
-            call_uuid = str(uuid.uuid4())
+            answer_url = f"{settings.BASE_URL}/api/v1/calls/answer/{call_uuid}"
+            if agent:
+                # Carried through the answer webhook to the stream, see get_stream_xml.
+                answer_url += f"?agent={quote(agent)}"
             # Make actual Plivo outbound call
-            response = self.plivo_client.calls.create(
+            response = await self.plivo_client.create_call(
                 ring_url="https://ontune.s3.ap-south-1.amazonaws.com/ringbacktone-original.mp3",
                 from_=settings.PLIVO_FROM_NUMBER,
                 to_=to_number,
-                answer_url=f"{settings.BASE_URL}/api/v1/calls/answer/{call_uuid}",
+                answer_url=answer_url,
                 answer_method="POST",
                 hangup_url=f"{settings.BASE_URL}/api/v1/calls/hangup/{call_uuid}",
                 hangup_method="POST",
@@ -45,63 +47,51 @@ class CallService:
             )
 
             logger.info(f"Initiated outbound call to {to_number}")
-            return call_record
+            return await self.registry.add(call_record)
         except Exception as e:
-            # TODO: update call failed status
             logger.error(f"Failed to make outbound call: {str(e)}")
-            raise
-
-    async def handle_inbound_call(self, from_number: str) -> CallRecord:
-        try:
-            # Handle real inbound call
-            call_uuid = self.plivo_client.calls.get_live()[0].call_uuid
-            call_record = CallRecord(
-                call_uuid=call_uuid,
-                from_number=from_number,
-                to_number=settings.PLIVO_FROM_NUMBER,
-                direction="inbound",
-                state=CallState.IN_PROGRESS,
-                start_time=datetime.now(),
+            await self.registry.add(
+                CallRecord(
+                    call_uuid=call_uuid,
+                    from_number=settings.PLIVO_FROM_NUMBER,
+                    to_number=to_number,
+                    direction="outbound",
+                    state=CallState.FAILED,
+                    start_time=datetime.now(),
+                    error_message=str(e),
+                )
             )
-            logger.info(f"Handling inbound call from {from_number}")
-            return call_record
-        except Exception as e:
-            logger.error(f"Failed to handle inbound call: {str(e)}")
             raise
 
-    async def store_recording(self, call_uuid: str, recording_url: str) -> str:
-        try:
-            # Download recording from Plivo URL
-            response = requests.get(recording_url)
-            response.raise_for_status()
-
-            # Store in S3
-            s3_path = f"recordings/{call_uuid}.mp3"
-            self.s3_client.put_object(
-                Bucket=settings.S3_BUCKET_NAME,
-                Key=s3_path,
-                Body=response.content,
-                ContentType="audio/mpeg",
+    async def handle_callback(self, call_id: str, data: Mapping) -> CallRecord:
+        """Applies a Plivo answer, status or hangup callback to the call.
+        Safe to call with repeated or out of order callbacks."""
+        record = await self.registry.get(call_id)
+        if not record:
+            # Placed by another worker or before a restart, track it from now on.
+            record = await self.registry.add(
+                CallRecord(
+                    call_uuid=call_id,
+                    from_number=data.get("From", ""),
+                    to_number=data.get("To", ""),
+                    direction=data.get("Direction", "outbound"),
+                    state=CallState.INITIATED,
+                    start_time=datetime.now(),
+                )
             )
-            logger.info(f"Stored recording for call {call_uuid} at {s3_path}")
-            return s3_path
-        except Exception as e:
-            logger.error(f"Failed to store recording: {str(e)}")
-            raise
+        if data.get("CallUUID"):
+            await self.registry.link_plivo_uuid(call_id, data["CallUUID"])
 
-    async def update_call_state(
-        self, call_record: CallRecord, new_state: CallState
-    ) -> CallRecord:
-        try:
-            call_record.state = new_state
-            if new_state == CallState.COMPLETED:
-                call_record.end_time = datetime.now()
-                if call_record.start_time:
-                    call_record.duration = int(
-                        (call_record.end_time - call_record.start_time).total_seconds()
-                    )
-            logger.info(f"Updated call {call_record.call_uuid} state to {new_state}")
-            return call_record
-        except Exception as e:
-            logger.error(f"Failed to update call state: {str(e)}")
-            raise
+        state = state_from_plivo(data)
+        if state:
+            duration = data.get("Duration")
+            error = None
+            if state in (CallState.FAILED, CallState.REJECTED, CallState.USERBUSY):
+                error = data.get("HangupCauseName") or None
+            await self.registry.transition(
+                call_id,
+                state,
+                duration=int(duration) if str(duration or "").isdigit() else None,
+                error_message=error,
+            )
+        return record
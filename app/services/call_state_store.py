@@ -0,0 +1,181 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+from app.models.call_models import CallStatus
+
+
+class CallStateStore(ABC):
+    """Where call status lives. Everything that reads or writes a call's status
+    (the WebSocket endpoint, webhooks, status queries) goes through a store, so
+    with a shared backend they can run in different worker processes.
+
+    """
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+
+    @abstractmethod
+    async def get(self, call_uuid: str) -> Optional[CallStatus]:
+        pass
+
+    @abstractmethod
+    async def set(self, call_uuid: str, status: CallStatus):
+        pass
+
+    @abstractmethod
+    async def update(self, call_uuid: str, **fields) -> Optional[CallStatus]:
+        """Updates some fields of an existing call atomically. Returns the new
+        status, or None if the call is unknown.
+
+        """
+        pass
+
+    @abstractmethod
+    async def delete(self, call_uuid: str):
+        pass
+
+    @abstractmethod
+    async def count(self, status: Optional[str] = None) -> int:
+        pass
+
+
+class InMemoryCallStateStore(CallStateStore):
+    """Process-local store. Only correct with a single worker."""
+
+    def __init__(self, ttl: float):
+        super().__init__(ttl)
+        self._calls: Dict[str, Tuple[CallStatus, float]] = {}
+
+    def _purge(self):
+        expired_before = time.time() - self._ttl
+        for call_uuid in [c for c, (_, t) in self._calls.items() if t < expired_before]:
+            del self._calls[call_uuid]
+
+    async def get(self, call_uuid: str) -> Optional[CallStatus]:
+        entry = self._calls.get(call_uuid)
+        return dict(entry[0]) if entry else None
+
+    async def set(self, call_uuid: str, status: CallStatus):
+        self._purge()
+        self._calls[call_uuid] = (dict(status), time.time())
+
+    async def update(self, call_uuid: str, **fields) -> Optional[CallStatus]:
+        entry = self._calls.get(call_uuid)
+        if not entry:
+            return None
+        status = {**entry[0], **fields}
+        self._calls[call_uuid] = (status, time.time())
+        return dict(status)
+
+    async def delete(self, call_uuid: str):
+        self._calls.pop(call_uuid, None)
+
+    async def count(self, status: Optional[str] = None) -> int:
+        return sum(1 for s, _ in self._calls.values() if status is None or s["status"] == status)
+
+
+class SQLiteCallStateStore(CallStateStore):
+    """Store backed by a SQLite file, shared by every worker process on the
+    host. Queries run in a thread so they never block the event loop.
+
+    """
+
+    def __init__(self, path: str, ttl: float):
+        super().__init__(ttl)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS call_status ("
+            "call_uuid TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS call_status_updated_at ON call_status (updated_at)"
+        )
+
+    def _get(self, call_uuid: str) -> Optional[CallStatus]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM call_status WHERE call_uuid = ?", (call_uuid,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set(self, call_uuid: str, status: CallStatus):
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM call_status WHERE updated_at < ?", (now - self._ttl,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO call_status (call_uuid, status, data, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (call_uuid, status["status"], json.dumps(status), now),
+            )
+
+    def _update(self, call_uuid: str, fields: dict) -> Optional[CallStatus]:
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so a concurrent
+            # update from another worker can't interleave with ours.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT data FROM call_status WHERE call_uuid = ?", (call_uuid,)
+                ).fetchone()
+                if not row:
+                    self._db.execute("COMMIT")
+                    return None
+                status = {**json.loads(row[0]), **fields}
+                self._db.execute(
+                    "UPDATE call_status SET status = ?, data = ?, updated_at = ? WHERE call_uuid = ?",
+                    (status["status"], json.dumps(status), time.time(), call_uuid),
+                )
+                self._db.execute("COMMIT")
+                return status
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _delete(self, call_uuid: str):
+        with self._lock:
+            self._db.execute("DELETE FROM call_status WHERE call_uuid = ?", (call_uuid,))
+
+    def _count(self, status: Optional[str]) -> int:
+        with self._lock:
+            if status is None:
+                row = self._db.execute("SELECT COUNT(*) FROM call_status").fetchone()
+            else:
+                row = self._db.execute(
+                    "SELECT COUNT(*) FROM call_status WHERE status = ?", (status,)
+                ).fetchone()
+        return row[0]
+
+    async def get(self, call_uuid: str) -> Optional[CallStatus]:
+        return await asyncio.to_thread(self._get, call_uuid)
+
+    async def set(self, call_uuid: str, status: CallStatus):
+        await asyncio.to_thread(self._set, call_uuid, status)
+
+    async def update(self, call_uuid: str, **fields) -> Optional[CallStatus]:
+        return await asyncio.to_thread(self._update, call_uuid, fields)
+
+    async def delete(self, call_uuid: str):
+        await asyncio.to_thread(self._delete, call_uuid)
+
+    async def count(self, status: Optional[str] = None) -> int:
+        return await asyncio.to_thread(self._count, status)
+
+
+def create_call_state_store() -> CallStateStore:
+    if settings.CALL_STATE_BACKEND == "memory":
+        return InMemoryCallStateStore(settings.CALL_STATE_TTL_SECONDS)
+    elif settings.CALL_STATE_BACKEND == "sqlite":
+        return SQLiteCallStateStore(settings.CALL_STATE_SQLITE_PATH, settings.CALL_STATE_TTL_SECONDS)
+    raise ValueError(f"Unknown call state backend: {settings.CALL_STATE_BACKEND}")
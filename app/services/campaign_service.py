@@ -0,0 +1,213 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.models.call_models import CallRecord, CallState, CampaignProgress, CampaignStatus
+from app.services.admission import AdmissionController, admission_controller
+from app.services.call_registry import CallRegistry, call_registry
+from app.services.call_service import CallService
+
+
+class TokenBucket:
+    """Token bucket limiting how many calls per second we place. `capacity`
+    is the burst allowed after an idle period."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class Campaign:
+    def __init__(self, numbers: List[str], agent: Optional[str] = None):
+        self.campaign_id = uuid.uuid4().hex
+        self.numbers = numbers
+        self.agent = agent
+        self.records: List[CallRecord] = []
+        self.status = CampaignStatus.RUNNING
+        self.created_at = datetime.now()
+        self.next_index = 0
+        self.resumed = asyncio.Event()
+        self.resumed.set()
+        self.task: Optional[asyncio.Task] = None
+
+    def progress(self) -> CampaignProgress:
+        states: Dict[str, int] = {}
+        for record in self.records:
+            states[record.state] = states.get(record.state, 0) + 1
+        return CampaignProgress(
+            campaign_id=self.campaign_id,
+            status=self.status,
+            total=len(self.numbers),
+            dialed=len(self.records),
+            remaining=len(self.numbers) - self.next_index,
+            states=states,
+            created_at=self.created_at,
+        )
+
+
+class CampaignService:
+    """Dials campaigns through a shared CPS limit and a cap on concurrent calls.
+
+    The cap counts the live calls in the `CallRegistry` (ringing or in
+    progress, inbound ones included) plus calls being placed, so the dialer
+    never places more calls than the bots can serve. The registry's state
+    comes from Plivo's callbacks, nothing is polled. Dialing also waits while
+    the `AdmissionController` would turn calls away, rather than placing
+    calls only to hang them up on answer.
+
+    Campaigns that completed or were cancelled are forgotten `ttl` seconds
+    later, like the calls in the registry.
+
+    """
+
+    def __init__(
+        self,
+        call_service: CallService,
+        registry: CallRegistry = call_registry,
+        admission: AdmissionController = admission_controller,
+        cps: float = settings.CAMPAIGN_CPS,
+        max_concurrent_calls: int = settings.CAMPAIGN_MAX_CONCURRENT_CALLS,
+        poll_interval: float = 0.25,
+        ttl: float = settings.CALL_STATE_TTL_SECONDS,
+    ):
+        self._call_service = call_service
+        self._registry = registry
+        self._admission = admission
+        self._bucket = TokenBucket(cps)
+        self._max_concurrent_calls = max_concurrent_calls
+        self._poll_interval = poll_interval
+        self._dialing = 0
+        self._ttl = ttl
+        self._campaigns: Dict[str, Campaign] = {}
+        self._finished: Deque[Tuple[float, str]] = deque()
+
+    def _purge(self):
+        deadline = time.monotonic() - self._ttl
+        while self._finished and self._finished[0][0] < deadline:
+            _, campaign_id = self._finished.popleft()
+            self._campaigns.pop(campaign_id, None)
+
+    async def _busy(self) -> int:
+        # _dialing is read after the registry's await, so nothing can
+        # reserve a slot between this and the caller taking one.
+        return await self._registry.live_calls() + self._dialing
+
+    async def _wait_for_capacity(self):
+        while (
+            await self._busy() >= self._max_concurrent_calls or self._admission.saturated() is not None
+        ):
+            await asyncio.sleep(self._poll_interval)
+
+    def create(self, numbers: Iterable[str], agent: Optional[str] = None) -> Campaign:
+        self._purge()
+        campaign = Campaign([n.strip() for n in numbers if n and n.strip()], agent)
+        self._campaigns[campaign.campaign_id] = campaign
+        campaign.task = asyncio.create_task(self._run(campaign))
+        logger.info(f"Started campaign {campaign.campaign_id} with {len(campaign.numbers)} numbers")
+        return campaign
+
+    def get(self, campaign_id: str) -> Optional[Campaign]:
+        self._purge()
+        return self._campaigns.get(campaign_id)
+
+    def list(self) -> List[Campaign]:
+        self._purge()
+        return list(self._campaigns.values())
+
+    def pause(self, campaign_id: str) -> Optional[Campaign]:
+        campaign = self._campaigns.get(campaign_id)
+        if campaign and campaign.status == CampaignStatus.RUNNING:
+            campaign.status = CampaignStatus.PAUSED
+            campaign.resumed.clear()
+        return campaign
+
+    def resume(self, campaign_id: str) -> Optional[Campaign]:
+        campaign = self._campaigns.get(campaign_id)
+        if campaign and campaign.status == CampaignStatus.PAUSED:
+            campaign.status = CampaignStatus.RUNNING
+            campaign.resumed.set()
+        return campaign
+
+    def cancel(self, campaign_id: str) -> Optional[Campaign]:
+        campaign = self._campaigns.get(campaign_id)
+        if campaign and campaign.status in (CampaignStatus.RUNNING, CampaignStatus.PAUSED):
+            campaign.status = CampaignStatus.CANCELLED
+            if campaign.task:
+                campaign.task.cancel()
+        return campaign
+
+    async def _run(self, campaign: Campaign):
+        dials = set()
+        try:
+            while campaign.next_index < len(campaign.numbers):
+                await campaign.resumed.wait()
+                await self._wait_for_capacity()
+                # Take the slot before waiting for a token, or other
+                # campaigns would see it free meanwhile.
+                self._dialing += 1
+                try:
+                    await self._bucket.acquire()
+                except asyncio.CancelledError:
+                    self._dialing -= 1
+                    raise
+                # We may have been paused while waiting.
+                if not campaign.resumed.is_set():
+                    self._dialing -= 1
+                    continue
+
+                number = campaign.numbers[campaign.next_index]
+                campaign.next_index += 1
+                dial = asyncio.create_task(self._dial(campaign, number))
+                dials.add(dial)
+                dial.add_done_callback(dials.discard)
+
+            await asyncio.gather(*dials)
+            campaign.status = CampaignStatus.COMPLETED
+            logger.info(f"Campaign {campaign.campaign_id} completed")
+        except asyncio.CancelledError:
+            logger.info(f"Campaign {campaign.campaign_id} cancelled")
+        finally:
+            self._finished.append((time.monotonic(), campaign.campaign_id))
+
+    async def _dial(self, campaign: Campaign, number: str):
+        call_uuid = str(uuid.uuid4())
+        try:
+            record = await self._call_service.make_outbound_call(
+                number, agent=campaign.agent, call_uuid=call_uuid
+            )
+        except Exception as e:
+            logger.warning(f"Campaign {campaign.campaign_id} failed to dial {number}: {e}")
+            record = await self._registry.get(call_uuid) or await self._registry.add(
+                CallRecord(
+                    call_uuid=call_uuid,
+                    from_number=settings.PLIVO_FROM_NUMBER,
+                    to_number=number,
+                    direction="outbound",
+                    state=CallState.FAILED,
+                    start_time=datetime.now(),
+                    error_message=str(e),
+                )
+            )
+        finally:
+            self._dialing -= 1
+        campaign.records.append(record)
@@ -0,0 +1,288 @@
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable, List, Optional
+
+from loguru import logger
+from pydantic import BaseModel
+
+from pipecat.frames.frames import CancelFrame, EndFrame, Frame
+from pipecat.processors.aggregators.openai_llm_context import (
+    OpenAILLMContext,
+    OpenAILLMContextFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from app.config import settings
+from app.services.bot_resources import bot_resources
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")
+
+    def count_tokens(text: str) -> int:
+        return len(_encoding.encode(text))
+
+except ModuleNotFoundError:
+
+    def count_tokens(text: str) -> int:
+        # Roughly four characters per token for English.
+        return (len(text) + 3) // 4
+
+
+# Tokens the chat format adds around every message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+PROMPT_TOKEN_BUCKETS = (250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 16000, 32000)
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a phone conversation between a user and "
+    "an assistant. Update the summary with the new part of the conversation. "
+    "Keep names, numbers, decisions, open questions and anything the user asked "
+    "to remember. Reply with the summary only, in at most {words} words."
+)
+
+
+def estimate_tokens(message: dict) -> int:
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens = count_tokens(content)
+    elif isinstance(content, list):
+        tokens = sum(
+            count_tokens(part.get("text", "")) for part in content if isinstance(part, dict)
+        )
+    else:
+        tokens = 0
+    if message.get("tool_calls"):
+        tokens += count_tokens(json.dumps(message["tool_calls"]))
+    return tokens + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextMetrics:
+    """Process-wide prompt size and summarization counters."""
+
+    def __init__(self):
+        self.turns = 0
+        self.prompt_tokens_sum = 0
+        self.prompt_tokens_max = 0
+        self._bucket_counts = [0] * len(PROMPT_TOKEN_BUCKETS)
+        self.trims = 0
+        self.folded_messages = 0
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def record_prompt(self, tokens: int):
+        self.turns += 1
+        self.prompt_tokens_sum += tokens
+        self.prompt_tokens_max = max(self.prompt_tokens_max, tokens)
+        for i, bound in enumerate(PROMPT_TOKEN_BUCKETS):
+            if tokens <= bound:
+                self._bucket_counts[i] += 1
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP voice_llm_prompt_tokens Estimated prompt tokens sent to the LLM per turn.",
+            "# TYPE voice_llm_prompt_tokens histogram",
+        ]
+        for bound, count in zip(PROMPT_TOKEN_BUCKETS, self._bucket_counts):
+            lines.append(f'voice_llm_prompt_tokens_bucket{{le="{bound}"}} {count}')
+        lines.append(f'voice_llm_prompt_tokens_bucket{{le="+Inf"}} {self.turns}')
+        lines.append(f"voice_llm_prompt_tokens_sum {self.prompt_tokens_sum}")
+        lines.append(f"voice_llm_prompt_tokens_count {self.turns}")
+        counters = (
+            ("voice_llm_context_trims_total", self.trims, "Times a context was cut to budget."),
+            (
+                "voice_llm_context_folded_messages_total",
+                self.folded_messages,
+                "Messages folded into rolling summaries.",
+            ),
+            ("voice_llm_context_summaries_total", self.summaries, "Rolling summaries produced."),
+            (
+                "voice_llm_context_summary_failures_total",
+                self.summary_failures,
+                "Rolling summaries that failed.",
+            ),
+        )
+        for name, value, help_text in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+async def summarize_with_openai(
+    previous: Optional[str], messages: List[dict], model: str, max_words: int
+) -> str:
+    client = bot_resources.openai_client(api_key=os.getenv("OPENAI_API_KEY"))
+    conversation = "\n".join(
+        f"{m['role']}: {m['content']}" for m in messages if isinstance(m.get("content"), str)
+    )
+    response = await client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(words=max_words)},
+            {
+                "role": "user",
+                "content": (
+                    f"Summary so far:\n{previous or '(none)'}\n\n"
+                    f"New conversation:\n{conversation}"
+                ),
+            },
+        ],
+    )
+    return response.choices[0].message.content.strip()
+
+
+class ContextWindowParams(BaseModel):
+    enabled: bool = settings.LLM_CONTEXT_WINDOW_ENABLED
+    max_tokens: int = settings.LLM_CONTEXT_MAX_TOKENS
+    # What the context is cut down to once it's over `max_tokens`. Cutting
+    # well below the limit means we trim (and summarize) every few turns
+    # rather than on every turn. Defaults to 60% of `max_tokens`.
+    trim_to_tokens: Optional[int] = None
+    summary_model: str = settings.LLM_CONTEXT_SUMMARY_MODEL
+    summary_max_words: int = 150
+
+
+class ContextWindowManager(FrameProcessor):
+    """Keeps the LLM context of a call within a token budget.
+
+    Sits between the user context aggregator and the LLM. Leading system
+    messages and the most recent turns are always sent as they are. When the
+    context grows past `max_tokens`, the oldest turns are cut and folded into
+    a rolling summary, sent as a system message after the system prompt. The
+    summary is written by a separate LLM request in the background, so the
+    turn that triggered it goes out immediately, without the folded turns.
+
+    """
+
+    def __init__(
+        self,
+        params: ContextWindowParams = ContextWindowParams(),
+        metrics: Optional[ContextMetrics] = None,
+        summarize: Optional[Callable[[Optional[str], List[dict]], Awaitable[str]]] = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._params = params
+        self._trim_to = params.trim_to_tokens or int(params.max_tokens * 0.6)
+        self._metrics = metrics or context_metrics
+        self._summarize = summarize or (
+            lambda previous, messages: summarize_with_openai(
+                previous, messages, params.summary_model, params.summary_max_words
+            )
+        )
+
+        # Token estimates of the context messages we've already seen, in order.
+        self._counts: List[int] = []
+        self._counted_last: Optional[dict] = None
+
+        self._summary: Optional[str] = None
+        self._summary_message: Optional[dict] = None
+        self._to_fold: List[dict] = []
+        self._summary_task: Optional[asyncio.Task] = None
+        self._turns = 0
+        self._prompt_tokens_last = 0
+        self._prompt_tokens_max = 0
+
+    def summary(self) -> dict:
+        return {
+            "turns": self._turns,
+            "prompt_tokens_last": self._prompt_tokens_last,
+            "prompt_tokens_max": self._prompt_tokens_max,
+        }
+
+    def _update_counts(self, messages: List[dict]):
+        n = len(self._counts)
+        if n > len(messages) or (n and messages[n - 1] is not self._counted_last):
+            self._counts = []
+            n = 0
+        self._counts.extend(estimate_tokens(m) for m in messages[n:])
+        self._counted_last = messages[-1] if messages else None
+
+    def _leading_system_messages(self, messages: List[dict]) -> int:
+        head = 0
+        while head < len(messages) and messages[head].get("role") == "system":
+            head += 1
+        return head
+
+    def _trim(self, context: OpenAILLMContext):
+        messages = context.messages
+        head = self._leading_system_messages(messages)
+        last_user = max(
+            (i for i in range(head, len(messages)) if messages[i].get("role") == "user"),
+            default=None,
+        )
+        if last_user is None:
+            return
+
+        total = sum(self._counts)
+        cut = head
+        while cut < last_user and total > self._trim_to:
+            total -= self._counts[cut]
+            cut += 1
+        # Only cut at the start of a turn, so an assistant message (or a tool
+        # call and its result) is never separated from what prompted it.
+        while cut < last_user and messages[cut].get("role") != "user":
+            total -= self._counts[cut]
+            cut += 1
+        if cut == head:
+            return
+
+        folded = messages[head:cut]
+        context.set_messages(messages[:head] + messages[cut:])
+        self._counts = self._counts[:head] + self._counts[cut:]
+        self._metrics.trims += 1
+        self._metrics.folded_messages += len(folded)
+        logger.debug(f"{self}: folded {len(folded)} messages, context now ~{total} tokens")
+
+        self._to_fold.extend(folded)
+        if not self._summary_task:
+            self._summary_task = self.get_event_loop().create_task(self._summary_handler(context))
+
+    async def _summary_handler(self, context: OpenAILLMContext):
+        try:
+            while self._to_fold:
+                folded, self._to_fold = self._to_fold, []
+                try:
+                    self._summary = await self._summarize(self._summary, folded)
+                except Exception as e:
+                    self._metrics.summary_failures += 1
+                    logger.error(f"{self}: unable to summarize {len(folded)} messages: {e}")
+                    continue
+                self._metrics.summaries += 1
+                content = f"Summary of the earlier conversation: {self._summary}"
+                in_context = any(m is self._summary_message for m in context.messages)
+                if self._summary_message and in_context:
+                    self._summary_message["content"] = content
+                else:
+                    self._summary_message = {"role": "system", "content": content}
+                    messages = context.messages
+                    head = self._leading_system_messages(messages)
+                    context.set_messages(messages[:head] + [self._summary_message] + messages[head:])
+                # Estimates are no longer aligned with the messages.
+                self._counts = []
+        finally:
+            self._summary_task = None
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, OpenAILLMContextFrame) and self._params.enabled:
+            messages = frame.context.messages
+            self._update_counts(messages)
+            if sum(self._counts) > self._params.max_tokens:
+                self._trim(frame.context)
+            tokens = sum(self._counts)
+            self._turns += 1
+            self._prompt_tokens_last = tokens
+            self._prompt_tokens_max = max(self._prompt_tokens_max, tokens)
+            self._metrics.record_prompt(tokens)
+        elif isinstance(frame, (EndFrame, CancelFrame)) and self._summary_task:
+            self._summary_task.cancel()
+
+        await self.push_frame(frame, direction)
+
+
+context_metrics = ContextMetrics()
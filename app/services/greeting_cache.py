@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.services.bot_resources import bot_resources
+
+ELEVENLABS_API_URL = "https://api.elevenlabs.io"
+
+
+@dataclass(frozen=True)
+class GreetingSpec:
+    """Everything that determines what the opening line sounds like."""
+
+    system_prompt: str
+    intro_prompt: str
+    llm_model: str
+    voice_id: str
+    tts_model: str = "eleven_flash_v2_5"
+    sample_rate: int = 24000
+    language: str = "en"
+
+    @property
+    def key(self) -> str:
+        data = json.dumps(asdict(self), sort_keys=True).encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+
+@dataclass
+class Greeting:
+    text: str
+    audio: bytes
+    sample_rate: int
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+class GreetingCache:
+    """Disk-backed LRU cache of synthesized greetings.
+
+    Each entry is a raw PCM file plus a small JSON sidecar with the text, both
+    named after the `GreetingSpec` key. The total size of the audio files is
+    bounded by `max_bytes`, least recently used entries are evicted first.
+
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self._dir = Path(cache_dir)
+        self._max_bytes = max_bytes
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        self._greetings: Dict[str, Greeting] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._loaded = False
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def _audio_path(self, key: str) -> Path:
+        return self._dir / f"{key}.pcm"
+
+    def _meta_path(self, key: str) -> Path:
+        return self._dir / f"{key}.json"
+
+    def _load_index(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self._dir.exists():
+            return
+        entries = []
+        for audio_path in self._dir.glob("*.pcm"):
+            if self._meta_path(audio_path.stem).exists():
+                stat = audio_path.stat()
+                entries.append((stat.st_mtime, audio_path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+
+    def _read(self, key: str) -> Greeting:
+        meta = json.loads(self._meta_path(key).read_text())
+        audio = self._audio_path(key).read_bytes()
+        os.utime(self._audio_path(key))
+        return Greeting(text=meta["text"], audio=audio, sample_rate=meta["sample_rate"])
+
+    def _write(self, key: str, greeting: Greeting):
+        # Each file is written under a temporary name and renamed, the
+        # sidecar last: an entry only counts once its sidecar exists, so a
+        # crash or another worker reading meanwhile never sees it half
+        # written.
+        self._dir.mkdir(parents=True, exist_ok=True)
+        _write_atomic(self._audio_path(key), greeting.audio)
+        meta = {"text": greeting.text, "sample_rate": greeting.sample_rate}
+        _write_atomic(self._meta_path(key), json.dumps(meta).encode("utf-8"))
+
+    def _evict(self):
+        while self._sizes and self.total_bytes > self._max_bytes:
+            key, _ = self._sizes.popitem(last=False)
+            self._greetings.pop(key, None)
+            for path in (self._audio_path(key), self._meta_path(key)):
+                path.unlink(missing_ok=True)
+            logger.debug(f"Evicted greeting {key}")
+
+    async def get(self, spec: GreetingSpec) -> Optional[Greeting]:
+        await asyncio.to_thread(self._load_index)
+        key = spec.key
+        if key not in self._sizes:
+            return None
+
+        self._sizes.move_to_end(key)
+        greeting = self._greetings.get(key)
+        if not greeting:
+            try:
+                greeting = await asyncio.to_thread(self._read, key)
+            except Exception as e:
+                logger.error(f"Unable to read cached greeting {key}: {e}")
+                self._sizes.pop(key, None)
+                return None
+            self._greetings[key] = greeting
+        return greeting
+
+    async def put(self, spec: GreetingSpec, greeting: Greeting):
+        await asyncio.to_thread(self._load_index)
+        key = spec.key
+        await asyncio.to_thread(self._write, key, greeting)
+        self._sizes[key] = len(greeting.audio)
+        self._sizes.move_to_end(key)
+        self._greetings[key] = greeting
+        await asyncio.to_thread(self._evict)
+
+    def fill(self, spec: GreetingSpec) -> asyncio.Task:
+        """Synthesizes and stores the greeting for `spec` in the background.
+        Concurrent requests for the same spec share one task.
+
+        """
+        key = spec.key
+        task = self._pending.get(key)
+        if not task:
+            task = asyncio.create_task(self._fill(spec))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return task
+
+    async def _fill(self, spec: GreetingSpec):
+        try:
+            if await self.get(spec):
+                return
+            greeting = await synthesize_greeting(spec)
+            await self.put(spec, greeting)
+            logger.info(f"Cached greeting {spec.key}: {greeting.text}")
+        except Exception as e:
+            logger.error(f"Unable to cache greeting {spec.key}: {e}")
+
+
+async def synthesize_greeting(spec: GreetingSpec) -> Greeting:
+    """Runs the same LLM + TTS round trip a call would do for its first turn."""
+    client = bot_resources.openai_client(api_key=settings.OPENAI_API_KEY)
+    completion = await client.chat.completions.create(
+        model=spec.llm_model,
+        messages=[
+            {"role": "system", "content": spec.system_prompt},
+            {"role": "system", "content": spec.intro_prompt},
+        ],
+    )
+    text = completion.choices[0].message.content.strip()
+
+    session = bot_resources.http_session()
+    async with session.post(
+        f"{ELEVENLABS_API_URL}/v1/text-to-speech/{spec.voice_id}/stream",
+        json={"text": text, "model_id": spec.tts_model, "language_code": spec.language},
+        headers={"xi-api-key": settings.ELEVEN_API_KEY, "Content-Type": "application/json"},
+        params={"output_format": f"pcm_{spec.sample_rate}"},
+    ) as response:
+        if response.status != 200:
+            raise Exception(f"ElevenLabs API error: {await response.text()}")
+        audio = await response.read()
+
+    # Keep whole 16-bit samples.
+    audio = audio[: len(audio) - len(audio) % 2]
+    return Greeting(text=text, audio=audio, sample_rate=spec.sample_rate)
+
+
+greeting_cache = GreetingCache(settings.GREETING_CACHE_DIR, settings.GREETING_CACHE_MAX_BYTES)
@@ -0,0 +1,249 @@
+import math
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    BotStartedSpeakingFrame,
+    Frame,
+    LLMTextFrame,
+    TranscriptionFrame,
+    TTSAudioRawFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+# Turn milestones, in the order they happen. Every latency is measured from
+# the moment VAD decided the user stopped speaking.
+STAGES = ("stt", "llm", "tts", "audio")
+
+# Bucket bounds (seconds) of the exported Prometheus histograms.
+PROMETHEUS_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_SUB_BUCKET_BITS = 5
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+
+
+class LatencyHistogram:
+    """HDR-style histogram of latencies with microsecond resolution.
+
+    Values are grouped in log-linear buckets: 32 linear sub-buckets per power
+    of two, so any recorded value is reproduced within ~3%, recording is O(1)
+    and memory is constant no matter how many values are recorded.
+
+    """
+
+    def __init__(self, max_seconds: float = 60.0):
+        self._max_value = int(max_seconds * 1_000_000)
+        self._counts = [0] * (self._index(self._max_value) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    @staticmethod
+    def _index(value: int) -> int:
+        if value < _SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+        return (shift + 1) * _SUB_BUCKETS + (value >> shift) - _SUB_BUCKETS
+
+    @staticmethod
+    def _bounds(index: int):
+        """Returns the [lower, upper) value range (microseconds) of a bucket."""
+        if index < _SUB_BUCKETS:
+            return index, index + 1
+        shift = index // _SUB_BUCKETS - 1
+        mantissa = index % _SUB_BUCKETS + _SUB_BUCKETS
+        return mantissa << shift, (mantissa + 1) << shift
+
+    def record(self, seconds: float):
+        seconds = max(seconds, 0.0)
+        value = min(int(seconds * 1_000_000), self._max_value)
+        self._counts[self._index(value)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                lower, upper = self._bounds(i)
+                value = (lower + upper - 1) / 2 / 1_000_000
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def cumulative_counts(self, bounds) -> List[int]:
+        """Number of values at or below each of `bounds` (seconds)."""
+        counts = []
+        seen = 0
+        i = 0
+        for bound in bounds:
+            limit = bound * 1_000_000
+            while i < len(self._counts) and self._bounds(i)[1] <= limit:
+                seen += self._counts[i]
+                i += 1
+            counts.append(seen)
+        return counts
+
+
+class LatencyRegistry:
+    """Process-wide latency histograms, one per turn stage."""
+
+    def __init__(self):
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.turns = 0
+        self.abandoned_turns = 0
+
+    def record_turn(self, latencies: Dict[str, float]):
+        self.turns += 1
+        for stage, seconds in latencies.items():
+            self.histograms[stage].record(seconds)
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP voice_turn_latency_seconds Time from the user's end of speech to each turn stage.",
+            "# TYPE voice_turn_latency_seconds histogram",
+        ]
+        for stage, histogram in self.histograms.items():
+            for bound, count in zip(
+                PROMETHEUS_BUCKETS, histogram.cumulative_counts(PROMETHEUS_BUCKETS)
+            ):
+                lines.append(
+                    f'voice_turn_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'voice_turn_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}'
+            )
+            lines.append(f'voice_turn_latency_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'voice_turn_latency_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines.append(
+            "# HELP voice_turn_latency_quantile_seconds Turn stage latency percentiles in this process."
+        )
+        lines.append("# TYPE voice_turn_latency_quantile_seconds gauge")
+        for stage, histogram in self.histograms.items():
+            for q in QUANTILES:
+                lines.append(
+                    f'voice_turn_latency_quantile_seconds{{stage="{stage}",quantile="{q}"}} '
+                    f"{histogram.percentile(q):.6f}"
+                )
+
+        lines.append("# HELP voice_turns_total Turns that reached the first audio frame.")
+        lines.append("# TYPE voice_turns_total counter")
+        lines.append(f"voice_turns_total {self.turns}")
+        lines.append("# HELP voice_turns_abandoned_total Turns interrupted before any audio was sent.")
+        lines.append("# TYPE voice_turns_abandoned_total counter")
+        lines.append(f"voice_turns_abandoned_total {self.abandoned_turns}")
+        return "\n".join(lines) + "\n"
+
+
+class TurnLatencyTracker:
+    """Follows the turns of one call and records how long each stage took.
+
+    A turn starts when VAD reports the user stopped speaking and completes at
+    the first audio frame sent back. Turns the user interrupts before then are
+    counted as abandoned.
+
+    """
+
+    def __init__(self, call_id: str, registry: "LatencyRegistry"):
+        self._call_id = call_id
+        self._registry = registry
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self._turn_start: Optional[float] = None
+        self._marks: Dict[str, float] = {}
+        self._early_transcription = False
+        self._last_vad_frame_id: Optional[int] = None
+
+    def _mark(self, stage: str):
+        if self._turn_start is None or stage in self._marks:
+            return
+        self._marks[stage] = time.perf_counter() - self._turn_start
+        if stage == "audio":
+            self._complete()
+
+    def _complete(self):
+        latencies = dict(self._marks)
+        for stage, seconds in latencies.items():
+            self.histograms[stage].record(seconds)
+        self._registry.record_turn(latencies)
+        logger.debug(
+            f"Turn latency for call {self._call_id}: "
+            + ", ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in latencies.items())
+        )
+        self._turn_start = None
+        self._marks = {}
+
+    def on_frame(self, frame: Frame):
+        if isinstance(frame, (UserStartedSpeakingFrame, UserStoppedSpeakingFrame)):
+            # Several probes may see the same VAD frame.
+            if frame.id == self._last_vad_frame_id:
+                return
+            self._last_vad_frame_id = frame.id
+
+        if isinstance(frame, UserStartedSpeakingFrame):
+            if self._turn_start is not None:
+                self._registry.abandoned_turns += 1
+            self._turn_start = None
+            self._marks = {}
+            self._early_transcription = False
+        elif isinstance(frame, UserStoppedSpeakingFrame):
+            self._turn_start = time.perf_counter()
+            self._marks = {}
+            # The final transcript sometimes arrives before VAD gives up on
+            # the user, in which case STT added no latency.
+            if self._early_transcription:
+                self._marks["stt"] = 0.0
+            self._early_transcription = False
+        elif isinstance(frame, TranscriptionFrame):
+            if self._turn_start is None:
+                self._early_transcription = True
+            self._mark("stt")
+        elif isinstance(frame, LLMTextFrame):
+            self._mark("llm")
+        elif isinstance(frame, TTSAudioRawFrame):
+            self._mark("tts")
+        elif isinstance(frame, BotStartedSpeakingFrame):
+            self._mark("audio")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {
+                "count": histogram.count,
+                "p50": histogram.percentile(0.5),
+                "p95": histogram.percentile(0.95),
+            }
+            for stage, histogram in self.histograms.items()
+        }
+
+
+class LatencyProbe(FrameProcessor):
+    """Pass-through processor that reports the frames it sees to a tracker.
+
+    Insert one after each stage whose output should be timed. The output
+    transport announces the first audio it sends with a BotStartedSpeakingFrame,
+    so a probe after `transport.output()` marks the end of the turn.
+
+    """
+
+    def __init__(self, tracker: TurnLatencyTracker, **kwargs):
+        super().__init__(**kwargs)
+        self._tracker = tracker
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        self._tracker.on_frame(frame)
+        await self.push_frame(frame, direction)
+
+
+latency_registry = LatencyRegistry()
@@ -0,0 +1,112 @@
+import asyncio
+from typing import Optional
+
+import aiohttp
+from loguru import logger
+
+from app.config import settings
+
+# Responses that mean Plivo didn't act on the request, so it's safe to retry
+# even a call creation.
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+
+class PlivoAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Plivo API error {status}: {message}")
+        self.status = status
+
+
+class AsyncPlivoClient:
+    """Minimal non-blocking client for the Plivo REST API.
+
+    One keep-alive connection pool is shared by every request, the number of
+    requests in flight is bounded, and requests that Plivo rejected without
+    acting on them (rate limiting, unavailable) or that never reached it are
+    retried with exponential backoff.
+
+    """
+
+    def __init__(
+        self,
+        auth_id: str = settings.PLIVO_AUTH_ID,
+        auth_token: str = settings.PLIVO_AUTH_TOKEN,
+        base_url: str = settings.PLIVO_API_URL,
+        max_concurrency: int = settings.PLIVO_MAX_CONCURRENCY,
+        timeout: float = settings.PLIVO_TIMEOUT_SECONDS,
+        max_retries: int = settings.PLIVO_MAX_RETRIES,
+        retry_delay: float = 0.5,
+    ):
+        self._auth = aiohttp.BasicAuth(auth_id, auth_token)
+        self._account_url = f"{base_url.rstrip('/')}/Account/{auth_id}"
+        self._max_concurrency = max_concurrency
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._max_retries = max_retries
+        self._retry_delay = retry_delay
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if not self._session or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                auth=self._auth,
+                timeout=self._timeout,
+                connector=aiohttp.TCPConnector(limit=self._max_concurrency, keepalive_timeout=60),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        url = f"{self._account_url}/{path}"
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self._semaphore:
+                    async with self._get_session().request(method, url, **kwargs) as response:
+                        if response.status < 400:
+                            if response.status == 204:
+                                return {}
+                            return await response.json(content_type=None)
+                        message = await response.text()
+                        if response.status not in RETRYABLE_STATUSES:
+                            raise PlivoAPIError(response.status, message)
+                        error = PlivoAPIError(response.status, message)
+            except aiohttp.ClientConnectorError as e:
+                # The request never reached Plivo.
+                error = e
+
+            if attempt > self._max_retries:
+                raise error
+            delay = self._retry_delay * 2 ** (attempt - 1)
+            logger.warning(f"Plivo {method} {path} failed ({error}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def create_call(
+        self,
+        from_: str,
+        to_: str,
+        answer_url: str,
+        answer_method: str = "POST",
+        hangup_url: Optional[str] = None,
+        hangup_method: str = "POST",
+        ring_url: Optional[str] = None,
+    ) -> dict:
+        payload = {
+            "from": from_,
+            "to": to_,
+            "answer_url": answer_url,
+            "answer_method": answer_method,
+        }
+        if hangup_url:
+            payload["hangup_url"] = hangup_url
+            payload["hangup_method"] = hangup_method
+        if ring_url:
+            payload["ring_url"] = ring_url
+        return await self._request("POST", "Call/", json=payload)
+
+
+plivo_client = AsyncPlivoClient()
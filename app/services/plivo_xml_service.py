@@ -45,6 +45,15 @@ class PlivoXMLService:
         response.add(plivoxml.HangupElement())
         return response.to_string()
 
+    @staticmethod
+    def generate_queue_xml(music_url: str, redirect_url: str) -> str:
+        """Generate XML playing hold music, then fetching new XML from
+        `redirect_url`"""
+        response = plivoxml.ResponseElement()
+        response.add(plivoxml.PlayElement(music_url))
+        response.add(plivoxml.RedirectElement(redirect_url, method="POST"))
+        return response.to_string()
+
     @staticmethod
     def generate_conference_xml(
         room_name: str, participants: List[str], message: str = "Joining conference"
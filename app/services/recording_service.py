@@ -0,0 +1,207 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+
+import aiohttp
+import boto3
+from loguru import logger
+
+from app.config import settings
+
+# S3 requires every part but the last to be at least 5MB.
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+@dataclass
+class RecordingJob:
+    call_uuid: str
+    recording_url: str
+    on_stored: Optional[Callable[[str, str], Awaitable[None]]] = None
+    attempts: int = 0
+
+
+class RecordingService:
+    """Copies call recordings from Plivo to S3 in the background.
+
+    Webhooks only enqueue a job. A fixed number of workers stream each
+    recording down in chunks and upload it part by part, so memory per job is
+    bounded by the part size and the event loop never waits on the transfer.
+    Failed jobs are retried with exponential backoff.
+
+    """
+
+    def __init__(
+        self,
+        s3_client=None,
+        bucket: str = settings.S3_BUCKET_NAME,
+        concurrency: int = settings.RECORDING_UPLOAD_CONCURRENCY,
+        queue_size: int = settings.RECORDING_QUEUE_SIZE,
+        max_retries: int = settings.RECORDING_MAX_RETRIES,
+        part_size: int = settings.RECORDING_PART_SIZE,
+        retry_delay: float = 2.0,
+    ):
+        self._s3_client = s3_client
+        self._bucket = bucket
+        self._concurrency = concurrency
+        self._queue: asyncio.Queue[RecordingJob] = asyncio.Queue(maxsize=queue_size)
+        self._max_retries = max_retries
+        self._part_size = max(part_size, MIN_PART_SIZE)
+        self._retry_delay = retry_delay
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def s3_client(self):
+        if not self._s3_client:
+            self._s3_client = boto3.client(
+                "s3",
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                region_name=settings.AWS_REGION,
+                endpoint_url=settings.S3_ENDPOINT_URL,
+            )
+        return self._s3_client
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def start(self):
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60)
+        )
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            self._queue.task_done()
+            logger.warning(
+                f"Shutting down, dropping queued recording for call {job.call_uuid}: "
+                f"{job.recording_url}"
+            )
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    def submit(
+        self,
+        call_uuid: str,
+        recording_url: str,
+        on_stored: Optional[Callable[[str, str], Awaitable[None]]] = None,
+    ) -> bool:
+        """Enqueues a recording. Returns False if the queue is full."""
+        try:
+            self._queue.put_nowait(RecordingJob(call_uuid, recording_url, on_stored))
+            return True
+        except asyncio.QueueFull:
+            logger.error(f"Recording queue full, dropping recording for call {call_uuid}")
+            return False
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                logger.warning(
+                    f"Shutting down, dropping recording for call {job.call_uuid} being stored: "
+                    f"{job.recording_url}"
+                )
+                raise
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: RecordingJob):
+        while True:
+            job.attempts += 1
+            try:
+                s3_path = await self.store_recording(job.call_uuid, job.recording_url)
+                if job.on_stored:
+                    await job.on_stored(job.call_uuid, s3_path)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if job.attempts > self._max_retries:
+                    logger.error(
+                        f"Failed to store recording for call {job.call_uuid} after {job.attempts} attempts: {e}"
+                    )
+                    return
+                delay = self._retry_delay * 2 ** (job.attempts - 1)
+                logger.warning(
+                    f"Failed to store recording for call {job.call_uuid} ({e}), retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def store_recording(self, call_uuid: str, recording_url: str) -> str:
+        s3_path = f"recordings/{call_uuid}.mp3"
+        upload_id = None
+        parts = []
+        buffer = bytearray()
+
+        try:
+            async with self._session.get(recording_url) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    buffer.extend(chunk)
+                    if len(buffer) >= self._part_size:
+                        if not upload_id:
+                            upload_id = await asyncio.to_thread(self._create_upload, s3_path)
+                        parts.append(
+                            await asyncio.to_thread(
+                                self._upload_part, s3_path, upload_id, len(parts) + 1, bytes(buffer)
+                            )
+                        )
+                        buffer.clear()
+
+            if upload_id:
+                if buffer:
+                    parts.append(
+                        await asyncio.to_thread(
+                            self._upload_part, s3_path, upload_id, len(parts) + 1, bytes(buffer)
+                        )
+                    )
+                await asyncio.to_thread(self._complete_upload, s3_path, upload_id, parts)
+            else:
+                await asyncio.to_thread(self._put_object, s3_path, bytes(buffer))
+        except BaseException:
+            if upload_id:
+                await asyncio.to_thread(self._abort_upload, s3_path, upload_id)
+            raise
+
+        logger.info(f"Stored recording for call {call_uuid} at {s3_path}")
+        return s3_path
+
+    def _put_object(self, key: str, body: bytes):
+        self.s3_client.put_object(Bucket=self._bucket, Key=key, Body=body, ContentType="audio/mpeg")
+
+    def _create_upload(self, key: str) -> str:
+        response = self.s3_client.create_multipart_upload(
+            Bucket=self._bucket, Key=key, ContentType="audio/mpeg"
+        )
+        return response["UploadId"]
+
+    def _upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        response = self.s3_client.upload_part(
+            Bucket=self._bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=body
+        )
+        return {"ETag": response["ETag"], "PartNumber": part_number}
+
+    def _complete_upload(self, key: str, upload_id: str, parts: list):
+        self.s3_client.complete_multipart_upload(
+            Bucket=self._bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+
+    def _abort_upload(self, key: str, upload_id: str):
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self._bucket, Key=key, UploadId=upload_id)
+        except Exception as e:
+            logger.error(f"Failed to abort upload of {key}: {e}")
+
+
+recording_service = RecordingService()
@@ -0,0 +1,333 @@
+import asyncio
+import re
+import time
+from typing import List, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    CancelFrame,
+    EndFrame,
+    Frame,
+    InterimTranscriptionFrame,
+    StartInterruptionFrame,
+    TranscriptionFrame,
+    UserStartedSpeakingFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+from app.config import settings
+from app.services.bot_resources import SharedOpenAILLMService
+from app.services.context_window import count_tokens, estimate_tokens
+from app.services.latency_metrics import QUANTILES, LatencyHistogram
+
+_NORMALIZE_RE = re.compile(r"[^\w\s]")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_NORMALIZE_RE.sub("", text.lower()).split())
+
+
+class SpeculationMetrics:
+    """Process-wide outcome of speculative LLM requests."""
+
+    def __init__(self):
+        self.started = 0
+        self.promoted = 0
+        self.discarded = 0
+        self.capped = 0
+        self.wasted_prompt_tokens = 0
+        self.wasted_completion_tokens = 0
+        self.latency_saved = LatencyHistogram()
+
+    def render_prometheus(self) -> str:
+        lines = []
+        counters = (
+            ("voice_llm_speculations_total", self.started, "Speculative LLM requests started."),
+            (
+                "voice_llm_speculations_promoted_total",
+                self.promoted,
+                "Speculations used as the response.",
+            ),
+            ("voice_llm_speculations_discarded_total", self.discarded, "Speculations cancelled."),
+            (
+                "voice_llm_speculations_capped_total",
+                self.capped,
+                "Speculations skipped by the per-turn cap.",
+            ),
+            (
+                "voice_llm_speculation_wasted_prompt_tokens_total",
+                self.wasted_prompt_tokens,
+                "Estimated prompt tokens of discarded speculations.",
+            ),
+            (
+                "voice_llm_speculation_wasted_completion_tokens_total",
+                self.wasted_completion_tokens,
+                "Estimated completion tokens of discarded speculations.",
+            ),
+        )
+        for name, value, help_text in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+
+        name = "voice_llm_speculation_latency_saved_seconds"
+        lines.append(f"# HELP {name} Time to first token saved by promoted speculations.")
+        lines.append(f"# TYPE {name} summary")
+        for q in QUANTILES:
+            lines.append(f'{name}{{quantile="{q}"}} {self.latency_saved.percentile(q):.6f}')
+        lines.append(f"{name}_sum {self.latency_saved.sum:.6f}")
+        lines.append(f"{name}_count {self.latency_saved.count}")
+        return "\n".join(lines) + "\n"
+
+
+class _Speculation:
+    """A chat completion started ahead of time. Its chunks are buffered so
+    they can be replayed from the start if it's promoted."""
+
+    def __init__(self, messages: List[dict], key: str):
+        self.messages = messages
+        self.key = key
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.completion_tokens = 0
+        self.chunks = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.updated = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.stream = None
+
+    def matches(self, messages: List[dict]) -> bool:
+        if len(messages) != len(self.messages) or messages[:-1] != self.messages[:-1]:
+            return False
+        last = messages[-1]
+        return (
+            last.get("role") == "user"
+            and isinstance(last.get("content"), str)
+            and _normalize(last["content"]) == self.key
+        )
+
+    async def run(self, stream):
+        self.stream = stream
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    if self.first_token_at is None:
+                        self.first_token_at = time.perf_counter()
+                    self.completion_tokens += count_tokens(chunk.choices[0].delta.content)
+                self.chunks.append(chunk)
+                self.updated.set()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self.updated.set()
+
+    async def replay(self):
+        i = 0
+        while True:
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.done:
+                if self.error:
+                    raise self.error
+                return
+            self.updated.clear()
+            if i == len(self.chunks) and not self.done:
+                await self.updated.wait()
+
+    async def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+        if self.stream is not None:
+            try:
+                await self.stream.close()
+            except Exception:
+                pass
+
+
+class SpeculativeOpenAILLMService(SharedOpenAILLMService):
+    """OpenAI LLM service that can start a response before the final transcript.
+
+    A `SpeculationTrigger` placed before the user context aggregator calls
+    `speculate()` with the text heard so far. That starts a completion for
+    the current context plus that text in the background. When the real
+    context arrives and its last user message matches the speculated text
+    (ignoring case and punctuation), the speculative stream, including
+    anything already received, is used as the response. Otherwise it's
+    cancelled and a normal request is made. At most
+    `max_speculations_per_turn` requests are started per turn.
+
+    """
+
+    def __init__(
+        self,
+        *args,
+        max_speculations_per_turn: int = settings.LLM_SPECULATION_MAX_PER_TURN,
+        metrics: Optional[SpeculationMetrics] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self._max_speculations_per_turn = max_speculations_per_turn
+        self._speculation_metrics = metrics or speculation_metrics
+        self._speculation: Optional[_Speculation] = None
+        self._turn_speculations = 0
+        self._promoted = 0
+        self._discarded = 0
+
+    def speculation_trigger(self, context: OpenAILLMContext, **kwargs) -> "SpeculationTrigger":
+        return SpeculationTrigger(self, context, **kwargs)
+
+    def speculation_summary(self) -> dict:
+        return {"promoted": self._promoted, "discarded": self._discarded}
+
+    async def speculate(self, context: OpenAILLMContext, text: str):
+        key = _normalize(text)
+        if not key or (self._speculation and self._speculation.key == key):
+            return
+        if self._turn_speculations >= self._max_speculations_per_turn:
+            self._speculation_metrics.capped += 1
+            return
+
+        await self._discard_speculation()
+        self._turn_speculations += 1
+        messages = list(context.messages) + [{"role": "user", "content": text}]
+        speculation = _Speculation(messages, key)
+        speculation.task = self.get_event_loop().create_task(
+            self._run_speculation(speculation, context)
+        )
+        self._speculation = speculation
+        self._speculation_metrics.started += 1
+        logger.debug(f"{self}: speculating on [{text}]")
+
+    async def _run_speculation(self, speculation: _Speculation, context: OpenAILLMContext):
+        try:
+            stream = await super().get_chat_completions(context, speculation.messages)
+        except Exception as e:
+            speculation.error = e
+            speculation.done = True
+            speculation.updated.set()
+            return
+        await speculation.run(stream)
+
+    async def _discard_speculation(self):
+        speculation, self._speculation = self._speculation, None
+        if not speculation:
+            return
+        await speculation.cancel()
+        self._discarded += 1
+        self._speculation_metrics.discarded += 1
+        self._speculation_metrics.wasted_prompt_tokens += sum(
+            estimate_tokens(m) for m in speculation.messages
+        )
+        self._speculation_metrics.wasted_completion_tokens += speculation.completion_tokens
+
+    async def get_chat_completions(self, context: OpenAILLMContext, messages: List[dict]):
+        speculation = self._speculation
+        self._turn_speculations = 0
+        if speculation and speculation.error is None and speculation.matches(messages):
+            self._speculation = None
+            now = time.perf_counter()
+            # Without speculation the request would have started now.
+            saved = now - speculation.started_at
+            if speculation.first_token_at is not None:
+                saved = min(saved, speculation.first_token_at - speculation.started_at)
+            self._promoted += 1
+            self._speculation_metrics.promoted += 1
+            self._speculation_metrics.latency_saved.record(saved)
+            logger.debug(f"{self}: promoted speculation, saved {saved * 1000:.0f}ms")
+            return speculation.replay()
+
+        await self._discard_speculation()
+        return await super().get_chat_completions(context, messages)
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        if isinstance(frame, StartInterruptionFrame):
+            # The user started a new utterance, whatever we speculated on is stale.
+            await self._discard_speculation()
+            self._turn_speculations = 0
+        elif isinstance(frame, (EndFrame, CancelFrame)):
+            # The call is over, don't leave the request running.
+            await self._discard_speculation()
+        await super().process_frame(frame, direction)
+
+
+class SpeculationTrigger(FrameProcessor):
+    """Watches transcripts before the user context aggregator and asks the
+    LLM to speculate on what has been said so far.
+
+    Speculation starts when VAD reports the user stopped speaking and there
+    is an interim transcript, or when an interim transcript has not changed
+    for `stable_secs`. The speculated text mirrors what the aggregator will
+    produce: the final transcripts of the utterance plus the latest interim.
+
+    """
+
+    def __init__(
+        self,
+        llm: SpeculativeOpenAILLMService,
+        context: OpenAILLMContext,
+        stable_secs: float = settings.LLM_SPECULATION_STABLE_SECS,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._llm = llm
+        self._context = context
+        self._stable_secs = stable_secs
+        self._finals: List[str] = []
+        self._interim = ""
+        self._user_speaking = False
+        self._stable_task: Optional[asyncio.Task] = None
+
+    def _text(self) -> str:
+        return " ".join(self._finals + ([self._interim] if self._interim else []))
+
+    def _cancel_stable_task(self):
+        if self._stable_task:
+            self._stable_task.cancel()
+            self._stable_task = None
+
+    async def _speculate_when_stable(self, interim: str):
+        await asyncio.sleep(self._stable_secs)
+        self._stable_task = None
+        if interim == self._interim:
+            await self._llm.speculate(self._context, self._text())
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, UserStartedSpeakingFrame):
+            self._user_speaking = True
+            self._finals = []
+            self._interim = ""
+            self._cancel_stable_task()
+        elif isinstance(frame, UserStoppedSpeakingFrame):
+            self._user_speaking = False
+            self._cancel_stable_task()
+            if self._interim:
+                await self._llm.speculate(self._context, self._text())
+        elif isinstance(frame, InterimTranscriptionFrame):
+            self._interim = frame.text.strip()
+            self._cancel_stable_task()
+            if not self._user_speaking:
+                await self._llm.speculate(self._context, self._text())
+            elif self._interim:
+                self._stable_task = self.get_event_loop().create_task(
+                    self._speculate_when_stable(self._interim)
+                )
+        elif isinstance(frame, TranscriptionFrame):
+            self._finals.append(frame.text.strip())
+            self._interim = ""
+            self._cancel_stable_task()
+        elif isinstance(frame, (EndFrame, CancelFrame)):
+            self._cancel_stable_task()
+
+        await self.push_frame(frame, direction)
+
+
+speculation_metrics = SpeculationMetrics()
@@ -0,0 +1,148 @@
+import asyncio
+import re
+from typing import Optional
+
+from pydantic import BaseModel
+
+from pipecat.frames.frames import (
+    EndFrame,
+    Frame,
+    InterimTranscriptionFrame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMTextFrame,
+    StartInterruptionFrame,
+    TextFrame,
+    TranscriptionFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+
+# Markdown and symbols the LLM sometimes emits despite the prompt, plus emoji.
+_UNSPEAKABLE_RE = re.compile(
+    r"[*_#`~<>|\[\]{}\\^]|[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]"
+)
+_WORD_RE = re.compile(r"\S+")
+_SENTENCE_END = (".", "!", "?")
+_UNAMBIGUOUS_END = ("!", "?")
+_CLAUSE_END = (",", ";", ":", "—")
+_CONJUNCTIONS = frozenset(
+    ("and", "but", "or", "so", "because", "although", "though", "which", "while", "then")
+)
+
+
+class TextChunkerParams(BaseModel):
+    # The first chunk of a response is flushed at the first clause boundary
+    # after `first_min_words`, and at `first_max_words` at the latest, so the
+    # TTS can start speaking early.
+    first_min_words: int = 1
+    first_max_words: int = 8
+    # Later chunks are longer, which sounds more natural.
+    min_words: int = 6
+    max_words: int = 30
+    # Complete words waiting longer than this are flushed anyway.
+    max_delay_secs: float = 0.5
+
+
+class TextChunker(FrameProcessor):
+    """Splits streamed LLM text into chunks for a TTS service that doesn't
+    aggregate sentences itself.
+
+    A chunk ends at a sentence end, at a clause boundary (a comma or similar,
+    or just before a conjunction) once it has enough words, or when it
+    reaches the maximum word count. The first chunk of a response is kept
+    short to cut time to first audio. Characters that can't be spoken are
+    dropped as the text comes in.
+
+    """
+
+    def __init__(self, params: TextChunkerParams = TextChunkerParams(), **kwargs):
+        super().__init__(**kwargs)
+        self._params = params
+        self._buffer = ""
+        self._first = True
+        self._timer: Optional[asyncio.Task] = None
+
+    def _limits(self):
+        if self._first:
+            return self._params.first_min_words, self._params.first_max_words
+        return self._params.min_words, self._params.max_words
+
+    def _last_space(self) -> int:
+        return max(self._buffer.rfind(" "), self._buffer.rfind("\n"))
+
+    def _find_cut(self) -> Optional[int]:
+        # Only words followed by whitespace are complete, except after "!" or
+        # "?", which unlike "." or "," can't be the middle of a number.
+        complete = self._last_space()
+        if self._buffer.endswith(_UNAMBIGUOUS_END):
+            complete = len(self._buffer)
+        if complete < 0:
+            return None
+
+        min_words, max_words = self._limits()
+        words = 0
+        for match in _WORD_RE.finditer(self._buffer, 0, complete):
+            word = match.group()
+            if word.lower() in _CONJUNCTIONS and words >= min_words:
+                return match.start()
+            words += 1
+            if word.endswith(_SENTENCE_END):
+                return match.end()
+            if word.endswith(_CLAUSE_END) and words >= min_words:
+                return match.end()
+            if words >= max_words:
+                return match.end()
+        return None
+
+    async def _push_chunk(self, end: int):
+        chunk, self._buffer = self._buffer[:end], self._buffer[end:]
+        words = chunk.split()
+        if words:
+            self._first = False
+            await self.push_frame(LLMTextFrame(" ".join(words) + " "))
+
+    async def _flush_ready(self):
+        while self._buffer:
+            cut = self._find_cut()
+            if cut is None:
+                break
+            await self._push_chunk(cut)
+
+    def _cancel_timer(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    async def _flush_after_delay(self):
+        await asyncio.sleep(self._params.max_delay_secs)
+        self._timer = None
+        last_space = self._last_space()
+        if last_space > 0:
+            await self._push_chunk(last_space)
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, TextFrame) and not isinstance(
+            frame, (TranscriptionFrame, InterimTranscriptionFrame)
+        ):
+            self._buffer += _UNSPEAKABLE_RE.sub("", frame.text)
+            await self._flush_ready()
+            if self._buffer.strip() and not self._timer:
+                self._timer = self.get_event_loop().create_task(self._flush_after_delay())
+            elif not self._buffer.strip():
+                self._cancel_timer()
+        elif isinstance(frame, LLMFullResponseStartFrame):
+            self._buffer = ""
+            self._first = True
+            await self.push_frame(frame, direction)
+        elif isinstance(frame, (LLMFullResponseEndFrame, EndFrame)):
+            self._cancel_timer()
+            await self._push_chunk(len(self._buffer))
+            await self.push_frame(frame, direction)
+        elif isinstance(frame, StartInterruptionFrame):
+            self._cancel_timer()
+            self._buffer = ""
+            await self.push_frame(frame, direction)
+        else:
+            await self.push_frame(frame, direction)
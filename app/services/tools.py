@@ -0,0 +1,371 @@
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Literal, Optional, Set, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import aiohttp
+from loguru import logger
+from pydantic import BaseModel, Field
+
+from pipecat.frames.frames import TTSSpeakFrame
+
+from app.config import settings
+
+
+class ToolMetrics:
+    """Process-wide function calling counters."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.cache_hits = 0
+        self.fillers = 0
+        self.seconds = 0.0
+
+    def render_prometheus(self) -> str:
+        lines = []
+        counters = (
+            ("voice_tool_calls_total", self.calls, "Tool calls made by the LLM."),
+            ("voice_tool_errors_total", self.errors, "Tool calls that failed."),
+            ("voice_tool_timeouts_total", self.timeouts, "Tool calls that timed out."),
+            (
+                "voice_tool_cache_hits_total",
+                self.cache_hits,
+                "Tool calls answered from the result cache.",
+            ),
+            ("voice_tool_fillers_total", self.fillers, "Filler phrases spoken during slow tools."),
+            ("voice_tool_seconds_total", round(self.seconds, 6), "Time spent running tools."),
+        )
+        for name, value, help_text in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class ToolError(Exception):
+    pass
+
+
+class Tool(ABC):
+    """A function the LLM can call. Results of tools with a `cache_ttl_secs`
+    are shared by every call for that long, so only idempotent lookups
+    should set it."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        parameters: dict,
+        timeout_secs: float,
+        cache_ttl_secs: float = 0,
+    ):
+        self.name = name
+        self.description = description
+        self.parameters = parameters
+        self.timeout_secs = timeout_secs
+        self.cache_ttl_secs = cache_ttl_secs
+
+    def schema(self) -> dict:
+        """The tool in the format of the OpenAI `tools` parameter."""
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.parameters,
+            },
+        }
+
+    def cache_key(self, arguments: dict) -> str:
+        return f"{self.name}\0{json.dumps(arguments, sort_keys=True)}"
+
+    @abstractmethod
+    async def run(self, arguments: dict, call_id: str, session: aiohttp.ClientSession) -> Any:
+        pass
+
+
+class FunctionTool(Tool):
+    """A predefined tool implemented in Python."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        parameters: dict,
+        handler: Callable[[dict], Awaitable[Any]],
+        timeout_secs: float = 2.0,
+        cache_ttl_secs: float = 0,
+    ):
+        super().__init__(name, description, parameters, timeout_secs, cache_ttl_secs)
+        self._handler = handler
+
+    async def run(self, arguments: dict, call_id: str, session: aiohttp.ClientSession) -> Any:
+        return await self._handler(arguments)
+
+
+class WebhookToolConfig(BaseModel):
+    """A custom tool of an agent profile, answered by an HTTP endpoint.
+
+    POST tools get `{"tool", "call_id", "arguments"}` as a JSON body, GET
+    tools get the arguments as query parameters. The JSON (or text) response
+    is handed to the LLM as the result.
+
+    """
+
+    name: str = Field(pattern=r"^[A-Za-z0-9_-]{1,64}$")
+    description: str = Field(min_length=1)
+    parameters: dict = {"type": "object", "properties": {}}
+    url: str = Field(pattern=r"^https?://")
+    method: Literal["GET", "POST"] = "POST"
+    headers: Dict[str, str] = {}
+    timeout_secs: float = Field(default=5.0, gt=0, le=30)
+    # Only for idempotent lookups, 0 disables caching.
+    cache_ttl_secs: float = Field(default=0, ge=0)
+
+
+class WebhookTool(Tool):
+    def __init__(self, config: WebhookToolConfig):
+        super().__init__(
+            config.name,
+            config.description,
+            config.parameters,
+            config.timeout_secs,
+            config.cache_ttl_secs,
+        )
+        self.url = config.url
+        self.method = config.method
+        self.headers = dict(config.headers)
+
+    def cache_key(self, arguments: dict) -> str:
+        return f"{self.url}\0{super().cache_key(arguments)}"
+
+    async def run(self, arguments: dict, call_id: str, session: aiohttp.ClientSession) -> Any:
+        if self.method == "GET":
+            params = {
+                k: v if isinstance(v, str) else json.dumps(v) for k, v in arguments.items()
+            }
+            request = session.get(self.url, params=params, headers=self.headers)
+        else:
+            body = {"tool": self.name, "call_id": call_id, "arguments": arguments}
+            request = session.post(self.url, json=body, headers=self.headers)
+
+        async with request as response:
+            text = await response.text()
+            if response.status >= 400:
+                raise ToolError(f"HTTP {response.status}: {text[:200]}")
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+
+async def _current_time(arguments: dict) -> dict:
+    zone = arguments.get("timezone") or "UTC"
+    try:
+        now = datetime.now(ZoneInfo(zone))
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ToolError(f"Unknown timezone {zone}")
+    return {"timezone": zone, "time": now.strftime("%A %d %B %Y, %H:%M")}
+
+
+BUILTIN_TOOLS: Dict[str, Tool] = {
+    tool.name: tool
+    for tool in (
+        FunctionTool(
+            "current_time",
+            "Returns the current date and time.",
+            {
+                "type": "object",
+                "properties": {
+                    "timezone": {
+                        "type": "string",
+                        "description": "IANA timezone, for example Europe/London. Defaults to UTC.",
+                    }
+                },
+            },
+            _current_time,
+        ),
+    )
+}
+
+
+class ToolResultCache:
+    """Process-wide TTL cache of tool results.
+
+    Entries expire `ttl` seconds after they were fetched and the least
+    recently used ones are dropped beyond `max_entries`. Identical lookups
+    that arrive while one is being fetched wait for it instead of fetching
+    again.
+
+    """
+
+    def __init__(self, max_entries: int = settings.TOOL_CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, Tuple[Any, float]] = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        result, expires = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, result
+
+    def put(self, key: str, result: Any, ttl: float):
+        self._entries[key] = (result, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(
+        self, key: str, ttl: float, fetch: Callable[[], Awaitable[Any]]
+    ) -> Tuple[bool, Any]:
+        """Returns (cached, result), fetching and caching the result if it
+        isn't cached. Errors aren't cached."""
+        found, result = self.get(key)
+        if found:
+            return True, result
+        inflight = self._inflight.get(key)
+        if inflight:
+            return True, await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fetch()
+            self.put(key, result, ttl)
+            future.set_result(result)
+            return False, result
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.set_exception(ToolError("lookup cancelled"))
+            else:
+                future.set_exception(e)
+            # Nobody may be waiting for it.
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ToolRunner:
+    """Runs the tool calls of one call.
+
+    pipecat awaits function callbacks one after another, so the callback only
+    starts the tool in its own task and returns. All the calls of one LLM
+    response run in parallel, and the LLM is prompted again once the last
+    result is in. If tools are still running after `filler_after_secs`, the
+    filler phrase is spoken once so the caller doesn't hear dead air.
+
+    Tool failures and timeouts are reported to the LLM as an error result,
+    so it can tell the caller rather than hang.
+
+    """
+
+    def __init__(
+        self,
+        tools: Dict[str, Tool],
+        call_id: str,
+        session_factory: Callable[[], aiohttp.ClientSession],
+        filler: Optional[str] = None,
+        filler_after_secs: float = settings.TOOL_FILLER_AFTER_MS / 1000,
+        cache: Optional[ToolResultCache] = None,
+        metrics: Optional[ToolMetrics] = None,
+    ):
+        self._tools = tools
+        self._call_id = call_id
+        self._session_factory = session_factory
+        self._filler = filler
+        self._filler_after = filler_after_secs
+        self._cache = cache or tool_cache
+        self._metrics = metrics or tool_metrics
+        self._tasks: Set[asyncio.Task] = set()
+        self._filler_task: Optional[asyncio.Task] = None
+
+    def register(self, llm):
+        for name in self._tools:
+            llm.register_function(name, self._on_function_call)
+
+    async def _on_function_call(
+        self, function_name, tool_call_id, arguments, llm, context, result_callback
+    ):
+        task = asyncio.create_task(
+            self._run(self._tools[function_name], arguments or {}, result_callback)
+        )
+        self._tasks.add(task)
+        if self._filler and not self._filler_task:
+            self._filler_task = asyncio.create_task(self._speak_filler(llm))
+
+    async def _speak_filler(self, llm):
+        await asyncio.sleep(self._filler_after)
+        if self._tasks:
+            self._metrics.fillers += 1
+            await llm.push_frame(TTSSpeakFrame(self._filler))
+
+    async def _call(self, tool: Tool, arguments: dict) -> Any:
+        return await asyncio.wait_for(
+            tool.run(arguments, self._call_id, self._session_factory()), tool.timeout_secs
+        )
+
+    async def _run(self, tool: Tool, arguments: dict, result_callback):
+        start = time.perf_counter()
+        self._metrics.calls += 1
+        try:
+            if tool.cache_ttl_secs > 0:
+                cached, result = await self._cache.get_or_fetch(
+                    tool.cache_key(arguments),
+                    tool.cache_ttl_secs,
+                    lambda: self._call(tool, arguments),
+                )
+                if cached:
+                    self._metrics.cache_hits += 1
+            else:
+                result = await self._call(tool, arguments)
+        except asyncio.TimeoutError:
+            self._metrics.timeouts += 1
+            logger.warning(f"Tool {tool.name} timed out after {tool.timeout_secs}s")
+            result = {"error": f"{tool.name} didn't answer in time"}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._metrics.errors += 1
+            logger.warning(f"Tool {tool.name} failed: {e}")
+            result = {"error": f"{tool.name} failed: {e}"}
+        finally:
+            self._metrics.seconds += time.perf_counter() - start
+            self._tasks.discard(asyncio.current_task())
+            if not self._tasks and self._filler_task:
+                self._filler_task.cancel()
+                self._filler_task = None
+
+        # The context aggregator ignores empty results.
+        if result in (None, "", [], {}):
+            result = {"result": "done"}
+        await result_callback(result)
+
+    async def cancel(self):
+        tasks = list(self._tasks)
+        if self._filler_task:
+            tasks.append(self._filler_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._filler_task = None
+
+
+tool_cache = ToolResultCache()
+tool_metrics = ToolMetrics()
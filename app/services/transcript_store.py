@@ -0,0 +1,256 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from app.config import settings
+
+
+class TranscriptStore(ABC):
+    """Durable, append-only storage of call transcripts."""
+
+    @abstractmethod
+    async def append(self, call_id: str, messages: List[dict]):
+        pass
+
+    @abstractmethod
+    async def read(self, call_id: str) -> List[dict]:
+        pass
+
+    async def close(self):
+        pass
+
+
+class JSONLTranscriptStore(TranscriptStore):
+    """One JSON Lines file per call."""
+
+    def __init__(self, directory: str):
+        self._dir = Path(directory)
+
+    def _path(self, call_id: str) -> Path:
+        return self._dir / f"{call_id}.jsonl"
+
+    def _append(self, call_id: str, messages: List[dict]):
+        self._dir.mkdir(parents=True, exist_ok=True)
+        with open(self._path(call_id), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(m) + "\n" for m in messages))
+
+    def _read(self, call_id: str) -> List[dict]:
+        try:
+            with open(self._path(call_id), encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    async def append(self, call_id: str, messages: List[dict]):
+        await asyncio.to_thread(self._append, call_id, messages)
+
+    async def read(self, call_id: str) -> List[dict]:
+        return await asyncio.to_thread(self._read, call_id)
+
+
+class SQLiteTranscriptStore(TranscriptStore):
+    """All transcripts in one SQLite file, shared by every worker on the host."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS transcript_messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, call_id TEXT NOT NULL, "
+            "data TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS transcript_messages_call_id "
+            "ON transcript_messages (call_id, id)"
+        )
+
+    def _append(self, call_id: str, messages: List[dict]):
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT INTO transcript_messages (call_id, data, created_at) VALUES (?, ?, ?)",
+                    [(call_id, json.dumps(m), now) for m in messages],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _read(self, call_id: str) -> List[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM transcript_messages WHERE call_id = ? ORDER BY id", (call_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    async def append(self, call_id: str, messages: List[dict]):
+        await asyncio.to_thread(self._append, call_id, messages)
+
+    async def read(self, call_id: str) -> List[dict]:
+        return await asyncio.to_thread(self._read, call_id)
+
+    async def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def create_transcript_store() -> TranscriptStore:
+    if settings.TRANSCRIPT_BACKEND == "jsonl":
+        return JSONLTranscriptStore(settings.TRANSCRIPT_DIR)
+    elif settings.TRANSCRIPT_BACKEND == "sqlite":
+        return SQLiteTranscriptStore(settings.TRANSCRIPT_SQLITE_PATH)
+    raise ValueError(f"Unknown transcript backend: {settings.TRANSCRIPT_BACKEND}")
+
+
+class TranscriptSink:
+    """Writes transcript messages to a `TranscriptStore` in the background.
+
+    Calls only put messages on a bounded queue. A single writer drains it,
+    grouping messages by call, and writes a batch once `batch_size` messages
+    are waiting or `flush_interval` has passed since the first of them.
+
+    """
+
+    def __init__(
+        self,
+        store: TranscriptStore,
+        queue_size: int = settings.TRANSCRIPT_QUEUE_SIZE,
+        batch_size: int = settings.TRANSCRIPT_BATCH_SIZE,
+        flush_interval: float = settings.TRANSCRIPT_FLUSH_INTERVAL_SECONDS,
+    ):
+        self._store = store
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._writer: Optional[asyncio.Task] = None
+        self._dropped = 0
+        # Messages of each call not written yet, and events set once they are.
+        self._pending: Dict[str, int] = {}
+        self._flushed: Dict[str, asyncio.Event] = {}
+
+    async def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self):
+        if self._writer:
+            await self.flush()
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        await self._store.close()
+
+    def submit(self, call_id: str, message: dict):
+        try:
+            self._queue.put_nowait((call_id, message))
+        except asyncio.QueueFull:
+            self._dropped += 1
+            logger.error(f"Transcript queue full, dropping message for call {call_id}")
+            return
+        self._pending[call_id] = self._pending.get(call_id, 0) + 1
+
+    def _written(self, call_id: str, count: int):
+        left = self._pending.get(call_id, 0) - count
+        if left > 0:
+            self._pending[call_id] = left
+            return
+        self._pending.pop(call_id, None)
+        flushed = self._flushed.pop(call_id, None)
+        if flushed:
+            flushed.set()
+
+    async def flush(self, call_id: Optional[str] = None):
+        """Waits until the messages of `call_id` submitted so far have been
+        written, or those of every call without one. Other calls' messages
+        arriving meanwhile don't hold it up."""
+        if call_id is None:
+            if self._writer:
+                await self._queue.join()
+            return
+        if not self._pending.get(call_id):
+            return
+        if not self._writer:
+            raise RuntimeError(
+                f"TranscriptSink isn't running, {self._pending[call_id]} messages "
+                f"of call {call_id} would never be written"
+            )
+        await self._flushed.setdefault(call_id, asyncio.Event()).wait()
+
+    async def read(self, call_id: str) -> List[dict]:
+        await self.flush(call_id)
+        return await self._store.read(call_id)
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._flush_interval
+            while len(batch) < self._batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    # Returns the item even if it lands as the timeout fires.
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            by_call: Dict[str, List[dict]] = defaultdict(list)
+            for call_id, message in batch:
+                by_call[call_id].append(message)
+            for call_id, messages in by_call.items():
+                try:
+                    await self._store.append(call_id, messages)
+                except Exception as e:
+                    logger.error(
+                        f"Unable to write {len(messages)} transcript messages for call {call_id}: {e}"
+                    )
+                self._written(call_id, len(messages))
+            for _ in batch:
+                self._queue.task_done()
+
+
+class CallTranscript:
+    """Transcript of one call. Messages are handed to the sink as they arrive
+    and only the last `tail_size` are kept in memory.
+
+    """
+
+    def __init__(
+        self,
+        call_id: str,
+        sink: TranscriptSink,
+        tail_size: int = settings.TRANSCRIPT_TAIL_MESSAGES,
+    ):
+        self.call_id = call_id
+        self._sink = sink
+        self.tail = deque(maxlen=tail_size)
+
+    def add(self, role: str, content: str, timestamp: Optional[str]):
+        message = {"role": role, "content": content, "timestamp": timestamp}
+        self.tail.append(message)
+        self._sink.submit(self.call_id, message)
+        logger.debug(f"Transcript {self.call_id}: [{timestamp}] {role}: {content}")
+
+    async def on_transcript_update(self, processor, frame):
+        for msg in frame.messages:
+            self.add(msg.role, msg.content, msg.timestamp)
+
+    async def messages(self) -> List[dict]:
+        """The whole transcript, once everything submitted has been written."""
+        return await self._sink.read(self.call_id)
+
+
+transcript_sink = TranscriptSink(create_transcript_store())
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncGenerator, Optional
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    ErrorFrame,
+    Frame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.services.elevenlabs import ElevenLabsHttpTTSService
+
+from app.config import settings
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class PhraseCache:
+    """Two-tier cache of synthesized phrases.
+
+    Hot entries live in an in-memory LRU bounded by `memory_bytes`. Behind it
+    there is a directory of raw PCM files bounded by `disk_bytes`, read through
+    mmap so the page cache is shared by every worker process on the host.
+
+    """
+
+    def __init__(self, cache_dir: str, memory_bytes: int, disk_bytes: int, max_chars: int):
+        self._dir = Path(cache_dir)
+        self._memory_bytes = memory_bytes
+        self._disk_bytes = disk_bytes
+        self._max_chars = max_chars
+
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_size = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_size = 0
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._bytes_saved = 0
+
+    def key(self, text: str, voice_id: str, model: str, sample_rate: int) -> Optional[str]:
+        """Returns the cache key for a phrase, or None if it shouldn't be cached."""
+        normalized = _WHITESPACE_RE.sub(" ", text).strip().lower()
+        if not normalized or len(normalized) > self._max_chars:
+            return None
+        data = f"{normalized}\0{voice_id}\0{model}\0{sample_rate}".encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def metrics(self) -> dict:
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "hit_ratio": self._hits / lookups if lookups else 0.0,
+            "bytes_saved": self._bytes_saved,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_size,
+        }
+
+    def _path(self, key: str) -> Path:
+        return self._dir / f"{key}.pcm"
+
+    def _load_index(self):
+        with self._load_lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self._dir.exists():
+                return
+            entries = []
+            for path in self._dir.glob("*.pcm"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.stem, stat.st_size))
+            for _, key, size in sorted(entries):
+                self._disk[key] = size
+                self._disk_size += size
+
+    def _read(self, key: str) -> bytes:
+        path = self._path(key)
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                audio = mm[:]
+        os.utime(path)
+        return audio
+
+    def _write(self, key: str, audio: bytes, evicted: list):
+        self._dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        # Per process, since workers share the directory. Within one,
+        # `put` never writes a key twice.
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            tmp_path.write_bytes(audio)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        for old_key in evicted:
+            self._path(old_key).unlink(missing_ok=True)
+
+    def _remember(self, key: str, audio: bytes):
+        if len(audio) > self._memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = audio
+        self._memory_size += len(audio)
+        while self._memory_size > self._memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= len(old)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+        else:
+            await asyncio.to_thread(self._load_index)
+            if key in self._disk:
+                try:
+                    audio = await asyncio.to_thread(self._read, key)
+                    self._disk.move_to_end(key)
+                    self._disk_hits += 1
+                    self._remember(key, audio)
+                except Exception as e:
+                    logger.error(f"Unable to read cached phrase {key}: {e}")
+                    self._disk_size -= self._disk.pop(key)
+
+        if audio is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+            self._bytes_saved += len(audio)
+        return audio
+
+    async def put(self, key: str, audio: bytes):
+        self._remember(key, audio)
+        await asyncio.to_thread(self._load_index)
+        if key in self._disk:
+            return
+
+        self._disk[key] = len(audio)
+        self._disk_size += len(audio)
+        evicted = []
+        while len(self._disk) > 1 and self._disk_size > self._disk_bytes:
+            old_key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            evicted.append(old_key)
+
+        try:
+            await asyncio.to_thread(self._write, key, audio, evicted)
+        except Exception as e:
+            logger.error(f"Unable to store cached phrase {key}: {e}")
+            self._disk_size -= self._disk.pop(key, 0)
+
+
+class CachedElevenLabsTTSService(ElevenLabsHttpTTSService):
+    """ElevenLabs HTTP TTS that serves repeated phrases from a `PhraseCache`.
+
+    Misses are streamed through from ElevenLabs as usual and stored once the
+    whole phrase has arrived. Interrupted or failed phrases are not cached.
+
+    """
+
+    def __init__(self, *, cache: PhraseCache, **kwargs):
+        super().__init__(**kwargs)
+        self._cache = cache
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        sample_rate = self._settings["sample_rate"]
+        key = self._cache.key(text, self._voice_id, self._model_name, sample_rate)
+
+        if key:
+            audio = await self._cache.get(key)
+            if audio is not None:
+                logger.debug(f"TTS cache hit: [{text}]")
+                yield TTSStartedFrame()
+                yield TTSAudioRawFrame(audio, sample_rate, 1)
+                yield TTSStoppedFrame()
+                return
+
+        chunks = []
+        failed = False
+        async for frame in super().run_tts(text):
+            if isinstance(frame, TTSAudioRawFrame):
+                chunks.append(frame.audio)
+            elif isinstance(frame, ErrorFrame):
+                failed = True
+            yield frame
+
+        if key and chunks and not failed:
+            audio = b"".join(chunks)
+            await self._cache.put(key, audio[: len(audio) - len(audio) % 2])
+
+
+phrase_cache = PhraseCache(
+    settings.TTS_CACHE_DIR,
+    memory_bytes=settings.TTS_CACHE_MEMORY_BYTES,
+    disk_bytes=settings.TTS_CACHE_DISK_BYTES,
+    max_chars=settings.TTS_CACHE_MAX_PHRASE_CHARS,
+)
@@ -0,0 +1,110 @@
+import asyncio
+import importlib
+import sys
+import time
+from types import ModuleType
+from typing import Dict, Optional
+
+from loguru import logger
+
+from app.config import settings
+
+# pipecat, onnxruntime and the provider SDKs take seconds to import, so the
+# web app doesn't import them: `app.bot` and what only calls need are loaded
+# with `load_module`, by the background warmup or the first call.
+_imports: Dict[str, asyncio.Future] = {}
+_warmup_task: Optional[asyncio.Task] = None
+_warmup_state = {"status": "pending", "seconds": None, "error": None}
+
+
+def imported(module_name: str) -> Optional[ModuleType]:
+    """The module if something already imported it, without importing it."""
+    module = sys.modules.get(module_name)
+    if module is None or getattr(module.__spec__, "_initializing", False):
+        return None
+    return module
+
+
+def _import(module_name: str) -> ModuleType:
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    logger.info(f"Imported {module_name} in {time.perf_counter() - start:.2f}s")
+    return module
+
+
+async def load_module(module_name: str) -> ModuleType:
+    """Imports `module_name` in a thread so the event loop keeps serving
+    live calls meanwhile. Callers asking for the same module share the
+    import, and one giving up (a call hanging up) doesn't cancel it."""
+    module = imported(module_name)
+    if module:
+        return module
+    future = _imports.get(module_name)
+    if future is None:
+        future = asyncio.ensure_future(asyncio.to_thread(_import, module_name))
+        _imports[module_name] = future
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        # Let the next caller try again.
+        if _imports.get(module_name) is future:
+            del _imports[module_name]
+        raise
+
+
+async def load_agents():
+    """The agent registry, which needs pipecat for the profiles' VAD params."""
+    return (await load_module("app.services.agent_profiles")).agent_registry
+
+
+async def load_bot(template=None) -> ModuleType:
+    """`app.bot`, with the provider services calls of `template` use."""
+    bot = await load_module("app.bot")
+    for module_name in bot.provider_modules(template):
+        await load_module(module_name)
+    return bot
+
+
+async def _warmup():
+    start = time.perf_counter()
+    _warmup_state["status"] = "running"
+    try:
+        bot = await load_module("app.bot")
+        for template in (await load_agents()).templates():
+            await load_bot(template)
+        await bot.warmup()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # Calls will load what they need themselves.
+        logger.exception(f"Warmup failed: {e}")
+        _warmup_state.update(status="failed", error=str(e))
+        return
+    _warmup_state.update(status="done", seconds=round(time.perf_counter() - start, 3))
+    logger.info(f"Warmup done in {_warmup_state['seconds']}s")
+
+
+def start_warmup():
+    """Loads the bot, the providers of every agent profile and the shared
+    resources in the background. Called from the startup event, so the
+    server is listening while this runs."""
+    global _warmup_task
+    if not settings.STARTUP_WARMUP:
+        _warmup_state["status"] = "disabled"
+        return
+    if not _warmup_task:
+        _warmup_task = asyncio.create_task(_warmup())
+
+
+async def stop_warmup():
+    global _warmup_task
+    if _warmup_task:
+        _warmup_task.cancel()
+        await asyncio.gather(_warmup_task, return_exceptions=True)
+        _warmup_task = None
+
+
+def warmup_state() -> dict:
+    return dict(_warmup_state)
@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    CancelFrame,
+    EndFrame,
+    Frame,
+    OutputAudioRawFrame,
+    StartInterruptionFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection
+from pipecat.transports.network.fastapi_websocket import (
+    FastAPIWebsocketOutputTransport,
+    FastAPIWebsocketParams,
+    FastAPIWebsocketTransport,
+)
+from starlette.websockets import WebSocketState
+
+
+class CoalescingWebsocketParams(FastAPIWebsocketParams):
+    # Size of each outbound media message. The output transport works in 20ms
+    # chunks, so 20 disables coalescing.
+    audio_out_coalesce_ms: int = 40
+    # Maximum time a chunk can wait in the buffer before it's sent anyway.
+    audio_out_max_jitter_ms: int = 60
+
+
+class CoalescingWebsocketOutputTransport(FastAPIWebsocketOutputTransport):
+    """Output transport that batches the 20ms audio chunks written by the base
+    output transport into larger media messages, so a TTS response doesn't
+    become one WebSocket message (with its own base64 and JSON envelope) per
+    20ms. Playback pacing is unchanged, only the number of messages.
+
+    """
+
+    def __init__(self, websocket, params: CoalescingWebsocketParams, **kwargs):
+        super().__init__(websocket, params, **kwargs)
+
+        bytes_per_ms = params.audio_out_sample_rate * params.audio_out_channels * 2 // 1000
+        self._coalesce_bytes = max(params.audio_out_coalesce_ms * bytes_per_ms, 1)
+        self._max_jitter = params.audio_out_max_jitter_ms / 1000
+
+        self._pending = bytearray()
+        self._flush_task: asyncio.Task | None = None
+
+        self._chunks_in = 0
+        self._messages_out = 0
+        self._first_chunk_time = 0.0
+
+    @property
+    def coalescing(self) -> bool:
+        return self._coalesce_bytes > self._audio_chunk_size and not self._params.add_wav_header
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self._first_chunk_time if self._first_chunk_time else 0
+        saved = self._chunks_in - self._messages_out
+        return {
+            "chunks_in": self._chunks_in,
+            "messages_out": self._messages_out,
+            "messages_saved": saved,
+            "messages_saved_per_sec": saved / elapsed if elapsed > 0 else 0.0,
+        }
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        if isinstance(frame, StartInterruptionFrame):
+            # Whatever we are holding back would be cleared on the other side
+            # anyway, drop it so the clear event goes out right away.
+            self._take_pending()
+        await super().process_frame(frame, direction)
+
+    async def stop(self, frame: EndFrame):
+        await super().stop(frame)
+        await self._flush()
+        self._log_stats()
+
+    async def cancel(self, frame: CancelFrame):
+        await super().cancel(frame)
+        self._take_pending()
+        self._log_stats()
+
+    async def write_raw_audio_frames(self, frames: bytes):
+        if not self.coalescing:
+            self._count(1, 1)
+            await super().write_raw_audio_frames(frames)
+            return
+
+        if self._websocket.client_state != WebSocketState.CONNECTED:
+            await self._write_audio_sleep()
+            return
+
+        self._count(1, 0)
+        if not self._pending:
+            self._flush_task = self.get_event_loop().create_task(self._flush_after_jitter())
+        self._pending.extend(frames)
+
+        if len(self._pending) >= self._coalesce_bytes:
+            await self._flush()
+
+        # Simulate audio playback with a sleep, per chunk like the base class.
+        await self._write_audio_sleep()
+
+    def _count(self, chunks: int, messages: int):
+        if not self._first_chunk_time:
+            self._first_chunk_time = time.monotonic()
+        self._chunks_in += chunks
+        self._messages_out += messages
+
+    async def _flush_after_jitter(self):
+        try:
+            await asyncio.sleep(self._max_jitter)
+            self._flush_task = None
+            await self._flush()
+        except asyncio.CancelledError:
+            pass
+
+    def _take_pending(self) -> bytes:
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        audio = bytes(self._pending)
+        self._pending.clear()
+        return audio
+
+    async def _flush(self):
+        audio = self._take_pending()
+        if not audio:
+            return
+
+        frame = OutputAudioRawFrame(
+            audio=audio,
+            sample_rate=self._params.audio_out_sample_rate,
+            num_channels=self._params.audio_out_channels,
+        )
+        self._count(0, 1)
+        await self._write_frame(frame)
+
+    def _log_stats(self):
+        stats = self.stats()
+        if stats["chunks_in"]:
+            logger.info(
+                f"{self} sent {stats['messages_out']} audio messages for {stats['chunks_in']} "
+                f"chunks ({stats['messages_saved_per_sec']:.1f} messages/sec saved)"
+            )
+
+
+class CoalescingWebsocketTransport(FastAPIWebsocketTransport):
+    def __init__(self, websocket, params: CoalescingWebsocketParams, **kwargs):
+        super().__init__(websocket, params, **kwargs)
+
+        # The base class already started the frame tasks of its own output
+        # transport, stop them before replacing it.
+        self._replaced_output = asyncio.ensure_future(self._output.cleanup())
+        self._output = CoalescingWebsocketOutputTransport(
+            websocket, self._params, name=self._output_name
+        )
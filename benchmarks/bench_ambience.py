@@ -0,0 +1,138 @@
+"""Benchmark of background ambience mixing.
+
+Compares pipecat's `SoundfileMixer`, which decodes the ambience file for
+every call and mixes in float64, with `AmbienceMixer` on top of a shared,
+memory-mapped `AmbienceLibrary`:
+
+- Time to start `--calls` mixers and the memory they hold.
+- Mixed frames per second, half of them speech and half silence, which is
+  what the output transport feeds the mixer while the bot is quiet.
+- That both produce the same samples (up to rounding) at the same volume.
+
+A noise track is generated into a temporary directory, so no sound file is
+needed. Run from the repository root:
+
+    python -m benchmarks.bench_ambience --calls 200 --frames 20000
+"""
+
+import argparse
+import asyncio
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+from loguru import logger
+
+from pipecat.audio.mixers.soundfile_mixer import SoundfileMixer
+
+from app.audio.ambience import AmbienceLibrary, AmbienceMixer
+
+SAMPLE_RATE = 24000
+FRAME_MS = 20
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return 0
+
+
+def _write_track(path: Path, seconds: float):
+    rng = np.random.default_rng(0)
+    noise = rng.normal(0, 3000, int(SAMPLE_RATE * seconds)).clip(-32768, 32767).astype(np.int16)
+    sf.write(path, noise, SAMPLE_RATE, subtype="PCM_16")
+
+
+def _frames(count: int):
+    rng = np.random.default_rng(1)
+    size = SAMPLE_RATE * FRAME_MS // 1000
+    speech = rng.normal(0, 8000, size).clip(-32768, 32767).astype(np.int16).tobytes()
+    silence = b"\x00" * (size * 2)
+    return [speech if i % 2 else silence for i in range(count)]
+
+
+async def _start(mixers) -> float:
+    start = time.perf_counter()
+    for mixer in mixers:
+        await mixer.start(SAMPLE_RATE)
+    return time.perf_counter() - start
+
+
+async def _mix_rate(mixer, frames) -> float:
+    start = time.perf_counter()
+    for frame in frames:
+        await mixer.mix(frame)
+    return len(frames) / (time.perf_counter() - start)
+
+
+async def run(name: str, create, args, frames):
+    rss_before = _rss_bytes()
+    mixers = [create() for _ in range(args.calls)]
+    start_secs = await _start(mixers)
+    rss_growth = _rss_bytes() - rss_before
+    rate = await _mix_rate(mixers[0], frames)
+    print(
+        f"{name:<16} start {start_secs * 1000 / args.calls:7.2f}ms/call | "
+        f"memory {rss_growth / args.calls / 1024:8.1f}KiB/call | "
+        f"mix {rate:9.0f} frames/s"
+    )
+    return mixers
+
+
+async def check_output(track_file: str, library: AmbienceLibrary, frames, volume: float) -> bool:
+    reference = SoundfileMixer({"ambience": track_file}, "ambience", volume=volume)
+    ambience = AmbienceMixer(library, {"ambience": track_file}, "ambience", volume=volume)
+    await reference.start(SAMPLE_RATE)
+    await ambience.start(SAMPLE_RATE)
+    for frame in frames[:200]:
+        expected = np.frombuffer(await reference.mix(frame), dtype=np.int16).astype(np.int32)
+        actual = np.frombuffer(await ambience.mix(frame), dtype=np.int16).astype(np.int32)
+        if np.abs(expected - actual).max() > 1:
+            return False
+    return True
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=60, help="length of the ambience track")
+    parser.add_argument("--volume", type=float, default=0.4)
+    args = parser.parse_args()
+
+    logger.remove()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        track_file = str(Path(tmp) / "ambience.wav")
+        _write_track(Path(track_file), args.seconds)
+        frames = _frames(args.frames)
+        library = AmbienceLibrary(str(Path(tmp) / "cache"))
+
+        baseline = await run(
+            "SoundfileMixer",
+            lambda: SoundfileMixer({"ambience": track_file}, "ambience", volume=args.volume),
+            args,
+            frames,
+        )
+        del baseline
+        await run(
+            "AmbienceMixer",
+            lambda: AmbienceMixer(library, {"ambience": track_file}, "ambience", volume=args.volume),
+            args,
+            frames,
+        )
+
+        ok = await check_output(track_file, library, frames, args.volume)
+        print(f"output matches SoundfileMixer: {'ok' if ok else 'FAILED'}")
+        if not ok:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,173 @@
+"""Benchmark of post-call analysis against a local OpenAI stub.
+
+Queues `--jobs` finished calls and runs their analysis either on the web
+process's event loop or in `AnalysisService` worker processes, while a
+ticker on the event loop stands in for live audio (one 20ms frame at a
+time). Reports for each:
+
+- Jobs analyzed per second.
+- Event loop lag seen by the ticker (p99/max), which is what live calls
+  would hear as jitter.
+- That every job ended up `done` with the stub's answer.
+
+The chat completions stub runs in its own process and answers after
+`--delay-ms`. Run from the repository root:
+
+    python -m benchmarks.bench_call_analysis --jobs 300 --workers 2
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aiohttp import web
+from loguru import logger
+
+from app.services.call_analysis import AnalysisParams, AnalysisQueue, AnalysisService, _work
+
+TRANSCRIPT = [
+    {"role": "assistant", "content": "Hi, this is Ava from Ontune. Is now a good time?"},
+    {"role": "user", "content": "Sure, I wanted to ask about my order 1234."},
+    {"role": "assistant", "content": "It shipped yesterday and arrives on Friday."},
+    {"role": "user", "content": "Great, thanks a lot. Call me back next week about the upgrade."},
+]
+
+ANSWER = (
+    '{"summary": "Caller asked about order 1234, which ships Friday.", '
+    '"sentiment": "positive", "disposition": "callback_requested", '
+    '"fields": {"order_number": "1234"}}'
+)
+
+
+def _serve(port: int, delay: float):
+    async def completions(request: web.Request):
+        await request.json()
+        await asyncio.sleep(delay)
+        return web.json_response(
+            {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "stub",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": ANSWER},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 200, "completion_tokens": 40, "total_tokens": 240},
+            }
+        )
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    web.run_app(app, host="127.0.0.1", port=port, print=None)
+
+
+async def _ticker(lags: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + 0.02
+        await asyncio.sleep(0.02)
+        lags.append(loop.time() - expected)
+
+
+async def _wait_done(queue: AnalysisQueue, jobs: int):
+    while True:
+        counts = await asyncio.to_thread(queue.counts)
+        if counts.get("done", 0) + counts.get("failed", 0) >= jobs:
+            return
+        await asyncio.sleep(0.05)
+
+
+def _enqueue(queue: AnalysisQueue, jobs: int):
+    params = AnalysisParams(fields={"order_number": "the order number the caller mentions"})
+    for i in range(jobs):
+        job = {"agent": "default", "transcript": TRANSCRIPT, "params": params.model_dump()}
+        queue.enqueue(f"call-{i}", job)
+
+
+async def run(name: str, path: str, args, start, stop) -> bool:
+    queue = AnalysisQueue(path)
+    _enqueue(queue, args.jobs)
+    lags = []
+    stop_ticker = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop_ticker))
+
+    started = time.perf_counter()
+    handle = await start(path)
+    await _wait_done(queue, args.jobs)
+    elapsed = time.perf_counter() - started
+    await stop(handle)
+
+    stop_ticker.set()
+    await ticker
+    lags.sort()
+    counts = queue.counts()
+    ok = counts.get("done") == args.jobs and queue.get("call-0")["result"]["fields"] == {
+        "order_number": "1234"
+    }
+    queue.close()
+    print(
+        f"{name:<12} {args.jobs / elapsed:7.1f} jobs/s | loop lag "
+        f"p99 {lags[int(len(lags) * 0.99)] * 1000:6.1f}ms max {lags[-1] * 1000:6.1f}ms | {counts}"
+    )
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=16, help="requests per worker")
+    parser.add_argument("--delay-ms", type=float, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    logger.remove()
+
+    context = multiprocessing.get_context("spawn")
+    server = context.Process(target=_serve, args=(args.port, args.delay_ms / 1000), daemon=True)
+    server.start()
+    # Inherited by the worker processes.
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ["OPENAI_API_KEY"] = "stub"
+    await asyncio.sleep(1.0)
+
+    async def start_in_process(path):
+        return asyncio.create_task(
+            _work(path, args.workers * args.concurrency, "stub", 120, 0.05, 1.0)
+        )
+
+    async def stop_in_process(task):
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def start_pool(path):
+        service = AnalysisService(path, workers=args.workers, enabled=True)
+        await service.start()
+        return service
+
+    async def stop_pool(service):
+        await service.stop()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = await run(
+            "in-process", str(Path(tmp) / "a.db"), args, start_in_process, stop_in_process
+        )
+        ok &= await run("worker pool", str(Path(tmp) / "b.db"), args, start_pool, stop_pool)
+
+    server.terminate()
+    print(f"results: {'ok' if ok else 'FAILED'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
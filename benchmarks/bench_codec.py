@@ -0,0 +1,136 @@
+"""Micro-benchmark for the Plivo media codec path.
+
+Compares frames/sec of pipecat's `ulaw_to_pcm` / `pcm_to_ulaw` (audioop +
+resampy, set up from scratch every frame) with the table-driven codec and
+streaming resampler in `app.audio.codec`, and checks the new path:
+
+- μ-law decode/encode tables are bit-exact with audioop over every input.
+- Resampling frame by frame gives exactly the same samples as one shot.
+- The resampled test tone stays above `--min-snr` dB.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_codec --frames 5000
+"""
+
+import argparse
+import audioop
+import sys
+import time
+
+import numpy as np
+
+from pipecat.audio import utils as pipecat_utils
+
+from app.audio import codec
+
+PLIVO_RATE = 8000
+PIPELINE_IN_RATE = 16000
+PIPELINE_OUT_RATE = 24000
+FRAME_MS = 20
+
+
+def _tone(rate: int, seconds: float, freq: float = 440.0, amplitude: float = 8000.0):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def _frames(samples: np.ndarray, rate: int):
+    size = rate * FRAME_MS // 1000
+    return [samples[i : i + size] for i in range(0, len(samples) - size + 1, size)]
+
+
+def _rate(fn, frames, count: int) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        fn(frames[i % len(frames)])
+    return count / (time.perf_counter() - start)
+
+
+def _snr(actual: np.ndarray, rate: int, delay: float, freq: float = 440.0, skip: int = 100):
+    n = np.arange(len(actual))
+    expected = 8000.0 * np.sin(2 * np.pi * freq * (n - delay) / rate)
+    error = actual[skip:].astype(np.float64) - expected[skip:]
+    return 10 * np.log10(np.mean(expected[skip:] ** 2) / np.mean(error**2))
+
+
+def check_ulaw_tables() -> bool:
+    ulaw = bytes(range(256))
+    pcm = np.arange(-32768, 32768, dtype=np.int16)
+    decode_ok = codec.ulaw_decode(ulaw).tobytes() == audioop.ulaw2lin(ulaw, 2)
+    encode_ok = codec.ulaw_encode(pcm) == audioop.lin2ulaw(pcm.tobytes(), 2)
+    print(f"ulaw decode bit-exact: {decode_ok}")
+    print(f"ulaw encode bit-exact: {encode_ok}")
+    return decode_ok and encode_ok
+
+
+def check_resampler(in_rate: int, out_rate: int, min_snr: float) -> bool:
+    tone = _tone(in_rate, 2.0)
+
+    streamed = codec.StreamingResampler(in_rate, out_rate)
+    chunked = np.concatenate([streamed.resample(f) for f in _frames(tone, in_rate)])
+    covered = tone[: len(chunked) * in_rate // out_rate]
+    one_shot = codec.StreamingResampler(in_rate, out_rate).resample(covered)
+    continuous = np.array_equal(chunked, one_shot)
+
+    # Linear-phase FIR: the group delay is half the prototype filter length.
+    factor = max(in_rate, out_rate) // min(in_rate, out_rate)
+    delay = (factor * 16 - 1) / 2 * out_rate / max(in_rate, out_rate)
+    snr = _snr(chunked, out_rate, delay)
+
+    legacy = np.concatenate(
+        [
+            np.frombuffer(pipecat_utils.resample_audio(f.tobytes(), in_rate, out_rate), np.int16)
+            for f in _frames(tone, in_rate)
+        ]
+    )
+    legacy_snr = _snr(legacy, out_rate, 0.0)
+
+    print(
+        f"resample {in_rate}->{out_rate}: frame-continuous={continuous} "
+        f"snr={snr:.1f} dB (current path {legacy_snr:.1f} dB, min {min_snr:.1f} dB)"
+    )
+    return continuous and snr >= min_snr
+
+
+def bench(count: int):
+    inbound = [codec.ulaw_encode(f) for f in _frames(_tone(PLIVO_RATE, 1.0), PLIVO_RATE)]
+    outbound = [f.tobytes() for f in _frames(_tone(PIPELINE_OUT_RATE, 1.0), PIPELINE_OUT_RATE)]
+
+    in_resampler = codec.StreamingResampler(PLIVO_RATE, PIPELINE_IN_RATE)
+    out_resampler = codec.StreamingResampler(PIPELINE_OUT_RATE, PLIVO_RATE)
+
+    def decode_current(f):
+        return pipecat_utils.ulaw_to_pcm(f, PLIVO_RATE, PIPELINE_IN_RATE)
+
+    def encode_current(f):
+        return pipecat_utils.pcm_to_ulaw(f, PIPELINE_OUT_RATE, PLIVO_RATE)
+
+    results = [
+        ("decode (current)", _rate(decode_current, inbound, count)),
+        ("decode (table)", _rate(lambda f: codec.ulaw_to_pcm(f, in_resampler), inbound, count)),
+        ("encode (current)", _rate(encode_current, outbound, count)),
+        ("encode (table)", _rate(lambda f: codec.pcm_to_ulaw(f, out_resampler), outbound, count)),
+    ]
+    for name, fps in results:
+        print(f"{name:<18} {fps:>12,.0f} frames/sec")
+    print(f"decode speedup: {results[1][1] / results[0][1]:.1f}x")
+    print(f"encode speedup: {results[3][1] / results[2][1]:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=5000, help="frames per measurement")
+    parser.add_argument("--min-snr", type=float, default=40.0, help="resampler tolerance (dB)")
+    args = parser.parse_args()
+
+    ok = check_ulaw_tables()
+    ok &= check_resampler(PLIVO_RATE, PIPELINE_IN_RATE, args.min_snr)
+    ok &= check_resampler(PIPELINE_OUT_RATE, PLIVO_RATE, args.min_snr)
+    bench(args.frames)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Benchmark of recording ingestion against local Plivo and S3 stubs.
+
+Recordings are served by an aiohttp server on localhost and stored in an
+in-memory S3 client passed to `RecordingService`, so nothing leaves the
+host. Reports:
+
+- Throughput of `--recordings` recordings of `--size-mb` (multipart
+  uploads) and as many of 100KB (single puts), with the event loop lag a
+  ticker sees meanwhile. Every stored object must match what was served.
+
+Retries, the full queue and shutdown are covered by
+tests/test_recording_service.py, which uses the same stubs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_recording --recordings 8 --size-mb 20
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from aiohttp import web
+from loguru import logger
+
+from app.services.recording_service import MIN_PART_SIZE, RecordingService
+
+
+class StubPlivo:
+    """Serves `/recordings/{name}?size=N` in chunks. `fail=N` answers 500 to
+    the first N requests for that name."""
+
+    def __init__(self):
+        self.bodies: Dict[str, bytes] = {}
+        self.requests: Dict[str, int] = {}
+
+    def body(self, name: str, size: int) -> bytes:
+        if name not in self.bodies:
+            self.bodies[name] = random.Random(name).randbytes(size)
+        return self.bodies[name]
+
+    async def recording(self, request: web.Request):
+        name = request.match_info["name"]
+        self.requests[name] = self.requests.get(name, 0) + 1
+        if self.requests[name] <= int(request.query.get("fail", 0)):
+            raise web.HTTPInternalServerError()
+        body = self.body(name, int(request.query["size"]))
+        response = web.StreamResponse(headers={"Content-Type": "audio/mpeg"})
+        response.content_length = len(body)
+        await response.prepare(request)
+        for i in range(0, len(body), 64 * 1024):
+            await response.write(body[i : i + 64 * 1024])
+        await response.write_eof()
+        return response
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get("/recordings/{name}", self.recording)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+class MemoryS3:
+    """The boto3 S3 calls `RecordingService` makes, kept in memory. Each
+    call takes `delay` seconds, like a request to S3 would."""
+
+    def __init__(self, delay: float):
+        self._delay = delay
+        self._lock = threading.Lock()
+        self._uploads: Dict[str, Dict[int, bytes]] = {}
+        self.objects: Dict[str, bytes] = {}
+        self.errors: List[str] = []
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        time.sleep(self._delay)
+        with self._lock:
+            self.objects[Key] = bytes(Body)
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None):
+        time.sleep(self._delay)
+        with self._lock:
+            upload_id = f"{Key}-{len(self._uploads)}"
+            self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        time.sleep(self._delay)
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": f'"{UploadId}-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        time.sleep(self._delay)
+        with self._lock:
+            parts = self._uploads.pop(UploadId)
+            numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+            if numbers != sorted(parts):
+                self.errors.append(f"{Key}: completed parts {numbers} of {sorted(parts)}")
+            if any(len(parts[n]) < MIN_PART_SIZE for n in numbers[:-1]):
+                self.errors.append(f"{Key}: a part before the last is under 5MB")
+            self.objects[Key] = b"".join(parts[n] for n in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+
+
+async def _ticker(lags: List[float], stop: asyncio.Event):
+    while not stop.is_set():
+        expected = time.perf_counter() + 0.02
+        await asyncio.sleep(0.02)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def _store(service: RecordingService, jobs: Dict[str, str]) -> List[str]:
+    """Submits `jobs` (call uuid: URL), returns the calls stored."""
+    stored = []
+
+    async def on_stored(call_uuid: str, s3_path: str):
+        stored.append(call_uuid)
+
+    for call_uuid, url in jobs.items():
+        service.submit(call_uuid, url, on_stored=on_stored)
+    await service._queue.join()
+    return stored
+
+
+async def bench_throughput(plivo: StubPlivo, base_url: str, args) -> bool:
+    s3 = MemoryS3(args.s3_delay_ms / 1000)
+    service = RecordingService(s3_client=s3, bucket="bench", concurrency=args.concurrency)
+    await service.start()
+    ok = True
+    for label, size, count in (
+        (f"{args.size_mb}MB", int(args.size_mb * 1024 * 1024), args.recordings),
+        ("100KB", 100 * 1024, args.recordings * 10),
+    ):
+        jobs = {
+            f"{label}-{i}": f"{base_url}/recordings/{label}-{i}?size={size}" for i in range(count)
+        }
+        # Generated up front so the stub doesn't show up in the loop lag.
+        for call_uuid in jobs:
+            plivo.body(call_uuid, size)
+        lags: List[float] = []
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(_ticker(lags, stop))
+        start = time.perf_counter()
+        stored = await _store(service, jobs)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await ticker
+
+        matches = sum(
+            s3.objects.get(f"recordings/{call_uuid}.mp3") == plivo.bodies[call_uuid]
+            for call_uuid in jobs
+        )
+        lags.sort()
+        print(
+            f"{count} x {label}: {elapsed:6.2f}s, {count * size / elapsed / 1024 / 1024:7.1f}MB/s | "
+            f"{matches}/{count} stored intact | loop lag p99/max "
+            f"{lags[int(len(lags) * 0.99)] * 1000:5.1f}/{lags[-1] * 1000:5.1f}ms"
+        )
+        ok &= len(stored) == count and matches == count
+    await service.stop()
+    for error in s3.errors:
+        print(f"  {error}")
+    return ok and not s3.errors
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recordings", type=int, default=8)
+    parser.add_argument("--size-mb", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--s3-delay-ms", type=float, default=20, help="latency of each S3 call")
+    args = parser.parse_args()
+
+    logger.remove()
+
+    plivo = StubPlivo()
+    base_url = await plivo.start()
+    ok = await bench_throughput(plivo, base_url, args)
+    await plivo.stop()
+
+    print(f"results: {'ok' if ok else 'FAILED'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,196 @@
+"""Benchmark of application startup.
+
+Reports, each the median of `--repeat` fresh interpreters:
+
+- Import time of `app.main` and of each module it imports, from Python's
+  `-X importtime`, for the `app` modules and the heaviest packages. Also
+  whether the heavy call-only packages (pipecat, the provider SDKs,
+  onnxruntime) stayed out of it.
+- Import time of what the background warmup loads: `app.bot` and the
+  provider services of the default agent profile.
+- Time from starting uvicorn until it accepts connections and until
+  `/ready` answers 200 (warmup done).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup --repeat 3
+"""
+
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Only calls need these, the web app shouldn't import them.
+CALL_ONLY_PACKAGES = (
+    "pipecat",
+    "openai",
+    "deepgram",
+    "cartesia",
+    "elevenlabs",
+    "onnxruntime",
+    "soundfile",
+    "scipy",
+    "numba",
+)
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def _importtime(code: str) -> List[Tuple[str, int, float, float]]:
+    """(module, depth, self seconds, cumulative seconds) of every module
+    `code` imports, in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            depth = len(match[3]) // 2
+            rows.append((match[4], depth, int(match[1]) / 1e6, int(match[2]) / 1e6))
+    return rows
+
+
+def _median_rows(code: str, repeat: int):
+    runs = [_importtime(code) for _ in range(repeat)]
+    cumulative: Dict[str, List[float]] = defaultdict(list)
+    own: Dict[str, List[float]] = defaultdict(list)
+    depth = {}
+    for rows in runs:
+        for name, d, self_secs, cum_secs in rows:
+            cumulative[name].append(cum_secs)
+            own[name].append(self_secs)
+            depth.setdefault(name, d)
+    median = {name: statistics.median(values) for name, values in cumulative.items()}
+    median_self = {name: statistics.median(values) for name, values in own.items()}
+    # Modules in the order of the last run.
+    order = [name for name, *_ in runs[-1]]
+    return order, depth, median_self, median
+
+
+def report_imports(args) -> bool:
+    order, depth, own, cumulative = _median_rows("import app.main", args.repeat)
+    total = cumulative["app.main"]
+    print(f"import app.main: {total * 1000:.0f}ms")
+    # importtime lists a module after the ones it imports, so a module's
+    # importer is the next one up the tree.
+    importers = {}
+    stack = []
+    for name in reversed(order):
+        while stack and depth[stack[-1]] >= depth[name]:
+            stack.pop()
+        importers[name] = stack[-1] if stack else None
+        stack.append(name)
+
+    print(f"  {'module':<50} {'self':>8} {'cumulative':>11}")
+    for name in order:
+        # The app's modules, and the packages they import that take a while.
+        by_app = (importers[name] or "").startswith("app") and "." not in name
+        if name.startswith("app") or (by_app and cumulative[name] >= args.min_ms / 1000):
+            print(
+                f"  {'  ' * min(depth[name], 6) + name:<50} {own[name] * 1000:7.1f}ms "
+                f"{cumulative[name] * 1000:9.1f}ms"
+            )
+
+    leaked = sorted({name.split(".")[0] for name in cumulative} & set(CALL_ONLY_PACKAGES))
+    print(f"  call-only packages imported: {', '.join(leaked) or 'none'}")
+
+    code = (
+        "import importlib, time; start = time.perf_counter(); import app.bot; "
+        "[importlib.import_module(m) for m in app.bot.provider_modules()]; "
+        "print(time.perf_counter() - start)"
+    )
+    warmup = statistics.median(
+        float(
+            subprocess.run(
+                [sys.executable, "-c", code], capture_output=True, text=True, check=True
+            ).stdout.split()[-1]
+        )
+        for _ in range(args.repeat)
+    )
+    print(f"warmup imports (app.bot and the default profile's providers): {warmup * 1000:.0f}ms")
+    return not leaked
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(env: dict) -> Tuple[float, float]:
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    listening = ready = None
+    try:
+        deadline = start + 120
+        while time.perf_counter() < deadline and ready is None:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=5):
+                    ready = time.perf_counter() - start
+            except urllib.error.HTTPError:
+                # 503 while the warmup runs.
+                pass
+            except OSError:
+                time.sleep(0.02)
+                continue
+            if listening is None:
+                listening = time.perf_counter() - start
+            time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait()
+    return listening, ready
+
+
+def report_server(args) -> bool:
+    env = dict(os.environ)
+    # Keep the analysis workers out of the timing.
+    env["ANALYSIS_WORKERS"] = "0"
+    results = [_start_server(env) for _ in range(args.repeat)]
+    if any(ready is None for _, ready in results):
+        print("uvicorn didn't become ready")
+        return False
+    listening = statistics.median(r[0] for r in results)
+    ready = statistics.median(r[1] for r in results)
+    print(f"uvicorn: listening after {listening * 1000:.0f}ms, ready after {ready * 1000:.0f}ms")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--min-ms", type=float, default=20, help="hide packages importing faster than this"
+    )
+    parser.add_argument("--no-server", action="store_true", help="skip starting uvicorn")
+    args = parser.parse_args()
+
+    ok = report_imports(args)
+    if not args.no_server:
+        ok &= report_server(args)
+    print(f"results: {'ok' if ok else 'FAILED'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Benchmark of LLM to TTS text chunking.
+
+Streams canned LLM responses token by token through a stub TTS service and
+compares the TTS's own sentence aggregation with `TextChunker` in front of a
+TTS that doesn't aggregate. For every response it measures:
+
+- Time from the start of the LLM response to the first TTS audio.
+- How many TTS requests were made.
+- Playback stalls: the audio of a request is assumed to play in real time
+  as soon as it arrives and the previous one has finished, so a stall is a
+  gap between them.
+
+The stub TTS takes `--tts-ttfb-ms` plus `--tts-ms-per-char` per request.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_text_chunker --ttft-ms 300 --token-ms 25
+"""
+
+import argparse
+import asyncio
+import re
+import statistics
+import time
+from typing import AsyncGenerator, List
+
+from loguru import logger
+
+from pipecat.frames.frames import (
+    EndFrame,
+    Frame,
+    LLMFullResponseEndFrame,
+    LLMFullResponseStartFrame,
+    LLMMessagesFrame,
+    LLMTextFrame,
+    TTSAudioRawFrame,
+    TTSStartedFrame,
+    TTSStoppedFrame,
+)
+from pipecat.pipeline.pipeline import Pipeline
+from pipecat.pipeline.runner import PipelineRunner
+from pipecat.pipeline.task import PipelineParams, PipelineTask
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.ai_services import TTSService
+
+from app.services.text_chunker import TextChunker
+
+SAMPLE_RATE = 24000
+# Speaking rate used to turn characters into audio duration.
+AUDIO_SECS_PER_CHAR = 0.065
+
+RESPONSES = [
+    "Hi there! I'm your virtual assistant, and I can help you book appointments, "
+    "check order status, or answer questions about our services. What can I do for you today?",
+    "Sure, I can help with that. Your order shipped yesterday from our Dallas warehouse, "
+    "and it should arrive by Thursday afternoon. Would you like me to text you the tracking link?",
+    "Absolutely. The clinic has openings on Monday at ten, Tuesday at two thirty, "
+    "or Wednesday morning at nine. Which of those works best for you?",
+    "I understand how frustrating that must be, and I'm sorry for the trouble. "
+    "Let me transfer you to a specialist who can look into the billing issue right away.",
+    "Great, you're all set for Tuesday at two thirty. You'll get a reminder the day before, "
+    "so there's nothing else you need to do. Is there anything else I can help with?",
+]
+
+_TOKEN_RE = re.compile(r"\s*\w+|\s*[^\w\s]")
+
+
+class StubLLM(FrameProcessor):
+    """Streams the next canned response, one token at a time, for every
+    `LLMMessagesFrame`."""
+
+    def __init__(self, ttft: float, token_interval: float, **kwargs):
+        super().__init__(**kwargs)
+        self._ttft = ttft
+        self._token_interval = token_interval
+        self._response_index = 0
+        self.started_at = 0.0
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if not isinstance(frame, LLMMessagesFrame):
+            await self.push_frame(frame, direction)
+            return
+
+        text = RESPONSES[self._response_index % len(RESPONSES)]
+        self._response_index += 1
+        self.started_at = time.perf_counter()
+        await self.push_frame(LLMFullResponseStartFrame())
+        await asyncio.sleep(self._ttft)
+        for token in _TOKEN_RE.findall(text):
+            await self.push_frame(LLMTextFrame(token))
+            await asyncio.sleep(self._token_interval)
+        await self.push_frame(LLMFullResponseEndFrame())
+
+
+class StubTTS(TTSService):
+    def __init__(self, ttfb: float, secs_per_char: float, **kwargs):
+        super().__init__(sample_rate=SAMPLE_RATE, **kwargs)
+        self._ttfb = ttfb
+        self._secs_per_char = secs_per_char
+
+    def can_generate_metrics(self) -> bool:
+        return False
+
+    async def run_tts(self, text: str) -> AsyncGenerator[Frame, None]:
+        yield TTSStartedFrame()
+        await asyncio.sleep(self._ttfb + self._secs_per_char * len(text))
+        samples = int(len(text) * AUDIO_SECS_PER_CHAR * SAMPLE_RATE)
+        yield TTSAudioRawFrame(b"\x00\x00" * samples, SAMPLE_RATE, 1)
+        yield TTSStoppedFrame()
+
+
+class Recorder(FrameProcessor):
+    def __init__(self, llm: StubLLM, **kwargs):
+        super().__init__(**kwargs)
+        self._llm = llm
+        self._audio: List[tuple] = []
+        self.done = asyncio.Event()
+        self.results: List[dict] = []
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+
+        if isinstance(frame, TTSAudioRawFrame):
+            duration = len(frame.audio) / 2 / frame.sample_rate
+            self._audio.append((time.perf_counter(), duration))
+        elif isinstance(frame, LLMFullResponseEndFrame):
+            self.results.append(self._result())
+            self._audio = []
+            self.done.set()
+
+        await self.push_frame(frame, direction)
+
+    def _result(self) -> dict:
+        start = self._llm.started_at
+        playing_until = None
+        stalls = 0.0
+        for arrived, duration in self._audio:
+            if playing_until is not None and arrived > playing_until:
+                stalls += arrived - playing_until
+            playing_until = max(arrived, playing_until or arrived) + duration
+        return {
+            "first_audio": self._audio[0][0] - start,
+            "requests": len(self._audio),
+            "stalls": stalls,
+        }
+
+
+async def run_mode(chunking: bool, args) -> List[dict]:
+    llm = StubLLM(args.ttft_ms / 1000, args.token_ms / 1000)
+    tts = StubTTS(
+        args.tts_ttfb_ms / 1000, args.tts_ms_per_char / 1000, aggregate_sentences=not chunking
+    )
+    recorder = Recorder(llm)
+    processors = [llm, *([TextChunker()] if chunking else []), tts, recorder]
+    task = PipelineTask(Pipeline(processors), params=PipelineParams(allow_interruptions=True))
+    runner = PipelineRunner(handle_sigint=False)
+    run = asyncio.create_task(runner.run(task))
+
+    for _ in range(args.responses):
+        recorder.done.clear()
+        await task.queue_frame(LLMMessagesFrame([]))
+        await recorder.done.wait()
+
+    await task.queue_frame(EndFrame())
+    await run
+    return recorder.results
+
+
+def _report(name: str, results: List[dict]):
+    first = sorted(r["first_audio"] * 1000 for r in results)
+    print(
+        f"{name:<22} first audio p50 {statistics.median(first):6.0f}ms "
+        f"max {first[-1]:6.0f}ms | "
+        f"TTS requests {statistics.mean(r['requests'] for r in results):5.1f}/response | "
+        f"stalls {statistics.mean(r['stalls'] for r in results) * 1000:6.0f}ms/response"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--responses", type=int, default=len(RESPONSES) * 2)
+    parser.add_argument("--ttft-ms", type=float, default=300, help="LLM time to first token")
+    parser.add_argument("--token-ms", type=float, default=25, help="LLM time between tokens")
+    parser.add_argument("--tts-ttfb-ms", type=float, default=200, help="TTS time to first byte")
+    parser.add_argument("--tts-ms-per-char", type=float, default=1.0)
+    args = parser.parse_args()
+
+    logger.remove()
+
+    baseline = await run_mode(False, args)
+    chunked = await run_mode(True, args)
+    _report("sentence aggregation", baseline)
+    _report("TextChunker", chunked)
+    saved = statistics.median(r["first_audio"] for r in baseline) - statistics.median(
+        r["first_audio"] for r in chunked
+    )
+    print(f"first audio p50 improvement: {saved * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,180 @@
+"""Benchmark of webhook function calling against a local HTTP stub.
+
+Starts an aiohttp server on localhost whose lookup endpoint answers after
+`--delay-ms`, and drives `ToolRunner` the way the OpenAI service does: one
+callback per tool call, awaited one after another. Reports:
+
+- Time until all `--parallel` tool calls of one LLM response have their
+  results, compared with running the webhooks one after another.
+- Requests reaching the stub and latency for `--calls` calls making the same
+  idempotent lookup with a cache TTL.
+
+Timeouts, fillers and the cache's correctness are covered by
+tests/test_tools.py, which uses the same stubs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_tools --parallel 4 --delay-ms 300
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+from loguru import logger
+
+from app.services.tools import (
+    ToolMetrics,
+    ToolResultCache,
+    ToolRunner,
+    WebhookTool,
+    WebhookToolConfig,
+)
+
+
+class StubServer:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.requests = 0
+
+    async def lookup(self, request: web.Request):
+        self.requests += 1
+        body = await request.json()
+        await asyncio.sleep(float(request.query.get("delay", self.delay)))
+        return web.json_response({"order": body["arguments"].get("order"), "status": "shipped"})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/lookup", self.lookup)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+class StubLLM:
+    """Registers the callbacks and records what's pushed, like the LLM service."""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.frames = []
+
+    def register_function(self, name, callback):
+        self.callbacks[name] = callback
+
+    async def push_frame(self, frame):
+        self.frames.append(frame)
+
+    async def respond(self, calls):
+        """Makes the tool calls of one response, returns when all the
+        results are in."""
+        results = {}
+        done = asyncio.Event()
+
+        for i, (name, arguments) in enumerate(calls):
+
+            async def result_callback(result, i=i):
+                results[i] = result
+                if len(results) == len(calls):
+                    done.set()
+
+            await self.callbacks[name](name, f"call_{i}", arguments, self, None, result_callback)
+        await done.wait()
+        return [results[i] for i in range(len(calls))]
+
+
+def _tool(base_url: str, name: str, **kwargs) -> WebhookTool:
+    return WebhookTool(
+        WebhookToolConfig(
+            name=name,
+            description="Looks up an order.",
+            url=f"{base_url}/lookup",
+            **kwargs,
+        )
+    )
+
+
+async def bench_parallel(base_url: str, session, args) -> bool:
+    tools = {f"lookup_{i}": _tool(base_url, f"lookup_{i}") for i in range(args.parallel)}
+    calls = [(name, {"order": i}) for i, name in enumerate(tools)]
+
+    start = time.perf_counter()
+    for name, arguments in calls:
+        await tools[name].run(arguments, "call", session)
+    sequential = time.perf_counter() - start
+
+    llm = StubLLM()
+    runner = ToolRunner(tools, "call", lambda: session, metrics=ToolMetrics())
+    runner.register(llm)
+    start = time.perf_counter()
+    results = await llm.respond(calls)
+    parallel = time.perf_counter() - start
+
+    print(
+        f"{args.parallel} tool calls: one after another {sequential * 1000:6.0f}ms | "
+        f"ToolRunner {parallel * 1000:6.0f}ms"
+    )
+    return all(r["order"] == i for i, r in enumerate(results))
+
+
+async def bench_cache(base_url: str, server: StubServer, session, args) -> bool:
+    tool = _tool(base_url, "order_status", cache_ttl_secs=60)
+    cache = ToolResultCache()
+    metrics = ToolMetrics()
+    before = server.requests
+    latencies = []
+
+    async def call(i: int):
+        llm = StubLLM()
+        runner = ToolRunner(
+            {tool.name: tool}, f"call_{i}", lambda: session, cache=cache, metrics=metrics
+        )
+        runner.register(llm)
+        for _ in range(args.turns):
+            start = time.perf_counter()
+            await llm.respond([(tool.name, {"order": 42})])
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(call(i) for i in range(args.calls)))
+    requests = server.requests - before
+    print(
+        f"{args.calls} calls x {args.turns} lookups: {requests} requests to the stub, "
+        f"{metrics.cache_hits} cache hits | latency p50 {statistics.median(latencies) * 1000:.1f}ms"
+    )
+    return requests == 1
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--delay-ms", type=float, default=300)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.remove()
+
+    server = StubServer(args.delay_ms / 1000)
+    base_url = await server.start()
+    ok = True
+    async with aiohttp.ClientSession() as session:
+        ok &= await bench_parallel(base_url, session, args)
+        ok &= await bench_cache(base_url, server, session, args)
+    await server.stop()
+
+    print(f"results: {'ok' if ok else 'FAILED'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
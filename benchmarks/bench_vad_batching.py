@@ -0,0 +1,139 @@
+"""Benchmark of batched VAD inference.
+
+Simulates `--calls` concurrent calls, each analysing a 32ms chunk of 16kHz
+audio every 32ms from its own thread (like the input transport's executor),
+once with `SharedSileroVADAnalyzer` (one inference per chunk on the shared
+session) and once with `BatchedSileroVADAnalyzer`. Reports for each:
+
+- CPU time per chunk and the share of a core the calls use.
+- Time from a chunk being handed to the analyzer to its confidence coming
+  back (p50/p99), and the mean batch size.
+- That both analyzers give the same confidences for the same audio.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_vad_batching --calls 100 --seconds 10
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+import numpy as np
+from loguru import logger
+
+from app.audio.batched_vad import BatchedSileroVADAnalyzer, BatchedVADInference, VADBatchMetrics
+from app.services.bot_resources import BotResources, SharedSileroVADAnalyzer
+
+SAMPLE_RATE = 16000
+CHUNK = 512
+CHUNK_SECS = CHUNK / SAMPLE_RATE
+
+
+def _chunks(seconds: float, seed: int):
+    """Harmonic "voice" switched on and off every second over noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    f0 = 120 + 40 * rng.random()
+    voice = sum((3000 / k) * np.sin(2 * np.pi * f0 * k * t) for k in range(1, 8))
+    audio = voice * (t % 2 >= 1) + rng.normal(0, 300, len(t))
+    audio = np.clip(audio, -32768, 32767).astype(np.int16)
+    return [audio[i : i + CHUNK].tobytes() for i in range(0, len(audio) - CHUNK + 1, CHUNK)]
+
+
+def _call(analyzer, chunks, start: float, latencies: list):
+    for n, chunk in enumerate(chunks):
+        delay = start + n * CHUNK_SECS - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        begin = time.perf_counter()
+        analyzer.voice_confidence(chunk)
+        latencies.append(time.perf_counter() - begin)
+
+
+def run(name: str, analyzers, chunks) -> float:
+    latencies = [[] for _ in analyzers]
+    # Spread the calls over one chunk, they don't start in step.
+    start = time.perf_counter() + 0.1
+    threads = [
+        threading.Thread(
+            target=_call,
+            args=(a, chunks[i], start + i * CHUNK_SECS / len(analyzers), latencies[i]),
+        )
+        for i, a in enumerate(analyzers)
+    ]
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+
+    all_latencies = sorted(x for call in latencies for x in call)
+    count = len(all_latencies)
+    print(
+        f"{name:<8} cpu {cpu / count * 1e6:6.1f}us/chunk ({cpu / wall:5.0%} of a core) | "
+        f"latency p50 {all_latencies[count // 2] * 1000:5.2f}ms "
+        f"p99 {all_latencies[int(count * 0.99)] * 1000:5.2f}ms"
+    )
+    return cpu / count
+
+
+def same_confidences(resources: BotResources, batcher: BatchedVADInference, chunks) -> bool:
+    shared = SharedSileroVADAnalyzer(resources, sample_rate=SAMPLE_RATE)
+    batched = BatchedSileroVADAnalyzer(batcher, sample_rate=SAMPLE_RATE)
+    for chunk in chunks[:200]:
+        if abs(shared.voice_confidence(chunk) - batched.voice_confidence(chunk)).max() > 1e-4:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=4.0)
+    args = parser.parse_args()
+
+    logger.remove()
+
+    resources = BotResources()
+    chunks = [_chunks(args.seconds, i) for i in range(args.calls)]
+
+    per_call = run(
+        "per-call",
+        [SharedSileroVADAnalyzer(resources, sample_rate=SAMPLE_RATE) for _ in range(args.calls)],
+        chunks,
+    )
+
+    metrics = VADBatchMetrics()
+    batcher = BatchedVADInference(
+        resources.vad_session(),
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+        metrics=metrics,
+    )
+    batcher.start()
+    batched = run(
+        "batched",
+        [BatchedSileroVADAnalyzer(batcher, sample_rate=SAMPLE_RATE) for _ in range(args.calls)],
+        chunks,
+    )
+    print(
+        f"mean batch {metrics.chunks / max(1, metrics.batches):.1f} chunks, "
+        f"{metrics.inline_chunks} run inline | cpu {per_call / batched:.1f}x less per chunk"
+    )
+
+    ok = same_confidences(resources, batcher, chunks[0])
+    batcher.stop()
+    print(f"confidences match per-call inference: {'ok' if ok else 'FAILED'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,493 @@
+"""Offline load test of the voice WebSocket endpoint.
+
+Runs `app.main` in-process behind uvicorn and opens N concurrent WebSockets
+to `/ws/voice/{call_uuid}` that behave like Plivo media streams: the
+`connected` and `start` handshake, μ-law `media` events paced in real time
+from a WAV fixture (or a synthetic voice-like signal) and a DTMF digit.
+
+Nothing leaves the host. STT is replaced by a processor that emits a canned
+transcript some time after VAD reports end of speech, and the OpenAI and
+ElevenLabs HTTP services are pointed at a local stub server. Every stub
+latency is configurable. By default VAD is a simple energy detector so the
+synthetic signal produces turns; pass `--vad silero` with a speech fixture to
+include the real VAD model in the measurement.
+
+For each concurrency level it reports:
+
+- response latency: client side from the end of an utterance to the first
+  audible playAudio (includes VAD stop time), and server side from VAD end
+  of speech to the first audio frame sent (`app.services.latency_metrics`),
+- event loop lag,
+- CPU (cores used) and RSS growth per call.
+
+The clients and stubs share the server's process and event loop, so the
+numbers are slightly pessimistic. Run from the repository root:
+
+    python -m benchmarks.load_test --concurrency 1,10,25,50 --duration 30
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import resource
+import socket
+import sys
+import time
+import uuid
+from typing import List, Optional
+
+import numpy as np
+from aiohttp import ClientSession, WSMsgType, web
+
+from pipecat.audio.vad.vad_analyzer import VADAnalyzer, VADParams
+from pipecat.frames.frames import (
+    CancelFrame,
+    EndFrame,
+    Frame,
+    TranscriptionFrame,
+    UserStoppedSpeakingFrame,
+)
+from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
+from pipecat.services.elevenlabs import ElevenLabsHttpTTSService
+from pipecat.utils.time import time_now_iso8601
+
+from app.audio import codec
+
+PLIVO_RATE = 8000
+FRAME_MS = 20
+FRAME_SAMPLES = PLIVO_RATE * FRAME_MS // 1000
+AUDIBLE_RMS = 1000.0
+
+
+class EnergyVADAnalyzer(VADAnalyzer):
+    """Treats anything louder than a fixed RMS as speech."""
+
+    def __init__(self, *, sample_rate: int = 16000, params: VADParams = VADParams()):
+        super().__init__(sample_rate=sample_rate, num_channels=1, params=params)
+
+    def num_frames_required(self) -> int:
+        return int(self.sample_rate * 0.02)
+
+    def voice_confidence(self, buffer) -> float:
+        samples = np.frombuffer(buffer, dtype=np.int16).astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples**2))) if len(samples) else 0.0
+        return 1.0 if rms > 500 else 0.0
+
+
+class StubSTT(FrameProcessor):
+    """Emits a canned final transcript `latency` seconds after VAD end of speech."""
+
+    def __init__(self, text: str, latency: float, **kwargs):
+        super().__init__(**kwargs)
+        self._text = text
+        self._latency = latency
+        self._tasks = set()
+
+    async def _transcribe(self):
+        await asyncio.sleep(self._latency)
+        await self.push_frame(TranscriptionFrame(self._text, "user", time_now_iso8601()))
+
+    async def process_frame(self, frame: Frame, direction: FrameDirection):
+        await super().process_frame(frame, direction)
+        if isinstance(frame, UserStoppedSpeakingFrame):
+            task = self.get_event_loop().create_task(self._transcribe())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif isinstance(frame, (EndFrame, CancelFrame)):
+            for task in list(self._tasks):
+                task.cancel()
+        await self.push_frame(frame, direction)
+
+
+class StubServer:
+    """OpenAI chat completions and ElevenLabs streaming TTS, with fixed latencies."""
+
+    def __init__(self, args):
+        self._args = args
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._chat)
+        app.router.add_post("/v1/text-to-speech/{voice_id}/stream", self._tts)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        port = _free_port()
+        await web.TCPSite(self._runner, "127.0.0.1", port).start()
+        self.url = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _chat(self, request: web.Request):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await asyncio.sleep(self._args.llm_ttft)
+        try:
+            for i, word in enumerate(self._args.reply.split(" ")):
+                if i:
+                    await asyncio.sleep(self._args.llm_token_interval)
+                chunk = {
+                    "id": "stub",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": "stub",
+                    "choices": [
+                        {"index": 0, "delta": {"content": word + " "}, "finish_reason": None}
+                    ],
+                }
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            # The bot was interrupted and dropped the stream.
+            pass
+        return response
+
+    async def _tts(self, request: web.Request):
+        body = await request.json()
+        sample_rate = int(request.query.get("output_format", "pcm_24000").split("_")[1])
+        await asyncio.sleep(self._args.tts_ttfb)
+        response = web.StreamResponse(headers={"Content-Type": "audio/pcm"})
+        await response.prepare(request)
+        seconds = 0.06 * len(body["text"])
+        t = np.arange(int(sample_rate * seconds)) / sample_rate
+        audio = (8000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16).tobytes()
+        try:
+            for i in range(0, len(audio), 4096):
+                await response.write(audio[i : i + 4096])
+            await response.write_eof()
+        except ConnectionResetError:
+            pass
+        return response
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is the peak, in KB on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _load_fixture(path: Optional[str]) -> np.ndarray:
+    """Returns the utterance to stream, as 8kHz int16 samples."""
+    if path:
+        import soundfile as sf
+
+        samples, rate = sf.read(path, dtype="int16", always_2d=True)
+        resampler = codec.StreamingResampler(rate, PLIVO_RATE)
+        return resampler.resample(samples[:, 0]).astype(np.int16)
+
+    # Harmonics of 140Hz with a syllable-rate envelope: loud enough for the
+    # energy VAD, audibly "voice-like" for anyone listening to a capture.
+    t = np.arange(int(PLIVO_RATE * 1.5)) / PLIVO_RATE
+    voice = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 6))
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+    return (6000 * voice * envelope).astype(np.int16)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q * 100)) if values else 0.0
+
+
+class SimulatedCall:
+    def __init__(self, base_url: str, utterance: np.ndarray, args):
+        self.call_uuid = str(uuid.uuid4())
+        self._url = f"{base_url}/ws/voice/{self.call_uuid}"
+        self._args = args
+        self._frames = [
+            codec.ulaw_encode(utterance[i : i + FRAME_SAMPLES])
+            for i in range(0, len(utterance) - FRAME_SAMPLES + 1, FRAME_SAMPLES)
+        ]
+        self._silence = codec.ulaw_encode(np.zeros(FRAME_SAMPLES, dtype=np.int16))
+        self._speech_ended: Optional[float] = None
+        self.latencies: List[float] = []
+        self.error: Optional[str] = None
+
+    def _media(self, payload: bytes, stream_id: str, chunk: int) -> str:
+        return json.dumps(
+            {
+                "event": "media",
+                "streamId": stream_id,
+                "media": {
+                    "track": "inbound",
+                    "timestamp": str(chunk * FRAME_MS),
+                    "chunk": str(chunk),
+                    "payload": base64.b64encode(payload).decode("ascii"),
+                },
+            }
+        )
+
+    async def _receive(self, ws):
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                break
+            if self._speech_ended is None:
+                continue
+            data = json.loads(message.data)
+            if data.get("event") != "playAudio":
+                continue
+            audio = codec.ulaw_decode(base64.b64decode(data["media"]["payload"]))
+            if np.sqrt(np.mean(audio.astype(np.float32) ** 2)) > AUDIBLE_RMS:
+                self.latencies.append(time.perf_counter() - self._speech_ended)
+                self._speech_ended = None
+
+    async def run(self, session: ClientSession, duration: float):
+        stream_id = str(uuid.uuid4())
+        try:
+            async with session.ws_connect(self._url) as ws:
+                await ws.send_str(json.dumps({"event": "connected"}))
+                await ws.send_str(
+                    json.dumps(
+                        {
+                            "event": "start",
+                            "streamId": stream_id,
+                            "start": {
+                                "callId": self.call_uuid,
+                                "streamId": stream_id,
+                                "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": PLIVO_RATE},
+                            },
+                        }
+                    )
+                )
+                receiver = asyncio.create_task(self._receive(ws))
+
+                start = time.perf_counter()
+                chunk = 0
+                sent_dtmf = False
+                while time.perf_counter() - start < duration:
+                    for payload in self._frames:
+                        await ws.send_str(self._media(payload, stream_id, chunk))
+                        chunk += 1
+                        await asyncio.sleep(
+                            max(0.0, start + chunk * FRAME_MS / 1000 - time.perf_counter())
+                        )
+                    self._speech_ended = time.perf_counter()
+                    if not sent_dtmf:
+                        await ws.send_str(
+                            json.dumps({"event": "dtmf", "streamId": stream_id, "dtmf": {"digit": "1"}})
+                        )
+                        sent_dtmf = True
+                    silence_end = self._speech_ended + self._args.turn_gap
+                    while time.perf_counter() < silence_end:
+                        await ws.send_str(self._media(self._silence, stream_id, chunk))
+                        chunk += 1
+                        await asyncio.sleep(
+                            max(0.0, start + chunk * FRAME_MS / 1000 - time.perf_counter())
+                        )
+
+                await ws.send_str(json.dumps({"event": "stop", "streamId": stream_id}))
+                await ws.close()
+                receiver.cancel()
+        except Exception as e:
+            self.error = str(e)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.05):
+        self._interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self._interval
+            await asyncio.sleep(self._interval)
+            self.lags.append(max(0.0, time.perf_counter() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+
+def install_stubs(stub_url: str, args):
+    from loguru import logger
+
+    from app.config import settings
+
+    # Keep the benchmark offline and measure steady state turns. Set before
+    # the app modules are imported, the analysis service reads it then.
+    settings.GREETING_CACHE_ENABLED = False
+    settings.ANALYSIS_ENABLED = False
+
+    from app import bot
+    from app.services import context_window
+    from app.services.bot_resources import SharedOpenAILLMService, bot_resources
+
+    # Per-frame debug logging would dominate the CPU numbers.
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    async def summarize(previous, messages, model, max_words):
+        await asyncio.sleep(args.llm_ttft)
+        return "The user asked about opening hours."
+
+    context_window.summarize_with_openai = summarize
+
+    bot.create_stt = lambda template: StubSTT(args.transcript, args.stt_latency)
+    bot.create_llm = lambda template: SharedOpenAILLMService(
+        bot_resources, api_key="stub", base_url=f"{stub_url}/v1", model=template.profile.llm_model
+    )
+    bot.create_tts = lambda template: ElevenLabsHttpTTSService(
+        api_key="stub",
+        voice_id=template.profile.voice_id,
+        base_url=stub_url,
+        aiohttp_session=bot_resources.http_session(),
+    )
+    if args.vad == "energy":
+        bot_resources.vad_analyzer = lambda sample_rate=16000, params=VADParams(): EnergyVADAnalyzer(
+            sample_rate=sample_rate, params=params
+        )
+
+
+async def run_level(base_url: str, utterance: np.ndarray, concurrency: int, args) -> dict:
+    from app.services.latency_metrics import LatencyRegistry, latency_registry
+
+    # Fresh server side histograms for this level.
+    fresh = LatencyRegistry()
+    latency_registry.histograms = fresh.histograms
+
+    calls = [SimulatedCall(base_url, utterance, args) for _ in range(concurrency)]
+    monitor = LoopLagMonitor()
+    rss_before = _rss_bytes()
+    cpu_before = _cpu_seconds()
+    wall_before = time.perf_counter()
+
+    monitor.start()
+    async with ClientSession() as session:
+        tasks = []
+        for call in calls:
+            tasks.append(asyncio.create_task(call.run(session, args.duration)))
+            # Stagger call starts so turns don't line up perfectly.
+            await asyncio.sleep(args.ramp / max(concurrency, 1))
+        rss_peak = rss_before
+        while not all(t.done() for t in tasks):
+            rss_peak = max(rss_peak, _rss_bytes())
+            await asyncio.sleep(0.5)
+    monitor.stop()
+
+    # Let the server finish tearing the calls down before the next level.
+    from app.api.websocket import voice_manager
+
+    drain_deadline = time.perf_counter() + 10
+    while voice_manager.active_connections and time.perf_counter() < drain_deadline:
+        await asyncio.sleep(0.1)
+
+    wall = time.perf_counter() - wall_before
+    cores = (_cpu_seconds() - cpu_before) / wall
+    latencies = [latency for call in calls for latency in call.latencies]
+    server = latency_registry.histograms["audio"]
+    return {
+        "concurrency": concurrency,
+        "turns": len(latencies),
+        "errors": sum(1 for call in calls if call.error),
+        "client_p50": _percentile(latencies, 0.5),
+        "client_p99": _percentile(latencies, 0.99),
+        "server_p50": server.percentile(0.5),
+        "server_p99": server.percentile(0.99),
+        "lag_p99": _percentile(monitor.lags, 0.99),
+        "lag_max": max(monitor.lags, default=0.0),
+        "cpu_per_call": cores / concurrency,
+        "rss_per_call": (rss_peak - rss_before) / concurrency,
+    }
+
+
+async def main_async(args) -> int:
+    import uvicorn
+
+    stubs = StubServer(args)
+    await stubs.start()
+    install_stubs(stubs.url, args)
+
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    )
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    utterance = _load_fixture(args.wav)
+    base_url = f"ws://127.0.0.1:{port}"
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            result = await run_level(base_url, utterance, concurrency, args)
+            results.append(result)
+            print(
+                f"{result['concurrency']:>5} calls  {result['turns']:>5} turns  "
+                f"{result['errors']:>3} errors  "
+                f"client p50/p99 {result['client_p50'] * 1000:7.0f}/{result['client_p99'] * 1000:7.0f}ms  "
+                f"server p50/p99 {result['server_p50'] * 1000:6.0f}/{result['server_p99'] * 1000:6.0f}ms  "
+                f"loop lag p99/max {result['lag_p99'] * 1000:5.1f}/{result['lag_max'] * 1000:5.1f}ms  "
+                f"cpu/call {result['cpu_per_call'] * 100:5.1f}%  "
+                f"rss/call {result['rss_per_call'] / 1024 / 1024:5.1f}MB",
+                flush=True,
+            )
+    finally:
+        server.should_exit = True
+        await server_task
+        await stubs.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    if args.max_p99_ms is not None:
+        worst = max(r["client_p99"] for r in results) * 1000
+        if worst > args.max_p99_ms:
+            print(f"FAIL: client p99 {worst:.0f}ms above {args.max_p99_ms}ms", file=sys.stderr)
+            return 1
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--concurrency",
+        type=lambda s: [int(n) for n in s.split(",")],
+        default=[1, 5, 10],
+        help="comma separated concurrency levels",
+    )
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per call")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds to start all calls")
+    parser.add_argument("--turn-gap", type=float, default=4.0, help="silence after each utterance")
+    parser.add_argument("--wav", help="utterance fixture (default: synthetic)")
+    parser.add_argument("--vad", choices=("energy", "silero"), default="energy")
+    parser.add_argument("--stt-latency", type=float, default=0.15)
+    parser.add_argument("--llm-ttft", type=float, default=0.35)
+    parser.add_argument("--llm-token-interval", type=float, default=0.02)
+    parser.add_argument("--tts-ttfb", type=float, default=0.2)
+    parser.add_argument("--transcript", default="What are your opening hours today?")
+    parser.add_argument(
+        "--reply", default="We are open from nine to five. Is there anything else I can help with?"
+    )
+    parser.add_argument("--max-p99-ms", type=float, help="exit non-zero above this client p99")
+    parser.add_argument("--json", action="store_true", help="also print results as JSON")
+    args = parser.parse_args()
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,12 @@
+import os
+
+# Settings without a default, so app.config loads without a .env. Nothing
+# here reaches Plivo or the providers.
+for name, value in {
+    "PLIVO_AUTH_ID": "MA0000000000000000TEST",
+    "PLIVO_AUTH_TOKEN": "test",
+    "PLIVO_FROM_NUMBER": "15550000000",
+    "BASE_URL": "http://localhost:8000",
+    "ELEVEN_API_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
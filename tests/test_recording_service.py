@@ -0,0 +1,82 @@
+import asyncio
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from loguru import logger
+
+from app.api import routes
+from app.services.recording_service import RecordingService
+from benchmarks.bench_recording import MemoryS3, StubPlivo
+
+
+async def _with_plivo(test):
+    plivo = StubPlivo()
+    base_url = await plivo.start()
+    try:
+        return await test(base_url)
+    finally:
+        await plivo.stop()
+
+
+def test_failed_download_is_retried():
+    async def test(base_url: str):
+        s3 = MemoryS3(0)
+        service = RecordingService(s3_client=s3, bucket="test", retry_delay=0.01)
+        await service.start()
+        stored = []
+
+        async def on_stored(call_uuid: str, s3_path: str):
+            stored.append((call_uuid, s3_path))
+
+        # Fails twice, then succeeds.
+        service.submit("flaky", f"{base_url}/recordings/flaky?size=1024&fail=2", on_stored)
+        await service._queue.join()
+        await service.stop()
+        return s3, stored
+
+    s3, stored = asyncio.run(_with_plivo(test))
+    assert stored == [("flaky", "recordings/flaky.mp3")]
+    assert len(s3.objects["recordings/flaky.mp3"]) == 1024
+
+
+def test_full_queue_answers_503():
+    # Not started, so nothing leaves the queue.
+    service = RecordingService(s3_client=MemoryS3(0), bucket="test", queue_size=1)
+    assert service.submit("full-0", "http://127.0.0.1:1/recordings/full-0")
+    assert not service.submit("full-1", "http://127.0.0.1:1/recordings/full-1")
+
+    app = FastAPI()
+    app.include_router(routes.router)
+    routes.recording_service, original = service, routes.recording_service
+    try:
+        with TestClient(app) as client:
+            response = client.post(
+                "/calls/recording/full-2", data={"RecordUrl": "http://127.0.0.1:1/recordings/full-2"}
+            )
+    finally:
+        routes.recording_service = original
+    # So Plivo retries the webhook.
+    assert response.status_code == 503
+
+
+def test_stop_logs_dropped_recordings():
+    messages: List[str] = []
+
+    async def test(base_url: str):
+        # One slow upload at a time, so the others are still queued.
+        service = RecordingService(s3_client=MemoryS3(0.5), bucket="test", concurrency=1)
+        await service.start()
+        for i in range(3):
+            service.submit(f"queued-{i}", f"{base_url}/recordings/queued-{i}?size=1024")
+        await asyncio.sleep(0.1)
+        await service.stop()
+
+    sink = logger.add(lambda message: messages.append(message.record["message"]), level="WARNING")
+    try:
+        asyncio.run(_with_plivo(test))
+    finally:
+        logger.remove(sink)
+    # The one being stored and the two still queued.
+    for i in range(3):
+        assert any("dropping" in m and f"queued-{i}" in m for m in messages)
@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import aiohttp
+from pipecat.frames.frames import TTSSpeakFrame
+
+from app.services.tools import (
+    ToolMetrics,
+    ToolResultCache,
+    ToolRunner,
+    WebhookTool,
+    WebhookToolConfig,
+)
+from benchmarks.bench_tools import StubLLM, StubServer
+
+
+def _tool(base_url: str, name: str, **kwargs) -> WebhookTool:
+    return WebhookTool(
+        WebhookToolConfig(
+            name=name,
+            description="Looks up an order.",
+            url=f"{base_url}/lookup",
+            **kwargs,
+        )
+    )
+
+
+async def _with_server(test):
+    server = StubServer(0.05)
+    base_url = await server.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            return await test(server, base_url, session)
+    finally:
+        await server.stop()
+
+
+def test_cached_lookup_is_shared_between_calls():
+    async def test(server: StubServer, base_url: str, session):
+        tool = _tool(base_url, "order_status", cache_ttl_secs=60)
+        cache = ToolResultCache()
+        metrics = ToolMetrics()
+
+        async def call(i: int):
+            llm = StubLLM()
+            runner = ToolRunner(
+                {tool.name: tool}, f"call_{i}", lambda: session, cache=cache, metrics=metrics
+            )
+            runner.register(llm)
+            results = []
+            for _ in range(3):
+                results.extend(await llm.respond([(tool.name, {"order": 42})]))
+            return results
+
+        results = await asyncio.gather(*(call(i) for i in range(5)))
+        return server.requests, metrics, results
+
+    requests, metrics, results = asyncio.run(_with_server(test))
+    # Concurrent calls wait for the one request in flight.
+    assert requests == 1
+    assert metrics.cache_hits == 14
+    assert all(r == {"order": 42, "status": "shipped"} for call in results for r in call)
+
+
+def test_uncached_lookup_reaches_the_webhook_every_time():
+    async def test(server: StubServer, base_url: str, session):
+        tool = _tool(base_url, "order_status")
+        llm = StubLLM()
+        ToolRunner({tool.name: tool}, "call", lambda: session, cache=ToolResultCache()).register(
+            llm
+        )
+        for _ in range(3):
+            await llm.respond([(tool.name, {"order": 42})])
+        return server.requests
+
+    assert asyncio.run(_with_server(test)) == 3
+
+
+def test_slow_tool_times_out_with_a_filler():
+    async def test(server: StubServer, base_url: str, session):
+        tool = _tool(base_url, "slow_lookup", timeout_secs=0.5)
+        tool.url += "?delay=2"
+        llm = StubLLM()
+        metrics = ToolMetrics()
+        runner = ToolRunner(
+            {tool.name: tool},
+            "call",
+            lambda: session,
+            filler="One moment.",
+            filler_after_secs=0.2,
+            metrics=metrics,
+        )
+        runner.register(llm)
+        start = time.perf_counter()
+        (result,) = await llm.respond([(tool.name, {"order": 1})])
+        return result, time.perf_counter() - start, llm.frames, metrics
+
+    result, elapsed, frames, metrics = asyncio.run(_with_server(test))
+    assert "error" in result
+    assert elapsed < 1
+    assert metrics.timeouts == 1
+    fillers = [f for f in frames if isinstance(f, TTSSpeakFrame)]
+    assert [f.text for f in fillers] == ["One moment."]